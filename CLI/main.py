@@ -2,7 +2,10 @@
 # The main function runs a loop that takes the input from the user and executes the command until the user types 'exit'.
 # The main function also displays the help message when the user types 'help'.
 # The main function catches any exceptions raised during the execution of the command and displays an error message.
+# With -d <database>, the CLI runs the SQL script given with -f <file> or piped to the standard input instead,
+# and prints how many statements per second it executed.
 
+import argparse
 import sys
 import os
 import time
@@ -11,11 +14,56 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Now import dbms modules
 from dbms.database import Database
-from dbms.parser import Parser
 from dbms.executor import Executor
 from dbms.exeptions import DroppedDatabaseError
+from dbms.batch import ScriptRunner
 
 def main():
+    '''Entry point of the CLI
+    This function reads the command line options, then runs a script if a database is given, or the interactive CLI otherwise.
+    '''
+    arguments = argparse.ArgumentParser(description="UDSQL command line. Without options it runs interactively.")
+    arguments.add_argument("-d", "--database", help="the database of the script")
+    arguments.add_argument("-f", "--file", help="the SQL script to execute, with one statement per line (the standard input if omitted)")
+    arguments.add_argument("--single-lock", action="store_true",
+                           help="run the script under one lock with one commit, stopping at the first error "
+                                "(the statements before it are not rolled back)")
+    arguments.add_argument("--stop-on-error", action="store_true", help="stop at the first statement that fails")
+    arguments.add_argument("-v", "--verbose", action="store_true", help="print the selected rows and the messages of the statements")
+    options = arguments.parse_args()
+
+    if options.database is None:
+        if options.file is not None or not sys.stdin.isatty():
+            arguments.error("a script needs a database: -d <database>")
+        interactive()
+        return
+    sys.exit(0 if run_script(options) else 1)
+
+def run_script(options) -> bool:
+    '''Runs a SQL script without user interaction
+    This function executes the statements of the script on the database with one executor, then prints the summary.
+    It returns whether every statement succeeded.
+    '''
+    script = sys.stdin
+    if options.file is not None:
+        try:
+            script = open(options.file, encoding="utf-8")
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return False
+    db = Database(options.database, wal=True)
+    runner = ScriptRunner(db, options.single_lock, options.stop_on_error, options.verbose)
+    try:
+        succeeded = runner.run(script)
+    finally:
+        if script is not sys.stdin:
+            script.close()
+    print(runner.summary())
+    if not runner.dropped:
+        db.close()
+    return succeeded
+
+def interactive():
     while True:
         '''Main function for the CLI
         This function runs a loop that takes the input from the user and executes the command until the user types 'exit'.
@@ -38,7 +86,8 @@ def main():
             print("Exiting CLI.bye-bye")
             return
         clear_screen()
-        db = Database(db_name)
+        db = Database(db_name, wal=True)
+        executor = Executor(db)
         print("\nDatabase CLI - Type 'help' to see all commands.")
 
         while True:
@@ -46,6 +95,7 @@ def main():
             command_str = command
 
             if command.lower() == "exit":
+                db.close()
                 print("Exiting CLI.bye-bye")
                 return
 
@@ -55,11 +105,22 @@ def main():
                     
                     print(
                     """
-                    CREATE TABLE <table_name> <column_name1> <data_type1> <column_name2> <data_type2> ... PRIMARY_KEY <primary_key> FOREIGN_KEY(OPTIONAL) <foreign_key1>
+                    CREATE TABLE <table_name> <column_name1> <data_type1> <column_name2> <data_type2> ... PRIMARY_KEY <primary_key> STORAGE(OPTIONAL) <csv|columnar> PARTITION BY(OPTIONAL) <HASH(<column>) <partitions>|RANGE(<column>) <bound1> <bound2> ...> FOREIGN_KEY(OPTIONAL) <column1> <table.column1> <column2> <table.column2> ...
+                    CREATE INDEX <index_name> ON <table_name> <column_name>
                     INSERT INTO <table_name> VALUES <value1> <value2> <value3> ...
-                    SELECT * FROM <table_name> WHERE <condition>
+                    INSERT INTO <table_name> VALUES <value1> <value2> ..., <value1> <value2> ..., ...
+                    COPY <table_name> FROM '<file.csv>' HEADER(OPTIONAL)
+                    SELECT * FROM <table_name> WHERE <condition> ORDER BY(OPTIONAL) <column> <ASC|DESC>, ... LIMIT(OPTIONAL) <n> OFFSET(OPTIONAL) <m>
+                    SELECT * FROM <table_name> JOIN <table_name> ON(OPTIONAL WITH A FOREIGN_KEY) <table.column> == <table.column> WHERE(OPTIONAL) <condition>
+                    SELECT <column> ... COUNT(*) SUM(<column>) AVG(<column>) MIN(<column>) MAX(<column>) FROM <table_name> WHERE(OPTIONAL) <condition> GROUP BY(OPTIONAL) <column> ...
                     UPDATE <table_name> SET <column_name1> <value1> <column_name2> <value2> ... WHERE <condition>
                     DELETE FROM <table_name> WHERE <condition>
+                    VACUUM <table_name>
+                    ANALYZE <table_name>
+                    EXPLAIN <SELECT, UPDATE or DELETE statement>
+                    PREPARE <name> AS <INSERT, SELECT, UPDATE, DELETE or EXPLAIN statement with ? in place of values>
+                    EXECUTE <name> <value1> <value2> ...
+                    DEALLOCATE <name>
                     DROP TABLE <table_name>
                     DROP DATABASE 
                     EXIT
@@ -67,9 +128,7 @@ def main():
                     )
 
                 else:
-                    parse = Parser(command_str)
-                    executor = Executor(db)
-                    executor.execute(*parse.parse())
+                    executor.run(command_str)
             except DroppedDatabaseError as e:
                 print(f"{e}")
                 time.sleep(2)
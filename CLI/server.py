@@ -0,0 +1,34 @@
+# This file starts the UDSQL server. It serves the databases to many clients over a TCP or Unix socket,
+# keeping every database open between statements (see dbms/server.py for the protocol).
+# The server runs until it is interrupted with Ctrl+C, then closes the databases.
+
+import argparse
+import asyncio
+import sys
+import os
+# Add project root (UDSQL) to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbms.server import DatabaseServer
+
+def main():
+    '''Entry point of the server
+    This function reads the command line options, then serves the databases until it is interrupted.
+    '''
+    arguments = argparse.ArgumentParser(description="Serves UDSQL databases over a socket.")
+    arguments.add_argument("-d", "--database", help="the database of new connections, which may choose another one with USE <database>")
+    arguments.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    arguments.add_argument("--port", type=int, default=DatabaseServer.PORT, help="the TCP port to listen on")
+    arguments.add_argument("--unix", help="the path of a Unix socket to listen on instead of TCP")
+    options = arguments.parse_args()
+
+    server = DatabaseServer(options.database, wal=True)
+    where = options.unix if options.unix is not None else f"{options.host}:{options.port}"
+    print(f"UDSQL server listening on {where}")
+    try:
+        asyncio.run(server.serve(options.host, options.port, options.unix))
+    except KeyboardInterrupt:
+        print("Server stopped")
+
+if __name__ == "__main__":
+    main()
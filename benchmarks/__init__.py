@@ -0,0 +1,3 @@
+from .suite import BenchmarkSuite, compare
+
+__all__ = ["BenchmarkSuite", "compare"]
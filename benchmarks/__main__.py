@@ -0,0 +1,69 @@
+# This file runs the benchmark suite from the command line: python -m benchmarks
+# It times the statements of the engine on synthetic tables, prints a report and stores the results as JSON.
+# With --baseline it compares the results with earlier ones and exits with status 1 if an operation got slower.
+
+import argparse
+import json
+import os
+import sys
+# Add project root (UDSQL) to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tabulate import tabulate
+
+from benchmarks.suite import BenchmarkSuite, compare
+
+def main():
+    '''Entry point of the benchmarks
+    This function reads the command line options, runs the suite, prints its report and writes the results.
+    '''
+    arguments = argparse.ArgumentParser(description="Benchmarks UDSQL on synthetic tables.")
+    arguments.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="the numbers of rows of the tables")
+    arguments.add_argument("--operations", type=int, default=1000, help="the number of statements of every operation")
+    arguments.add_argument("--seed", type=int, default=0, help="the seed of the random rows and statements")
+    arguments.add_argument("--storage", choices=["csv", "columnar"], default="csv", help="the storage engine of the table")
+    arguments.add_argument("--wal", action="store_true", help="log the changes to a write-ahead log, like the CLI")
+    arguments.add_argument("--workers", type=int, default=1, help="the number of worker processes of parallel scans")
+    arguments.add_argument("-o", "--output", default="benchmark_results.json", help="the JSON file of the results")
+    arguments.add_argument("--baseline", help="earlier results to compare with")
+    arguments.add_argument("--tolerance", type=float, default=0.2, help="the allowed growth of the median latency over the baseline")
+    options = arguments.parse_args()
+
+    suite = BenchmarkSuite(options.rows, options.operations, options.seed,
+                           storage=options.storage, wal=options.wal, workers=options.workers)
+    results = suite.run()
+    print(report(results))
+    with open(options.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {options.output}")
+
+    if options.baseline is not None:
+        with open(options.baseline, encoding="utf-8") as file:
+            regressions = compare(json.load(file), results, options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+def report(results: dict) -> str:
+    '''Formats the results as a table per size
+    This function returns the throughput, the latency percentiles and the peak memory of every operation.
+    '''
+    sections = []
+    for size, result in results["sizes"].items():
+        rows = []
+        for name, operation in result["operations"].items():
+            latency = operation["latency_ms"]
+            memory = operation["peak_memory_bytes"]
+            rows.append([
+                name, operation["statements"], operation["statements_per_second"], operation.get("rows_per_second"),
+                latency["p50"], latency["p95"], latency["p99"], latency["max"],
+                memory / 2 ** 20 if memory is not None else None])
+        sections.append(f"{size} rows\n" + tabulate(
+            rows, ["operation", "statements", "statements/s", "rows/s", "p50 ms", "p95 ms", "p99 ms", "max ms", "peak MB"],
+            tablefmt="grid", floatfmt=".2f", missingval="-"))
+    return "\n\n".join(sections)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+suite.py
+
+This module provides the BenchmarkSuite class that times the statements of the engine on synthetic tables,
+and the compare function that finds the regressions between two of its results.
+"""
+
+import contextlib
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from dbms.database import Database
+from dbms.exeptions import DroppedDatabaseError
+from dbms.executor import Executor
+
+
+def percentile(values: list, p: float) -> float:
+    """
+    Returns the nearest-rank percentile of sorted values.
+
+    Parameters:
+        values (list): The values, sorted.
+        p (float): The percentile, from 0 to 100.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def peak_memory() -> int:
+    """
+    Returns the peak resident memory of the process so far in bytes, or None without the resource module (on Windows).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BenchmarkSuite:
+    """
+    Times every kind of statement on synthetic tables of several sizes, through Database and Executor.
+
+    Every size runs in a new process on its own database, which is dropped at the
+    end, so the peak memory and the startup time of one size do not depend on the
+    others. The table is loaded with multi-row inserts, analyzed, and then every
+    operation runs a number of statements on random rows chosen with a fixed seed,
+    so two runs with the same options execute the same statements. Only the
+    execution of the statements is timed, not the generation of their text, and
+    the selected rows are read but not printed.
+
+    Operations:
+        bulk_insert: multi-row INSERT of BATCH_SIZE rows, which loads the table.
+        startup: opening the database and running the first point select.
+        point_select: SELECT by primary key.
+        range_select: SELECT of RANGE_WIDTH consecutive primary keys.
+        full_scan: COUNT(*) with a filter on a column without index.
+        single_insert: INSERT of one row.
+        update: UPDATE by primary key.
+        delete: DELETE by primary key.
+
+    Attributes:
+        sizes (list): The numbers of rows of the tables.
+        operations (int): The number of statements of every operation, except the slower ones.
+        seed (int): The seed of the random values and rows.
+        options (dict): The keyword arguments of the benchmark databases (see Database).
+    """
+
+    # Name of the table of every benchmark database.
+    TABLE = "bench"
+    # Rows inserted by every statement that loads the table.
+    BATCH_SIZE = 10000
+    # Number of primary keys of every range select.
+    RANGE_WIDTH = 100
+    # Number of times the database is opened to time the startup.
+    STARTUP_REPEATS = 5
+    # Number of full scans for every 100 statements of the other operations, at least 3.
+    SCANS_PER_100 = 1
+
+    def __init__(self, sizes: list, operations: int = 1000, seed: int = 0, **options):
+        """
+        Initializes the suite.
+
+        Parameters:
+            sizes (list): The numbers of rows of the tables.
+            operations (int): The number of statements of every operation.
+            seed (int): The seed of the random values and rows.
+            options: The keyword arguments of the benchmark databases, such as wal=True or workers=1.
+        """
+        if not sizes or any(size < 1 for size in sizes):
+            raise ValueError("Every table needs at least one row")
+        if operations < 1:
+            raise ValueError("Every operation needs at least one statement")
+        self.sizes = list(sizes)
+        self.operations = operations
+        self.seed = seed
+        self.options = options
+
+    def run(self) -> dict:
+        """
+        Runs the benchmark of every size, each in a new process.
+
+        Returns:
+            dict: The results, which JSON can encode.
+        """
+        results = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": self.has_numpy(),
+            "operations": self.operations,
+            "seed": self.seed,
+            "options": self.options,
+            "sizes": {},
+        }
+        context = multiprocessing.get_context("spawn")
+        for size in self.sizes:
+            queue = context.Queue()
+            process = context.Process(target=self.run_size_in_process, args=(size, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            if isinstance(result, str):
+                raise RuntimeError(f"The benchmark of {size} rows failed: {result}")
+            results["sizes"][str(size)] = result
+        return results
+
+    @staticmethod
+    def has_numpy() -> bool:
+        """
+        Returns whether NumPy is installed, which changes how full scans are evaluated.
+        """
+        try:
+            import numpy
+        except ImportError:
+            return False
+        return True
+
+    def run_size_in_process(self, size: int, queue) -> None:
+        """
+        Runs the benchmark of a size and puts its results, or its error message, in a queue.
+
+        Parameters:
+            size (int): The number of rows of the table.
+            queue (multiprocessing.Queue): Where the results are put.
+        """
+        try:
+            with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+                result = SizeBenchmark(self, size).run()
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+        queue.put(result)
+
+
+class SizeBenchmark:
+    """
+    The benchmark of one table size, run by BenchmarkSuite.
+
+    Attributes:
+        suite (BenchmarkSuite): The suite.
+        size (int): The number of rows of the table.
+        db_name (str): The name of the benchmark database.
+        random (random.Random): The random values, from the seed of the suite.
+        db (Database): The open database, or None.
+        executor (Executor): The executor of the statements, or None.
+        next_id (int): The primary key of the next inserted row.
+        selected (int): The number of rows read by the selects.
+    """
+
+    def __init__(self, suite: BenchmarkSuite, size: int):
+        self.suite = suite
+        self.size = size
+        self.db_name = f"benchmark_{size}"
+        self.random = random.Random(suite.seed)
+        self.db = None
+        self.executor = None
+        self.next_id = 0
+        self.selected = 0
+
+    def run(self) -> dict:
+        """
+        Loads the table and times every operation, then drops the database.
+
+        Returns:
+            dict: The number of rows, the peak memory and the results of every operation.
+        """
+        self.drop()
+        operations = {}
+        try:
+            self.open()
+            self.executor.run(
+                f"CREATE TABLE {BenchmarkSuite.TABLE} id int name str age int score float PRIMARY_KEY id")
+            operations["bulk_insert"] = self.bulk_insert()
+            self.executor.run(f"ANALYZE {BenchmarkSuite.TABLE}")
+            operations["startup"] = self.startup()
+
+            count = self.suite.operations
+            table = BenchmarkSuite.TABLE
+            ids = self.random_ids(count)
+            operations["point_select"] = self.measure(
+                f"SELECT * FROM {table} WHERE id == {i}" for i in ids)
+            starts = self.random_ids(count, self.size - BenchmarkSuite.RANGE_WIDTH)
+            operations["range_select"] = self.measure(
+                f"SELECT * FROM {table} WHERE id >= {i} and id < {i + BenchmarkSuite.RANGE_WIDTH}" for i in starts)
+            scans = max(3, count * BenchmarkSuite.SCANS_PER_100 // 100)
+            operations["full_scan"] = self.measure(
+                f"SELECT COUNT(*) FROM {table} WHERE score > {self.random.uniform(0, 100):.2f}" for _ in range(scans))
+            operations["single_insert"] = self.measure(
+                f"INSERT INTO {table} VALUES {' '.join(self.row())}" for _ in range(count))
+            ids = self.random_ids(count)
+            operations["update"] = self.measure(
+                f"UPDATE {table} SET age {self.random.randint(18, 90)} WHERE id == {i}" for i in ids)
+            ids = self.random.sample(range(self.size), min(count, self.size))
+            operations["delete"] = self.measure(f"DELETE FROM {table} WHERE id == {i}" for i in ids)
+        finally:
+            self.drop()
+        return {"rows": self.size, "peak_memory_bytes": peak_memory(), "operations": operations}
+
+    def open(self) -> None:
+        """
+        Opens the benchmark database.
+        """
+        self.db = Database(self.db_name, **self.suite.options)
+        self.executor = Executor(self.db, self.read_rows)
+
+    def drop(self) -> None:
+        """
+        Drops the benchmark database, opening it first if needed, which creates it if it does not exist.
+        """
+        if self.db is None:
+            self.open()
+        try:
+            self.executor.run("DROP DATABASE")
+        except DroppedDatabaseError:
+            pass
+        self.db = None
+        self.executor = None
+
+    def read_rows(self, headers: list, rows) -> None:
+        """
+        Reads the selected rows of a SELECT instead of printing them.
+
+        Parameters:
+            headers (list): The names of the selected columns.
+            rows (iterable): The selected rows.
+        """
+        for _ in rows:
+            self.selected += 1
+
+    def row(self) -> list:
+        """
+        Returns the values of a new row, as text.
+        """
+        i = self.next_id
+        self.next_id += 1
+        return [str(i), f"name{i}", str(self.random.randint(18, 90)), f"{self.random.uniform(0, 100):.2f}"]
+
+    def random_ids(self, count: int, stop: int = None) -> list:
+        """
+        Returns random primary keys of loaded rows.
+
+        Parameters:
+            count (int): The number of primary keys.
+            stop (int): The primary keys are below stop, the number of loaded rows if None.
+        """
+        stop = max(1, self.size if stop is None else stop)
+        return [self.random.randrange(stop) for _ in range(count)]
+
+    def bulk_insert(self) -> dict:
+        """
+        Loads the table with multi-row inserts of BATCH_SIZE rows.
+
+        The rows are given to the executor already split into values, so the time
+        is spent storing them rather than parsing a statement of thousands of rows.
+        """
+        latencies = []
+        while self.next_id < self.size:
+            rows = [self.row() for _ in range(min(BenchmarkSuite.BATCH_SIZE, self.size - self.next_id))]
+            start = time.perf_counter()
+            self.executor.execute(10, BenchmarkSuite.TABLE, rows)
+            latencies.append(time.perf_counter() - start)
+        return self.summarize(latencies, self.size)
+
+    def startup(self) -> dict:
+        """
+        Closes the database and times opening it again and running a first point select, several times.
+        """
+        latencies = []
+        for _ in range(BenchmarkSuite.STARTUP_REPEATS):
+            self.db.close()
+            statement = f"SELECT * FROM {BenchmarkSuite.TABLE} WHERE id == {self.random_ids(1)[0]}"
+            start = time.perf_counter()
+            self.open()
+            self.executor.run(statement)
+            latencies.append(time.perf_counter() - start)
+        return self.summarize(latencies)
+
+    def measure(self, statements) -> dict:
+        """
+        Times the statements of an operation one by one.
+
+        Parameters:
+            statements (iterable): The statements, as text, generated before every one is timed.
+        """
+        latencies = []
+        for statement in statements:
+            start = time.perf_counter()
+            self.executor.run(statement)
+            latencies.append(time.perf_counter() - start)
+        return self.summarize(latencies)
+
+    @staticmethod
+    def summarize(latencies: list, rows: int = None) -> dict:
+        """
+        Returns the throughput, the latency percentiles and the peak memory of an operation.
+
+        Parameters:
+            latencies (list): The seconds every statement took.
+            rows (int): The number of rows the statements wrote, if it is not one per statement.
+        """
+        seconds = sum(latencies)
+        latencies = sorted(latencies)
+        result = {
+            "statements": len(latencies),
+            "seconds": seconds,
+            "statements_per_second": len(latencies) / seconds if seconds > 0 else None,
+            "latency_ms": {
+                "mean": seconds / len(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(latencies, 50) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+            "peak_memory_bytes": peak_memory(),
+        }
+        if rows is not None:
+            result["rows_per_second"] = rows / seconds if seconds > 0 else None
+        return result
+
+
+def compare(baseline: dict, results: dict, tolerance: float = 0.2) -> list:
+    """
+    Finds the operations whose median latency grew by more than the tolerance since a baseline.
+
+    Only the sizes and operations in both results are compared.
+
+    Parameters:
+        baseline (dict): Earlier results of BenchmarkSuite.run().
+        results (dict): The new results.
+        tolerance (float): The allowed growth, as a fraction of the baseline latency.
+
+    Returns:
+        list: A description of every regression.
+    """
+    regressions = []
+    for size, result in results["sizes"].items():
+        old_operations = baseline.get("sizes", {}).get(size, {}).get("operations", {})
+        for name, operation in result["operations"].items():
+            if name not in old_operations:
+                continue
+            old = old_operations[name]["latency_ms"]["p50"]
+            new = operation["latency_ms"]["p50"]
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append(
+                    f"{name} on {size} rows: median latency {old:.3f} ms -> {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
@@ -0,0 +1,214 @@
+"""
+aggregate.py
+
+This module provides the Aggregation class for evaluating aggregate functions and GROUP BY over a scan.
+"""
+
+import re
+
+
+class Aggregation:
+    """
+    The aggregate functions and grouped columns of a SELECT, validated and compiled once per statement.
+
+    Rows are aggregated in a single pass into a hash table that maps the values
+    of the grouped columns to the running state of the group, so only one entry
+    per group is kept in memory however many rows are scanned. The state of a
+    group is its row count plus one running sum, minimum or maximum per column
+    and function; AVG is computed from the sum and the count at the end. The
+    states of separate parts of a table, such as the chunks of a parallel scan,
+    are merged into the states of the whole table before the end.
+
+    Attributes:
+        group_columns (list): The positions of the grouped columns.
+        used_columns (list): The positions of the columns the aggregation reads.
+        slots (list): The running values of the state after the row count, as ((kind, column position), slot)
+            where kind is "sum", "min" or "max" and slot is the position of the value in the state.
+        outputs (list): How every selected item is computed from the key and the state of a
+            group, as (kind, index) where kind is "group", "count", "sum", "avg", "min" or "max".
+    """
+
+    FUNCTIONS = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+    # Functions that only apply to numbers.
+    NUMERIC_FUNCTIONS = ("SUM", "AVG")
+    PATTERN = re.compile(r"^(\w+)\((\*|[\w.]+)\)$")
+
+    def __init__(self, items: list, group_by: list, columns: list, data_types: list):
+        """
+        Compiles the aggregation.
+
+        Parameters:
+            items (list): The selected items, as column names or functions such as "COUNT(*)" or "avg(age)".
+            group_by (list): The names of the grouped columns.
+            columns (list): The list of column names of the table.
+            data_types (list): The data types of the columns.
+
+        Raises:
+            ValueError: If an item is not valid, references unknown columns or selects
+                a column that is not grouped.
+        """
+        for column in group_by:
+            if column not in columns:
+                raise ValueError(f"Column {column} not found")
+        self.group_columns = [columns.index(column) for column in group_by]
+
+        # Running values of the state after the row count, by (kind, column position).
+        slots = {}
+        self.outputs = []
+        for item in items:
+            function = self.parse_function(item)
+            if function is None:
+                if item not in group_by:
+                    raise ValueError(f"Column {item} must be in GROUP BY")
+                self.outputs.append(("group", group_by.index(item)))
+                continue
+            name, argument = function
+            if name == "COUNT":
+                if argument != "*" and argument not in columns:
+                    raise ValueError(f"Column {argument} not found")
+                self.outputs.append(("count", 0))
+                continue
+            if argument not in columns:
+                raise ValueError(f"Column {argument} not found")
+            i = columns.index(argument)
+            if name in self.NUMERIC_FUNCTIONS and data_types[i] not in ("int", "float"):
+                raise ValueError(f"Invalid aggregate {item}")
+            kind = "sum" if name == "AVG" else name.lower()
+            slot = slots.setdefault((kind, i), len(slots) + 1)
+            self.outputs.append((name.lower(), slot))
+
+        self.slots = sorted(slots.items(), key=lambda slot: slot[1])
+        self.used_columns = sorted(set(self.group_columns) | {i for (_, i), _ in self.slots})
+
+    @classmethod
+    def parse_function(cls, item: str):
+        """
+        Splits an aggregate function into its name and argument.
+
+        Parameters:
+            item (str): The selected item.
+
+        Returns:
+            tuple: The upper case name and the argument, or None if the item is not an aggregate function.
+        """
+        match = cls.PATTERN.match(item)
+        if match is None or match.group(1).upper() not in cls.FUNCTIONS:
+            return None
+        return match.group(1).upper(), match.group(2)
+
+    @classmethod
+    def is_aggregate(cls, items: list) -> bool:
+        """
+        Returns whether selected items include an aggregate function.
+
+        Parameters:
+            items (list): The selected items.
+        """
+        return any(cls.parse_function(item) is not None for item in items)
+
+    def aggregate(self, rows) -> list:
+        """
+        Aggregates rows in a single pass.
+
+        Parameters:
+            rows (iterable): The rows that satisfy the condition of the statement.
+
+        Returns:
+            list: One row per group, in the order the groups were first seen. Without
+            grouped columns there is always exactly one row, even for no rows.
+        """
+        return self.finish(self.accumulate(rows))
+
+    def accumulate(self, rows) -> dict:
+        """
+        Computes the running state of every group of some rows.
+
+        Parameters:
+            rows (iterable): The rows that satisfy the condition of the statement.
+
+        Returns:
+            dict: The states by the values of the grouped columns, in the order the groups were first seen.
+        """
+        group_columns = self.group_columns
+        slots = [(slot, kind, i) for (kind, i), slot in self.slots]
+        initial = [0] + [0 if kind == "sum" else None for (kind, _), _ in self.slots]
+        groups = {}
+        if not group_columns:
+            groups[()] = list(initial)
+
+        for row in rows:
+            key = tuple([row[i] for i in group_columns])
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = list(initial)
+            state[0] += 1
+            for slot, kind, i in slots:
+                value = row[i]
+                if kind == "sum":
+                    state[slot] += value
+                elif state[slot] is None or (value < state[slot] if kind == "min" else value > state[slot]):
+                    state[slot] = value
+        return groups
+
+    def merge(self, groups: dict, other: dict) -> dict:
+        """
+        Adds the states of the groups of the rows that follow to the states of some groups.
+
+        Parameters:
+            groups (dict): The states of the groups, which are updated.
+            other (dict): The states of the groups of the rows that follow.
+
+        Returns:
+            dict: The updated groups.
+        """
+        for key, state in other.items():
+            current = groups.get(key)
+            if current is None:
+                groups[key] = state
+                continue
+            current[0] += state[0]
+            for (kind, _), slot in self.slots:
+                value = state[slot]
+                if kind == "sum":
+                    current[slot] += value
+                elif value is not None and (current[slot] is None
+                                            or (value < current[slot] if kind == "min" else value > current[slot])):
+                    current[slot] = value
+        return groups
+
+    def finish(self, groups: dict) -> list:
+        """
+        Computes the result rows of the groups.
+
+        Parameters:
+            groups (dict): The states of the groups.
+
+        Returns:
+            list: One row per group.
+        """
+        return [self.result(key, state) for key, state in groups.items()]
+
+    def result(self, key: tuple, state: list) -> list:
+        """
+        Computes the selected items of a group.
+
+        Parameters:
+            key (tuple): The values of the grouped columns.
+            state (list): The row count and the running values of the group.
+
+        Returns:
+            list: The result row.
+        """
+        row = []
+        for kind, index in self.outputs:
+            if kind == "group":
+                row.append(key[index])
+            elif kind == "count":
+                row.append(state[0])
+            elif kind == "sum":
+                row.append(state[index] if state[0] else None)
+            elif kind == "avg":
+                row.append(state[index] / state[0] if state[0] else None)
+            else:
+                row.append(state[index])
+        return row
@@ -0,0 +1,161 @@
+"""
+batch.py
+
+This module provides the ScriptRunner class that executes SQL scripts without user interaction.
+"""
+
+import contextlib
+import os
+import sys
+import time
+
+from dbms.exeptions import DroppedDatabaseError
+from dbms.executor import Executor
+
+
+class ScriptRunner:
+    """
+    Executes the statements of a script on a database with a single Executor.
+
+    Scripts hold one statement per line. Empty lines and lines starting with "--"
+    are skipped, and a ";" at the end of a line is ignored. Unless verbose, the rows
+    selected by every SELECT are counted instead of printed, and so is the text the
+    statements print, such as "Table t created", so only errors and the summary are
+    shown.
+
+    Attributes:
+        db (Database): The database.
+        executor (Executor): The executor of the statements.
+        single_lock (bool): Whether the script runs under one lock with one commit (see Executor.single_lock()).
+        stop_on_error (bool): Whether the script stops at the first failed statement.
+        verbose (bool): Whether selected rows and the text of the statements are printed.
+        errors (file): Where the errors are written.
+        statements (int): The number of statements executed so far.
+        failed (int): The number of statements that failed.
+        rows (int): The number of rows selected, when they are not printed.
+        elapsed (float): The seconds spent executing statements.
+        dropped (bool): Whether the script dropped the database, which must not be closed then.
+    """
+
+    # Prefix of the comment lines of a script.
+    COMMENT = "--"
+
+    def __init__(self, db, single_lock: bool = False, stop_on_error: bool = False, verbose: bool = False,
+                 errors=None):
+        """
+        Initializes the runner of the scripts of a database.
+
+        Parameters:
+            db (Database): The database.
+            single_lock (bool): Whether the script runs under one lock with one commit, which stops at the first
+                failed statement without undoing the statements before it.
+            stop_on_error (bool): Whether the script stops at the first failed statement.
+            verbose (bool): Whether selected rows and the text of the statements are printed.
+            errors (file): Where the errors are written, sys.stderr if None.
+        """
+        self.db = db
+        self.executor = Executor(db, None if verbose else self.count_rows)
+        self.single_lock = single_lock
+        self.stop_on_error = stop_on_error or single_lock
+        self.verbose = verbose
+        self.errors = errors if errors is not None else sys.stderr
+        self.statements = 0
+        self.failed = 0
+        self.rows = 0
+        self.elapsed = 0.0
+        self.dropped = False
+
+    @classmethod
+    def read_statements(cls, lines):
+        """
+        Reads the statements of a script.
+
+        Parameters:
+            lines (iterable): The lines of the script.
+
+        Yields:
+            tuple: The line number and the text of every statement.
+        """
+        for number, line in enumerate(lines, 1):
+            statement = line.strip()
+            if statement.endswith(";"):
+                statement = statement[:-1].rstrip()
+            if statement and not statement.startswith(cls.COMMENT):
+                yield number, statement
+
+    def count_rows(self, headers: list, rows) -> None:
+        """
+        Counts the selected rows of a SELECT instead of printing them.
+
+        Parameters:
+            headers (list): The names of the selected columns.
+            rows (iterable): The selected rows.
+        """
+        for _ in rows:
+            self.rows += 1
+
+    def run(self, lines) -> bool:
+        """
+        Executes the statements of a script.
+
+        Parameters:
+            lines (iterable): The lines of the script, such as an open file.
+
+        Returns:
+            bool: Whether every statement succeeded and the database was not dropped.
+        """
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            if not self.verbose:
+                self.executor.output = stack.enter_context(open(os.devnull, "w"))
+                stack.callback(setattr, self.executor, "output", None)
+            if self.single_lock:
+                stack.enter_context(self.executor.single_lock())
+            try:
+                for number, statement in self.read_statements(lines):
+                    if not self.execute(number, statement):
+                        break
+            except DroppedDatabaseError as e:
+                self.dropped = True
+                print(e, file=self.errors)
+                return False
+            finally:
+                self.elapsed += time.perf_counter() - start
+        return self.failed == 0
+
+    def execute(self, number: int, statement: str) -> bool:
+        """
+        Executes a statement of the script, writing its error if it fails.
+
+        Parameters:
+            number (int): The line of the statement.
+            statement (str): The statement.
+
+        Returns:
+            bool: Whether the script goes on.
+
+        Raises:
+            DroppedDatabaseError: If the statement dropped the database.
+        """
+        self.statements += 1
+        try:
+            self.executor.run(statement)
+        except DroppedDatabaseError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            print(f"Error on line {number}: {e}", file=self.errors)
+            return not self.stop_on_error
+        return True
+
+    def summary(self) -> str:
+        """
+        Returns the number of executed statements and how many were executed per second.
+        """
+        rate = self.statements / self.elapsed if self.elapsed > 0 else 0.0
+        text = f"Executed {self.statements} statements in {self.elapsed:.3f} s ({rate:.0f} statements/s)"
+        if self.failed:
+            text += f", {self.failed} failed"
+        if not self.verbose and self.rows:
+            text += f", {self.rows} rows selected"
+        return text
@@ -0,0 +1,250 @@
+"""
+cache.py
+
+This module provides the TableCache class that keeps recently used tables in memory, and the LRUCache class
+that keeps a number of recently used values.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+class TableCache:
+    """
+    A least recently used cache of loaded tables with a memory budget.
+
+    Every cached table is stored with a stamp of its storage (see the stamp()
+    method of the storage engines), so a table changed on disk by another
+    process is not served from memory. The NumPy arrays of the columns of a
+    cached table are kept with its rows once they are built, so scans of a
+    cached table are evaluated with NumPy without converting its rows again.
+
+    Attributes:
+        budget (int): The maximum estimated size of the cached tables in bytes. 0 disables the cache.
+        entries (OrderedDict): The cached tables by name, least recently used first,
+            as lists of [rows, size, stamp, arrays], where arrays maps column positions to their arrays.
+        used (int): The estimated size of the cached tables in bytes.
+    """
+
+    def __init__(self, budget: int):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+            budget (int): The maximum estimated size of the cached tables in bytes.
+        """
+        if budget < 0:
+            raise ValueError("Invalid cache size")
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.used = 0
+
+    def get(self, table_name: str, stamp):
+        """
+        Returns the rows of a cached table and marks it as recently used.
+
+        Parameters:
+            table_name (str): The name of the table.
+            stamp: The current stamp of the table storage.
+
+        Returns:
+            list: The rows, or None if the table is not cached or changed on disk.
+        """
+        entry = self.entries.get(table_name)
+        if entry is None:
+            return None
+        if entry[2] != stamp:
+            self.invalidate(table_name)
+            return None
+        self.entries.move_to_end(table_name)
+        return entry[0]
+
+    def put(self, table_name: str, rows: list, stamp) -> None:
+        """
+        Caches the rows of a table, evicting the least recently used tables to stay within the budget.
+
+        Parameters:
+            table_name (str): The name of the table.
+            rows (list): The rows with the data types applied.
+            stamp: The stamp of the table storage.
+        """
+        self.invalidate(table_name)
+        size = self.estimate_size(rows)
+        if size > self.budget:
+            return
+        while self.used + size > self.budget:
+            _, (_, evicted_size, _, _) = self.entries.popitem(last=False)
+            self.used -= evicted_size
+        self.entries[table_name] = [rows, size, stamp, {}]
+        self.used += size
+
+    def arrays(self, table_name: str, rows: list, stamp):
+        """
+        Returns the cached column arrays of a table.
+
+        Parameters:
+            table_name (str): The name of the table.
+            rows (list): The rows the arrays are built from, which must be the cached rows.
+            stamp: The current stamp of the table storage.
+
+        Returns:
+            dict: The arrays by column position, or None if the rows are not the cached rows of the table.
+        """
+        entry = self.entries.get(table_name)
+        if entry is None or entry[0] is not rows or entry[2] != stamp:
+            return None
+        return entry[3]
+
+    def put_array(self, table_name: str, column: int, array) -> None:
+        """
+        Caches the array of a column of a cached table, if it fits in the budget.
+
+        Parameters:
+            table_name (str): The name of the table.
+            column (int): The position of the column.
+            array (numpy.ndarray): The values of the column.
+        """
+        entry = self.entries.get(table_name)
+        if entry is None or self.used + array.nbytes > self.budget:
+            return
+        entry[1] += array.nbytes
+        entry[3][column] = array
+        self.used += array.nbytes
+
+    def collect(self, table_name: str, rows, stamp):
+        """
+        Passes rows through while collecting them, and caches the table once every row was seen.
+
+        The rows stop being collected as soon as they no longer fit in the budget,
+        and nothing is cached if the caller stops before the last row.
+
+        Parameters:
+            table_name (str): The name of the table.
+            rows (iterable): Every row of the table.
+            stamp: The stamp of the table storage.
+
+        Yields:
+            list: The rows.
+        """
+        collected = [] if self.budget else None
+        for row in rows:
+            if collected is not None:
+                collected.append(row)
+                if len(collected) % 1000 == 0 and self.estimate_size(collected) > self.budget:
+                    collected = None
+            yield row
+        if collected is not None:
+            self.put(table_name, collected, stamp)
+
+    def append(self, table_name: str, row: list, stamp) -> None:
+        """
+        Adds a row inserted into a table to its cached rows, if the table is cached.
+
+        Parameters:
+            table_name (str): The name of the table.
+            row (list): The inserted row.
+            stamp: The stamp of the table storage after the insert.
+        """
+        entry = self.entries.get(table_name)
+        if entry is None:
+            return
+        size = self.estimate_size([row]) - sys.getsizeof([])
+        # The arrays are built again from the rows when they are needed
+        arrays_size = sum(array.nbytes for array in entry[3].values())
+        entry[3] = {}
+        entry[1] -= arrays_size
+        self.used -= arrays_size
+        entry[0].append(row)
+        entry[1] += size
+        entry[2] = stamp
+        self.used += size
+        if self.used > self.budget:
+            self.invalidate(table_name)
+
+    def invalidate(self, table_name: str) -> None:
+        """
+        Removes a table from the cache.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        entry = self.entries.pop(table_name, None)
+        if entry is not None:
+            self.used -= entry[1]
+
+    def clear(self) -> None:
+        """
+        Removes every table from the cache.
+        """
+        self.entries.clear()
+        self.used = 0
+
+    @staticmethod
+    def estimate_size(rows: list) -> int:
+        """
+        Estimates the memory used by a list of rows from a sample of at most 100 rows.
+
+        Parameters:
+            rows (list): The rows.
+
+        Returns:
+            int: The estimated size in bytes.
+        """
+        if not rows:
+            return sys.getsizeof(rows)
+        sample = rows[::max(1, len(rows) // 100)]
+        sample_size = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample)
+        return sys.getsizeof(rows) + sample_size * len(rows) // len(sample)
+
+
+class LRUCache:
+    """
+    A least recently used cache of a fixed number of values, shared by threads.
+
+    Attributes:
+        capacity (int): The maximum number of cached values.
+        entries (OrderedDict): The cached values by key, least recently used first.
+        lock (threading.Lock): Held while the entries are read or changed.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+            capacity (int): The maximum number of cached values.
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns a cached value and marks it as recently used.
+
+        Parameters:
+            key: The key of the value.
+
+        Returns:
+            The value, or None if it is not cached.
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        """
+        Caches a value, dropping the least recently used values beyond the capacity.
+
+        Parameters:
+            key: The key of the value.
+            value: The value.
+        """
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
@@ -0,0 +1,190 @@
+"""
+codec.py
+
+This module provides the RowCodec class that converts the rows of a table between text and values of its data types.
+"""
+
+import csv
+import io
+from itertools import islice
+
+# Converters from text to the values of every data type.
+CONVERTERS = {"int": int, "float": float, "str": str}
+# Error of the values that would split a row of a text table file into several lines.
+LINE_BREAK_ERROR = "Values cannot contain line breaks"
+
+
+class RowCodec:
+    """
+    Converts whole rows of a table following its data types.
+
+    The codec is built once from the schema of the table, so every row is
+    converted in one pass over a tuple of converters instead of looking up the
+    schema and the converter of every value. Text lines are split directly when
+    they have no quoted fields, and only parsed with the csv module otherwise.
+
+    Attributes:
+        data_types (tuple): The data types of the columns.
+        converters (tuple): The converters of the columns.
+        text_columns (tuple): The positions of the str columns.
+    """
+
+    # Number of rows converted at once by decode_rows.
+    BATCH_SIZE = 10000
+
+    def __init__(self, data_types):
+        """
+        Builds the codec of a schema.
+
+        Parameters:
+            data_types (list): The data types of the columns. Columns with unknown
+                data types are accepted, but none of their values can be converted.
+        """
+        self.data_types = tuple(data_types)
+        self.converters = tuple(CONVERTERS.get(data_type, self.invalid) for data_type in self.data_types)
+        self.text_columns = tuple(i for i, data_type in enumerate(self.data_types) if data_type == "str")
+
+    @staticmethod
+    def invalid(value):
+        """
+        Converter of the columns with unknown data types.
+
+        Raises:
+            ValueError: Always.
+        """
+        raise ValueError("Bad input values")
+
+    def decode(self, values) -> list:
+        """
+        Applies the data types to a row.
+
+        Parameters:
+            values (list): The values of the row, as text or input values.
+
+        Returns:
+            list: The row with the data types applied.
+
+        Raises:
+            ValueError: If the row does not follow the schema.
+        """
+        if len(values) != len(self.converters):
+            raise ValueError("Bad input values")
+        try:
+            return [convert(value) for convert, value in zip(self.converters, values)]
+        except (TypeError, ValueError):
+            raise ValueError("Bad input values")
+
+    def check_line_breaks(self, row: list) -> list:
+        """
+        Rejects an input row with a line break in a str value, which text table files cannot store
+        (see encode_line()). Input rows are checked before they are logged or written.
+
+        Parameters:
+            row (list): The row with the data types applied.
+
+        Returns:
+            list: The row.
+
+        Raises:
+            ValueError: If a value contains a line break.
+        """
+        for i in self.text_columns:
+            if "\n" in row[i] or "\r" in row[i]:
+                raise ValueError(LINE_BREAK_ERROR)
+        return row
+
+    def decode_rows(self, rows):
+        """
+        Applies the data types to rows, a batch at a time.
+
+        Parameters:
+            rows (iterable): The rows, as lists of values.
+
+        Yields:
+            list: The rows with the data types applied.
+
+        Raises:
+            ValueError: If a row does not follow the schema or a value contains a line break.
+        """
+        converters = self.converters
+        rows = iter(rows)
+        for batch in iter(lambda: list(islice(rows, self.BATCH_SIZE)), []):
+            if any(len(row) != len(converters) for row in batch):
+                raise ValueError("Bad input values")
+            try:
+                batch = [[convert(value) for convert, value in zip(converters, row)] for row in batch]
+            except (TypeError, ValueError):
+                raise ValueError("Bad input values")
+            if self.text_columns:
+                for row in batch:
+                    self.check_line_breaks(row)
+            yield from batch
+
+    def decode_values(self, values: dict, columns: list) -> dict:
+        """
+        Applies the data types to values given by column name.
+
+        Parameters:
+            values (dict): The values by column name.
+            columns (list): The columns of the table.
+
+        Returns:
+            dict: The values with the data types applied.
+
+        Raises:
+            ValueError: If a column does not exist, a value does not follow its data type or contains a line break.
+        """
+        decoded = {}
+        for key, value in values.items():
+            if key not in columns:
+                raise ValueError("Bad input values")
+            try:
+                decoded[key] = self.converters[columns.index(key)](value)
+            except (TypeError, ValueError):
+                raise ValueError("Bad input values")
+            if isinstance(decoded[key], str) and ("\n" in decoded[key] or "\r" in decoded[key]):
+                raise ValueError(LINE_BREAK_ERROR)
+        return decoded
+
+    def decode_line(self, line: bytes) -> list:
+        """
+        Decodes a line of a text table file into a row with the data types applied.
+
+        Parameters:
+            line (bytes): The line, including the line terminator.
+
+        Returns:
+            list: The row.
+        """
+        text = line.decode("utf-8")
+        if '"' in text:
+            values = next(csv.reader([text], delimiter='|'))
+        else:
+            values = text.rstrip("\r\n").split("|")
+        return self.decode(values)
+
+    def encode_line(self, row: list) -> bytes:
+        """
+        Encodes a row as a line of a text table file, as the csv module would.
+
+        Every row is a single line, because the rows of a text table file are read
+        line by line once they have locators (see CsvStorage.read_rows()).
+
+        Parameters:
+            row (list): The row with the data types applied.
+
+        Returns:
+            bytes: The encoded line, including the line terminator.
+
+        Raises:
+            ValueError: If a value contains a line break.
+        """
+        text = "|".join(map(str, row))
+        if "\r" in text or "\n" in text:
+            raise ValueError(LINE_BREAK_ERROR)
+        # Fields with delimiters or quotes, and a single empty field, have to be quoted.
+        if text.count("|") != len(row) - 1 or '"' in text or not text:
+            buffer = io.StringIO()
+            csv.writer(buffer, delimiter='|').writerow(row)
+            return buffer.getvalue().encode("utf-8")
+        return (text + "\r\n").encode("utf-8")
@@ -0,0 +1,511 @@
+"""
+condition.py
+
+This module provides the Condition class for compiling WHERE conditions into row predicates.
+"""
+
+import ast
+import copy
+import re
+
+from dbms.cache import LRUCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Condition:
+    """
+    A WHERE condition parsed, validated and compiled once per statement.
+
+    The condition uses Python syntax restricted to comparisons, 'and', 'or', 'not',
+    parentheses, column names and literal values, plus 'column BETWEEN low AND high'
+    which is rewritten as 'low <= column <= high'. Column names may be qualified
+    with a table name ('users.age'). Column names are resolved to row indices when
+    the condition is compiled, so evaluating it on a row does not parse strings or
+    build dictionaries.
+
+    A condition may have positional parameters written as '?' in place of literal
+    values. It is then compiled once into a function of the parameter values, and
+    bind() makes conditions for given values without compiling them again.
+
+    Attributes:
+        text (str): The condition string.
+        columns (list): The list of column names of the table.
+        aliases (dict): Other names of the columns, mapped to their names in columns.
+        tree (ast.Expression): The validated syntax tree of the condition.
+        used_columns (list): The positions of the columns the condition reads.
+        parameters (int): The number of parameters of the condition.
+        predicate (function): Takes a row (list) and returns True if the condition holds,
+            or None if the condition has parameters.
+        factory (function): Takes the values of the parameters and returns the predicate, or None
+            if the condition has no parameters.
+    """
+
+    ALLOWED_NODES = (
+        ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+        ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+        ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List,
+    )
+
+    # 'column BETWEEN low AND high', where the column may be qualified with its table.
+    BETWEEN = re.compile(r"(?<![\w.])(\w+(?:\.\w+)?)\s+BETWEEN\s+(\S+)\s+AND\s+(\S+)", re.IGNORECASE)
+    # A parameter, or a string literal that may contain question marks.
+    PARAMETER = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|\?""")
+    # Prefix of the names that parameters get in the syntax tree, followed by their position.
+    PARAMETER_NAME = "__parameter_"
+    # Recently compiled conditions, by text, columns and aliases (see compiled()).
+    CACHE = LRUCache(256)
+
+    # Templates of the compiled predicate and of the function that returns it for the values of the
+    # parameters. BODY is replaced by the condition and MESSAGE by the error message.
+    PREDICATE = """
+def predicate(row):
+    try:
+        return BODY
+    except TypeError:
+        raise ValueError(MESSAGE) from None
+"""
+    FACTORY = """
+def factory(parameters):
+    def predicate(row):
+        try:
+            return BODY
+        except TypeError:
+            raise ValueError(MESSAGE) from None
+    return predicate
+"""
+
+    # Comparison operators usable by indexes, with their symbol and the symbol
+    # obtained when the operands are swapped.
+    OPERATORS = {
+        ast.Eq: ("==", "=="), ast.Lt: ("<", ">"), ast.LtE: ("<=", ">="),
+        ast.Gt: (">", "<"), ast.GtE: (">=", "<="),
+    }
+
+    def __init__(self, text: str, columns: list, aliases: dict = None):
+        """
+        Compiles the condition.
+
+        Parameters:
+            text (str): The condition, for example "age > 5 and (name == 'abc' or id < 10)".
+            columns (list): The list of column names of the table.
+            aliases (dict): Other names of the columns, mapped to their names in columns, or None.
+
+        Raises:
+            ValueError: If the condition is not valid or references unknown columns.
+        """
+        self.text = self.BETWEEN.sub(r"\2 <= \1 <= \3", text)
+        self.columns = columns
+        self.aliases = aliases or {}
+        self.parameters = self.count_parameters(self.text)
+        try:
+            self.tree = self.parse()
+        except SyntaxError:
+            raise ValueError(f"Invalid condition '{text}'")
+        self.validate(self.tree)
+        self.used_columns = sorted({
+            columns.index(node.id) for node in ast.walk(self.tree)
+            if isinstance(node, ast.Name) and not node.id.startswith(self.PARAMETER_NAME)})
+        function = self.compile(self.tree)
+        self.predicate = None if self.parameters else function
+        self.factory = function if self.parameters else None
+        self._mask = None
+
+    @classmethod
+    def compiled(cls, text: str, columns: list, aliases: dict = None, parameters: list = None):
+        """
+        Returns a compiled condition, reusing the one compiled last time for the same text and columns.
+
+        Parameters:
+            text (str): The condition.
+            columns (list): The list of column names of the table.
+            aliases (dict): Other names of the columns, mapped to their names in columns, or None.
+            parameters (list): The values of the parameters of the condition, or None.
+
+        Returns:
+            Condition: The condition, with its parameters bound.
+
+        Raises:
+            ValueError: If the condition is not valid or the number of values is not the number of parameters.
+        """
+        key = (text, tuple(columns), tuple(sorted((aliases or {}).items())))
+        condition = cls.CACHE.get(key)
+        if condition is None:
+            condition = cls(text, columns, aliases)
+            cls.CACHE.put(key, condition)
+        if parameters or condition.parameters:
+            condition = condition.bind(parameters or [])
+        return condition
+
+    @classmethod
+    def count_parameters(cls, text: str) -> int:
+        """
+        Returns the number of parameters of a condition.
+
+        Parameters:
+            text (str): The condition.
+        """
+        return sum(1 for match in cls.PARAMETER.finditer(text) if match.group(1) is None)
+
+    @classmethod
+    def substitute(cls, text: str, values: list) -> str:
+        """
+        Writes the values of the parameters of a condition in their place, as literals.
+
+        Parameters:
+            text (str): The condition.
+            values (list): The values of the parameters, in order.
+
+        Returns:
+            str: The condition without parameters.
+        """
+        values = iter(values)
+        return cls.PARAMETER.sub(lambda match: match.group(1) or repr(next(values)), text)
+
+    def bind(self, values: list):
+        """
+        Returns the condition for given values of its parameters, without compiling it again.
+
+        Parameters:
+            values (list): The values of the parameters, in order.
+
+        Returns:
+            Condition: The condition without parameters.
+
+        Raises:
+            ValueError: If the number of values is not the number of parameters.
+        """
+        if len(values) != self.parameters:
+            raise ValueError(f"The condition has {self.parameters} parameters but {len(values)} values were given")
+        bound = copy.copy(self)
+        bound.text = self.substitute(self.text, values)
+        bound.parameters = 0
+        bound.tree = bound.parse()
+        bound.predicate = self.factory(list(values))
+        bound.factory = None
+        bound._mask = None
+        return bound
+
+    def __call__(self, row: list) -> bool:
+        """
+        Evaluates the condition on a row.
+
+        Parameters:
+            row (list): The values of the row.
+
+        Returns:
+            bool: True if the condition holds for the row.
+
+        Raises:
+            ValueError: If the values cannot be compared.
+        """
+        return self.predicate(row)
+
+    def __reduce__(self):
+        """
+        Pickles the condition as its text, since compiled predicates cannot be pickled.
+        It is compiled again when it is unpickled, for example by a worker process.
+        """
+        return Condition, (self.text, self.columns, self.aliases)
+
+    def parse(self) -> ast.Expression:
+        """
+        Parses the condition string into a syntax tree.
+
+        Qualified column names are turned into single names ('users.age'), aliases
+        are replaced by the names of their columns, and parameters are named after
+        their position (see PARAMETER_NAME).
+
+        Returns:
+            ast.Expression: The syntax tree.
+
+        Raises:
+            SyntaxError: If the condition string is not a valid expression.
+        """
+        aliases = self.aliases
+
+        class NameResolver(ast.NodeTransformer):
+            def visit_Attribute(self, node):
+                if isinstance(node.value, ast.Name):
+                    return ast.copy_location(ast.Name(id=f"{node.value.id}.{node.attr}", ctx=ast.Load()), node)
+                return self.generic_visit(node)
+
+            def visit_Name(self, node):
+                if node.id in aliases:
+                    return ast.copy_location(ast.Name(id=aliases[node.id], ctx=ast.Load()), node)
+                return node
+
+        positions = iter(range(self.parameters))
+        text = self.PARAMETER.sub(
+            lambda match: match.group(1) or f"{self.PARAMETER_NAME}{next(positions)}", self.text)
+        return NameResolver().visit(ast.parse(text.strip(), mode="eval"))
+
+    def conjuncts(self, node: ast.AST = None):
+        """
+        Yields the simple comparisons that must all hold for the condition to be true.
+
+        Only comparisons between a column and a literal value that are joined
+        with 'and' at the top level of the condition are yielded. The column is
+        always returned on the left, so "5 < age" is yielded as ("age", ">", 5).
+
+        Parameters:
+            node (ast.AST): A node of the syntax tree to use instead of the whole condition, or None.
+
+        Yields:
+            tuple: The column name, the operator ("==", "<", "<=", ">" or ">=") and the value.
+        """
+        yield from self._conjuncts(self.tree.body if node is None else node)
+
+    def _conjuncts(self, node: ast.AST):
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            for value in node.values:
+                yield from self._conjuncts(value)
+        elif isinstance(node, ast.Compare):
+            operands = [node.left] + node.comparators
+            for left, op, right in zip(operands, node.ops, operands[1:]):
+                if type(op) not in self.OPERATORS:
+                    continue
+                symbol, flipped = self.OPERATORS[type(op)]
+                if isinstance(left, ast.Name) and self.is_literal(right):
+                    yield left.id, symbol, ast.literal_eval(right)
+                elif isinstance(right, ast.Name) and self.is_literal(left):
+                    yield right.id, flipped, ast.literal_eval(left)
+
+    def bounds(self, column: str):
+        """
+        Returns the range of values of a column allowed by the condition.
+
+        The range combines every comparison of the column with a literal that is
+        AND'ed at the top level of the condition, keeping the tightest bounds.
+
+        Parameters:
+            column (str): The name of the column.
+
+        Returns:
+            tuple: (low, low_inclusive, high, high_inclusive), where a missing bound
+            is None, or None if the condition does not restrict the column.
+        """
+        comparisons = [(operator, value) for name, operator, value in self.conjuncts() if name == column]
+        if not comparisons:
+            return None
+        return self.combine(comparisons)
+
+    @staticmethod
+    def combine(comparisons: list) -> tuple:
+        """
+        Combines comparisons of a column with literal values into the range of values that satisfy all of them.
+
+        Parameters:
+            comparisons (list): The comparisons, as (operator, value).
+
+        Returns:
+            tuple: (low, low_inclusive, high, high_inclusive), where a missing bound is None.
+        """
+        low, low_inclusive, high, high_inclusive = None, True, None, True
+        for operator, value in comparisons:
+            if operator in ("==", ">", ">="):
+                inclusive = operator != ">"
+                if low is None or value > low or (value == low and not inclusive):
+                    low, low_inclusive = value, inclusive
+            if operator in ("==", "<", "<="):
+                inclusive = operator != "<"
+                if high is None or value < high or (value == high and not inclusive):
+                    high, high_inclusive = value, inclusive
+        return low, low_inclusive, high, high_inclusive
+
+    def is_literal(self, node: ast.AST) -> bool:
+        """
+        Returns whether an expression node is a single literal value.
+
+        Parameters:
+            node (ast.AST): The expression node.
+        """
+        return isinstance(node, ast.Constant) or (
+            isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant))
+
+    def validate(self, tree: ast.Expression) -> None:
+        """
+        Checks that the syntax tree only contains the allowed nodes and known columns.
+
+        Parameters:
+            tree (ast.Expression): The syntax tree of the condition.
+
+        Raises:
+            ValueError: If the condition is not valid.
+        """
+        for node in ast.walk(tree):
+            if not isinstance(node, self.ALLOWED_NODES):
+                raise ValueError(f"Invalid condition '{self.text}'")
+            if isinstance(node, ast.Name) and node.id not in self.columns \
+                    and not node.id.startswith(self.PARAMETER_NAME):
+                raise ValueError(f"Unknown column '{node.id}' in condition")
+            if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) \
+                    and not isinstance(node.operand, ast.Constant):
+                raise ValueError(f"Invalid condition '{self.text}'")
+        if not self.is_boolean(tree.body):
+            raise ValueError(f"Condition '{self.text}' does not return a boolean")
+
+    def is_boolean(self, node: ast.AST) -> bool:
+        """
+        Returns whether an expression node evaluates to a boolean.
+
+        Parameters:
+            node (ast.AST): The expression node.
+        """
+        if isinstance(node, ast.Compare):
+            return True
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, bool)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return self.is_boolean(node.operand)
+        if isinstance(node, ast.BoolOp):
+            return all(self.is_boolean(value) for value in node.values)
+        return False
+
+    def compile(self, tree: ast.Expression):
+        """
+        Compiles the syntax tree into a function of the row.
+
+        Every column name is replaced by a subscript of the row with the index of
+        the column, and the expression becomes the body of the PREDICATE function,
+        which raises ValueError when the values cannot be compared (for example a
+        str column with a number). The parameters are replaced by subscripts of
+        the list of their values, and the predicate is returned by FACTORY.
+
+        Parameters:
+            tree (ast.Expression): The validated syntax tree of the condition.
+
+        Returns:
+            function: The predicate, or the function that returns it if the condition has parameters.
+        """
+        indices = {column: i for i, column in enumerate(self.columns)}
+        prefix = self.PARAMETER_NAME
+
+        class ColumnResolver(ast.NodeTransformer):
+            def visit_Name(self, node):
+                if node.id.startswith(prefix):
+                    name, index = "parameters", int(node.id[len(prefix):])
+                else:
+                    name, index = "row", indices[node.id]
+                return ast.copy_location(
+                    ast.Subscript(
+                        value=ast.Name(id=name, ctx=ast.Load()),
+                        slice=ast.Constant(index),
+                        ctx=ast.Load()),
+                    node)
+
+        body = ColumnResolver().visit(self.parse().body)
+        message = f"Error evaluating the condition '{self.text}'"
+
+        class TemplateFiller(ast.NodeTransformer):
+            def visit_Name(self, node):
+                if node.id == "BODY":
+                    return body
+                if node.id == "MESSAGE":
+                    return ast.Constant(message)
+                return node
+
+        name = "factory" if self.parameters else "predicate"
+        template = TemplateFiller().visit(ast.parse(self.FACTORY if self.parameters else self.PREDICATE))
+        ast.fix_missing_locations(template)
+        namespace = {"__builtins__": {}, "TypeError": TypeError, "ValueError": ValueError}
+        exec(compile(template, "<condition>", "exec"), namespace)
+        return namespace[name]
+
+    def mask(self, arrays: list, length: int):
+        """
+        Evaluates the condition on whole columns at once with NumPy.
+
+        Comparisons become element-wise comparisons of the column arrays, 'and',
+        'or' and 'not' become '&', '|' and numpy.logical_not, and 'in' becomes
+        numpy.isin, which requires a tuple or list of values on its right. The
+        mask function is compiled on first use.
+
+        Parameters:
+            arrays (list): The column arrays by column position. Columns the condition
+                does not use may be None.
+            length (int): The number of rows.
+
+        Returns:
+            numpy.ndarray: A boolean mask with one value per row.
+
+        Raises:
+            RuntimeError: If NumPy is not installed.
+            ValueError: If the values cannot be compared, the mask is not boolean or the
+                condition cannot be evaluated on arrays.
+        """
+        if np is None:
+            raise RuntimeError("NumPy is not installed")
+        if self._mask is None:
+            self._mask = self.compile_mask()
+        try:
+            mask = np.asarray(self._mask(arrays))
+        except TypeError:
+            raise ValueError(f"Error evaluating the condition '{self.text}'") from None
+        # Any other mask would select rows by position instead of filtering them.
+        if mask.dtype != np.bool_:
+            raise ValueError(f"Condition '{self.text}' does not return a boolean")
+        return np.broadcast_to(mask, (length,))
+
+    def compile_mask(self):
+        """
+        Compiles the syntax tree into a function of the column arrays.
+
+        Returns:
+            function: The mask function.
+
+        Raises:
+            ValueError: If the right operand of 'in' is not a tuple or list of values.
+        """
+        indices = {column: i for i, column in enumerate(self.columns)}
+
+        def column(name):
+            return ast.Subscript(value=ast.Name(id="arrays", ctx=ast.Load()),
+                                 slice=ast.Constant(indices[name]), ctx=ast.Load())
+
+        def logical_not(node):
+            # '~' would turn the constants True and False into the integers -2 and -1
+            function = ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr="logical_not", ctx=ast.Load())
+            return ast.Call(func=function, args=[node], keywords=[])
+
+        def translate(node):
+            if isinstance(node, ast.Name):
+                return column(node.id)
+            if isinstance(node, ast.BoolOp):
+                op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+                result = translate(node.values[0])
+                for value in node.values[1:]:
+                    result = ast.BinOp(left=result, op=op, right=translate(value))
+                return result
+            if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+                return logical_not(translate(node.operand))
+            if isinstance(node, ast.Compare):
+                operands = [node.left] + node.comparators
+                result = None
+                for left, op, right in zip(operands, node.ops, operands[1:]):
+                    if isinstance(op, (ast.In, ast.NotIn)):
+                        if not isinstance(right, (ast.Tuple, ast.List)):
+                            # Row by row this is an error, or a substring test for a str
+                            raise ValueError(f"Condition '{self.text}' cannot be evaluated on arrays")
+                        isin = ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr="isin", ctx=ast.Load())
+                        part = ast.Call(func=isin, args=[translate(left), translate(right)], keywords=[])
+                        if isinstance(op, ast.NotIn):
+                            part = logical_not(part)
+                    else:
+                        part = ast.Compare(left=translate(left), ops=[op], comparators=[translate(right)])
+                    result = part if result is None else ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+                return result
+            if isinstance(node, (ast.Tuple, ast.List)):
+                return ast.List(elts=[translate(element) for element in node.elts], ctx=ast.Load())
+            return node
+
+        body = translate(self.parse().body)
+        arguments = ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg="arrays")], kwonlyargs=[],
+            kw_defaults=[], defaults=[])
+        expression = ast.Expression(body=ast.Lambda(args=arguments, body=body))
+        ast.fix_missing_locations(expression)
+        return eval(compile(expression, "<condition>", "eval"), {"__builtins__": {}, "np": np})
@@ -1,6 +1,7 @@
 import os
 import pickle
 from dbms.file_manager import DatabaseFileManager
+from dbms.partition import Partitioning
 from dbms.table import Table
 from dbms.exeptions import DroppedDatabaseError
 
@@ -16,21 +17,59 @@ class Database:
         file_path (str): The path to the database file.
         metadata (dict): The metadata of the database.
         tables (dict): The tables in the database.
+        partitions (dict): The names of the partitions of the partitioned tables, mapped to the name of their table.
+        storage (str): The storage engine of new tables ("csv" or "columnar").
+        vectorized (bool): Whether full table scans are evaluated on NumPy arrays when NumPy is installed.
     '''
     
-    def __init__(self, db_name:str):
+    def __init__(self, db_name:str, fsync_policy:str = "never", storage:str = "csv", vectorized:bool = True,
+                 cache_size:int = 64 * 1024 * 1024, wal:bool = False, vacuum_threshold:float = 0.25, workers:int = None):
         '''
         Initializes the database.
         
         Parameters:
             db_name (str): The name of the database.
+            fsync_policy (str): When table writes are forced to disk ("never" or "always").
+            storage (str): The storage engine of new tables that do not choose one ("csv" or "columnar").
+            vectorized (bool): Whether full table scans are evaluated on NumPy arrays when NumPy is installed.
+            cache_size (int): The memory budget in bytes for tables kept in memory. 0 disables the cache.
+            wal (bool): Whether changes are written to a write-ahead log and applied to the tables
+                by background checkpoints. The log is replayed when the database is opened.
+            vacuum_threshold (float): The fraction of deleted rows of a table above which it is rewritten without them.
+            workers (int): The number of worker processes that scan large tables, or None for the number of CPUs.
+                1 disables parallel scans.
         '''
+        if storage not in DatabaseFileManager.STORAGE_ENGINES:
+            raise ValueError("Invalid storage")
         self.db_name = db_name
-        self.file_manager = DatabaseFileManager(self)
+        self.storage = storage
+        self.vectorized = vectorized
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.file_manager = DatabaseFileManager(
+            self, fsync_policy, cache_size, wal, vacuum_threshold=vacuum_threshold, workers=workers)
         self.file_path: str = self.file_manager.file_path
-        self.metadata = self.load_metadata(self.file_manager.file_path + "metadata")
+        self.metadata = {}
+        self.partitions = {}
+        self.tables = {}
+        self.file_manager.open()
+
+    def reload(self) -> None:
+        '''
+        Loads the metadata from its file, when it is opened or after another process changed it.
+        '''
+        self.metadata = self.load_metadata(self.file_path + "metadata")
+        self.partitions = {
+            partition: name for name, metadata_table in self.metadata.items()
+            for partition in metadata_table.get("partitioning", {}).get("tables", [])}
         self.tables = {name: Table(name, self) for name in self.metadata.keys()}
 
+    def close(self) -> None:
+        '''
+        Applies the write-ahead log to the tables and closes it.
+        '''
+        self.file_manager.close()
+
     def save_metadata(self ,metadata:dict) -> None:
         """
         Overrides the metadata to the metadata file.
@@ -58,7 +97,8 @@ class Database:
         except FileNotFoundError:
             raise FileNotFoundError("Metadata file not found")
 
-    def create_table(self, table_name: str, columns:list, data_types:list , primary_key:list, foreing_keys) -> None:
+    def create_table(self, table_name: str, columns:list, data_types:list , primary_key:list, foreing_keys, storage:str = None,
+                     partitioning:dict = None, output=None) -> None:
         """
         Creates a new table in the database.
 
@@ -67,56 +107,140 @@ class Database:
             columns (list): The list of column names.
             data_types (list): The list of data types for the columns.
             primary_key (str): The primary key column.
-            foreign_keys (dict): The foreign keys for the table.
+            foreign_keys (dict): The foreign keys for the table, mapping every foreign key column
+                to the referenced table and column as [table_name, column].
+            storage (str): The storage engine ("csv" or "columnar"), or None for the database default.
+            partitioning (dict): The "kind" ("hash" or "range"), "column" and "values" of the partitioning
+                of the table, or None if it is not partitioned (see Partitioning.define()).
+            output (file): Where the message is printed, or None for sys.stdout.
         """
 
 
-        if table_name in self.metadata.keys():
+        if table_name in self.metadata.keys() or table_name in self.partitions:
             raise ValueError("Table already exists")
+        if storage is None:
+            storage = self.storage
+        if storage not in self.file_manager.STORAGE_ENGINES:
+            raise ValueError("Invalid storage")
+        for column, (referenced_table, referenced_column) in foreing_keys.items():
+            if column not in columns:
+                raise ValueError(f"Column {column} not found")
+            if referenced_table not in self.metadata.keys():
+                raise ValueError(f"Table {referenced_table} not found")
+            if referenced_column not in self.metadata[referenced_table]["columns"]:
+                raise ValueError(f"Column {referenced_column} not found")
         
         metadata_table = {
             "columns": columns,
             "data_types": data_types,
             "primary_key": primary_key,
-            "foreign_keys": foreing_keys
+            "foreign_keys": foreing_keys,
+            "storage": storage
         }
+        if partitioning is not None:
+            metadata_table["partitioning"] = Partitioning.define(
+                table_name, partitioning["kind"], partitioning["column"], partitioning["values"], columns, data_types)
 
         self.metadata[table_name] = metadata_table
+        created = []
+        try:
+            for name in self.stored_tables(table_name):
+                self.partitions[name] = table_name
+                self.file_manager.create_csv(name)
+                created.append(name)
+        except Exception:
+            for name in created:
+                self.file_manager.drop_csv(name)
+            for name in self.stored_tables(table_name):
+                self.partitions.pop(name, None)
+            del self.metadata[table_name]
+            raise
         self.tables[table_name] = Table(table_name, self)
         self.save_metadata(self.metadata)
-        self.file_manager.create_csv(table_name)
-        print(f"Table {table_name} created")
+        print(f"Table {table_name} created", file=output)
 
-    def drop_table(self, table_name:str) -> None:
+    def drop_table(self, table_name:str, output=None) -> None:
         '''
         Drops a table from the database.
 
         Parameters:
             table_name (str): The name of the table.
+            output (file): Where the message is printed, or None for sys.stdout.
         '''
         if table_name not in self.metadata.keys():
             raise ValueError("Table not found")
         
+        for name in self.stored_tables(table_name):
+            self.file_manager.drop_csv(name)
+            self.partitions.pop(name, None)
         del self.metadata[table_name]
         del self.tables[table_name]
         self.save_metadata(self.metadata)
-        self.file_manager.drop_csv(table_name)
-        print(f"Table {table_name} dropped")
+        print(f"Table {table_name} dropped", file=output)
+
+    def create_index(self, index_name:str, table_name:str, column:str, output=None) -> None:
+        '''
+        Creates a sorted secondary index on a column of a table.
+
+        Parameters:
+            index_name (str): The name of the index.
+            table_name (str): The name of the table.
+            column (str): The indexed column.
+            output (file): Where the message is printed, or None for sys.stdout.
+        '''
+        if table_name not in self.metadata.keys():
+            raise ValueError("Table not found")
+        
+        metadata_table = self.metadata[table_name]
+        if column not in metadata_table["columns"]:
+            raise ValueError(f"Column {column} not found")
+        indexes = metadata_table.setdefault("indexes", {})
+        if index_name in indexes:
+            raise ValueError("Index already exists")
+
+        indexes[index_name] = column
+        try:
+            for name in self.stored_tables(table_name):
+                self.file_manager.create_index(name, index_name)
+        except Exception:
+            del indexes[index_name]
+            raise
+        self.save_metadata(self.metadata)
+        print(f"Index {index_name} created", file=output)
     
     def get_info_table(self, table_name:str) -> dict:
         '''
         Returns the metadata of the table.
 
         Parameters:
-            table_name (str): The name of the table.
+            table_name (str): The name of the table, or of a partition of a partitioned table.
 
         Returns:
-            dict: The metadata of the table.
+            dict: The metadata of the table. Partitions share the metadata of their table.
         '''
+        table_name = self.partitions.get(table_name, table_name)
         if table_name not in self.metadata.keys():
             raise ValueError("Table not found")
         
         return self.metadata[table_name]
+
+    def stored_tables(self, table_name:str = None) -> list:
+        '''
+        Returns the tables whose rows are stored in files: the partitions of the partitioned tables
+        and the other tables themselves.
+
+        Parameters:
+            table_name (str): The name of a table, or None for every table of the database.
+
+        Returns:
+            list: The names of the tables or partitions.
+        '''
+        names = [table_name] if table_name is not None else list(self.metadata.keys())
+        stored = []
+        for name in names:
+            partitioning = self.metadata[name].get("partitioning")
+            stored.extend(partitioning["tables"] if partitioning is not None else [name])
+        return stored
     
     def get_info_database(self) -> dict:
         '''
@@ -136,17 +260,27 @@ class Database:
         '''
         return list(self.metadata.keys())    
 
-    def drop_database(self) -> None:
+    def drop_database(self, output=None) -> None:
         '''
         Drops the database.
+
+        Parameters:
+            output (file): Where the messages are printed, or None for sys.stdout.
+
+        Raises:
+            ValueError: If another process has the database open.
         '''
+        if not self.file_manager.claim():
+            raise ValueError("The database is open in another process")
         try:
-            for table in self.metadata.keys():
-                self.drop_table(table)
+            for table in list(self.metadata.keys()):
+                self.drop_table(table, output)
         except:
             pass
         self.metadata = {}
         self.tables = {}
+        self.file_manager.drop_wal()
+        self.file_manager.drop_locks()
         os.remove(self.file_path + "metadata")
         os.rmdir(self.file_path)
 
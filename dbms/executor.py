@@ -1,7 +1,10 @@
-from dbms.database import Database
+import contextlib
+import csv
 
-import operator
-import re
+from dbms.database import Database
+from dbms.condition import Condition
+from dbms.join import Join
+from dbms.statement import PreparedStatement, StatementCache
 
 class Executor:
     """
@@ -11,11 +14,29 @@ class Executor:
         db (Database): The database object.
         metadata (dict): The metadata of the database.
         file_path (str): The path to the database file.
+        show_rows (function): Called with the column names and an iterator over the rows selected by
+            every SELECT, or None to print them as tables.
+        output (file): Where the statements print their messages and tables, or None for sys.stdout.
+        prepared (dict): The statements prepared with PREPARE, by name.
+        autocommit (bool): Whether the log is committed after every statement, or only once the
+            statements run under single_lock() end.
     """
-    def __init__(self, db):
+
+    # Commands that change the metadata of the database, so no other statement runs at the same time.
+    SCHEMA_COMMANDS = (2, 7, 8, 9, 13)
+    # Commands that change the rows of the table named by their first argument.
+    WRITE_COMMANDS = (3, 5, 6, 10, 11, 12)
+    # Recently parsed statements, shared by the executors of the process.
+    STATEMENTS = StatementCache()
+
+    def __init__(self, db, show_rows=None, output=None):
         self.db = db
         self.metadata = db.metadata
         self.file_path = db.file_path
+        self.show_rows = show_rows
+        self.output = output
+        self.prepared = {}
+        self.autocommit = True
     
     def execute(self, command, *args):
         """
@@ -25,12 +46,63 @@ class Executor:
             command (int): The command to execute.
             args (tuple): The arguments for the command.
         """
+        file_manager = self.db.file_manager
+        reads, writes, schema = self.statement_locks(command, args)
+        with file_manager.locked(reads, writes, schema):
+            if command == 16:
+                command, *args = self.prepared_statement(args[0]).bind(args[1], self.db)
+            self.dispatch(command, args)
+        # The log is committed outside the lock, so statements of other threads
+        # that are committed meanwhile are forced to disk with the same fsync.
+        if self.autocommit:
+            file_manager.commit()
 
+    @contextlib.contextmanager
+    def single_lock(self):
+        """
+        Runs the statements executed meanwhile under one lock with one commit.
+
+        No statement of another thread or process runs until the block ends, and
+        the log is committed once at the end instead of after every statement.
+        This is not a transaction: nothing is rolled back, so if a statement fails,
+        the statements before it keep their changes.
+        """
+        file_manager = self.db.file_manager
+        with file_manager.locked(schema=True):
+            self.autocommit = False
+            try:
+                yield
+            finally:
+                self.autocommit = True
+        file_manager.commit()
 
+    def run(self, text: str):
+        """
+        Executes a statement given as text, parsing it only if it is not in the statement cache.
+
+        Parameters:
+            text (str): The statement.
+        """
+        statement = self.STATEMENTS.parse(text)
+        if isinstance(statement, PreparedStatement):
+            if statement.parameters:
+                raise ValueError("Statements with parameters must be prepared with PREPARE and run with EXECUTE")
+            statement = statement.statement
+        self.execute(*statement)
+
+    def dispatch(self, command, args):
+        """
+        Executes a parsed statement once its tables are locked.
+
+        Parameters:
+            command (int): The command to execute.
+            args (tuple): The arguments for the command.
+        """
         match command:
             case 2:
                 self.create_table(
-                    args[0], args[1]["columns"], args[1]["data_types"], args[1]["primary_key"], args[1].get("foreign_keys", []))
+                    args[0], args[1]["columns"], args[1]["data_types"], args[1]["primary_key"], args[1].get("foreign_keys", {}),
+                    args[1].get("storage"), args[1].get("partitioning"))
             case 3:
                 self.insert_into(*args)
             case 4:
@@ -43,40 +115,73 @@ class Executor:
                 self.drop_table(args[0])
             case 8:
                 self.drop_database()
+            case 9:
+                self.create_index(args[0], args[1]["name"], args[1]["column"])
+            case 10:
+                self.insert_rows(*args)
+            case 11:
+                self.copy_from(args[0], args[1]["file"], args[1]["header"])
+            case 12:
+                self.vacuum(args[0])
+            case 13:
+                self.analyze(args[0])
+            case 14:
+                self.explain(args[0])
+            case 15:
+                self.prepare(args[0], args[1])
+            case 17:
+                self.deallocate(args[0])
             case _:
                 raise ValueError("Invalid command")
-    
-    @staticmethod
-    def condition_fn(row: list, metadata: dict, condition_str: str) -> bool:
+
+    def statement_locks(self, command, args) -> tuple:
         """
-        Evalúa una condición en forma de string usando la sintaxis de Python.
-        La condición puede incluir operadores lógicos (and, or, not), comparaciones y paréntesis.
-        
+        Finds what a statement must lock before it runs.
+
+        Parameters:
+            command (int): The command to execute.
+            args (tuple): The arguments for the command.
+
+        Returns:
+            tuple: The names of the tables the statement reads, the names of the tables it changes,
+            and whether it changes the metadata.
+        """
+        if command in self.SCHEMA_COMMANDS:
+            return [], [], True
+        if command in self.WRITE_COMMANDS:
+            return [], [args[0]], False
+        if command == 4:
+            clauses = args[3] if len(args) > 3 and args[3] else {}
+            return [args[0]] + ([clauses["join"]] if "join" in clauses else []), [], False
+        if command == 16:
+            statement = self.prepared_statement(args[0]).statement
+            return self.statement_locks(statement[0], statement[1:])
+        if command == 14:
+            # EXPLAIN runs the statement as a query, without changing its table.
+            reads, writes, _ = self.statement_locks(args[0][0], args[0][1:])
+            return reads + writes, [], False
+        return [], [], False
+
+    def compile_condition(self, table_name: str, condition_str):
+        """
+        Compiles the condition of a statement once, before any row is scanned.
+
         Parameters:
-            row (list): Los valores de la fila.
-            metadata (dict): Un diccionario que contiene la lista de columnas (bajo la clave "columns").
-            condition_str (str): La condición a evaluar, por ejemplo "col1 > 5 and (col2 == 'abc' or col3 < 10)".
-            
+            table_name (str): The name of the table.
+            condition_str (list): The condition string, as returned by the parser, or the compiled condition.
+
         Returns:
-            bool: True si la condición se cumple para la fila, False en caso contrario.
-        
-        Raises:
-            ValueError: Si la evaluación de la condición falla o no retorna un valor booleano.
+            Condition: The compiled condition, or None if the statement has no condition.
         """
-        # Construir un entorno mapeando cada columna a su valor correspondiente de la fila.
-        env = {col: row[i] for i, col in enumerate(metadata["columns"])}
-        
-        try:
-            result = eval(condition_str, {"__builtins__": None}, env)
-            
-            if not isinstance(result, bool):
-                raise ValueError("La expresión de condición no devolvió un booleano.")
-            
-            return result
-        except Exception as e:
-            raise ValueError(f"Error evaluando la condición '{condition_str}'")
-        
-    def create_table(self, table_name: str, columns: list, data_types: list, primary_key: str, foreign_keys=None):
+        if condition_str is None:
+            return None
+        if isinstance(condition_str, Condition):
+            # Compiled when a prepared statement was bound.
+            return condition_str
+        return Condition.compiled(",".join(condition_str), self.db.get_info_table(table_name)["columns"])
+
+    def create_table(self, table_name: str, columns: list, data_types: list, primary_key: str, foreign_keys=None, storage=None,
+                     partitioning=None):
         '''Creates a table in the database.
         
         Parameters:
@@ -84,12 +189,25 @@ class Executor:
             columns (list): The list of columns.
             data_types (list): The list of data types for the columns.
             primary_key (str): The primary key column.
-            foreign_keys (list): The list of foreign keys.
+            foreign_keys (dict): The referenced table and column of every foreign key column.
+            storage (str): The storage engine, or None for the database default.
+            partitioning (dict): The kind, column and values of the partitioning, or None for an unpartitioned table.
         
         '''
         if foreign_keys is None:
-            foreign_keys = []
-        self.db.create_table(table_name, columns, data_types, primary_key, foreign_keys)
+            foreign_keys = {}
+        self.db.create_table(table_name, columns, data_types, primary_key, foreign_keys, storage, partitioning,
+                             self.output)
+    
+    def create_index(self, table_name: str, index_name: str, column: str):
+        '''Creates a secondary index on a column of a table.
+        
+        Parameters:
+            table_name (str): The name of the table.
+            index_name (str): The name of the index.
+            column (str): The indexed column.
+        '''
+        self.db.create_index(index_name, table_name, column, self.output)
     
     def insert_into(self, table_name: str, values: list):
         '''Inserts a row into the table.
@@ -100,8 +218,39 @@ class Executor:
         '''
         if table_name not in self.db.tables:
             raise ValueError("Table not found")
-        self.db.tables[table_name].insert_row(values)
+        self.db.tables[table_name].insert_row(values, self.output)
     
+    def insert_rows(self, table_name: str, rows: list):
+        '''Inserts several rows into the table at once.
+        
+        Parameters:
+            table_name (str): The name of the table.
+            rows (list): The lists of values to insert.
+        '''
+        if table_name not in self.db.tables:
+            raise ValueError("Table not found")
+        self.db.tables[table_name].insert_rows(rows, self.output)
+
+    def copy_from(self, table_name: str, file_path: str, header: bool = False):
+        '''Inserts the rows of a comma separated file into the table.
+        
+        Parameters:
+            table_name (str): The name of the table.
+            file_path (str): The path to the file.
+            header (bool): Whether the first line of the file holds the column names.
+        '''
+        if table_name not in self.db.tables:
+            raise ValueError("Table not found")
+        try:
+            file = open(file_path, newline="", encoding="utf-8")
+        except FileNotFoundError:
+            raise ValueError(f"File '{file_path}' not found")
+        with file:
+            rows = csv.reader(file)
+            if header:
+                next(rows, None)
+            self.db.tables[table_name].insert_rows(rows, self.output)
+
     def update(self, table_name: str, update_values:dict, condition_str: str ):
         '''Updates rows in the table based on the condition.
         
@@ -112,11 +261,8 @@ class Executor:
         '''
         if table_name not in self.db.tables:
             raise ValueError("Table not found")
-        if condition_str != None:
-            condition_str = "".join(condition_str)
-        else:
-            condition_str = "True"
-        self.db.tables[table_name].update(self.condition_fn, condition_str, update_values)
+        condition = self.compile_condition(table_name, condition_str)
+        self.db.tables[table_name].update(condition, update_values, self.output)
 
     def delete(self, table_name: str, condition_str: list):
         '''Deletes rows from the table based on the condition.
@@ -128,13 +274,10 @@ class Executor:
         
         if table_name not in self.db.tables:
             raise ValueError("Table not found")
-        if condition_str != None:
-            condition_str = "".join(condition_str)
-        else:
-            condition_str = "True"
-        self.db.tables[table_name].delete(self.condition_fn, condition_str)
+        condition = self.compile_condition(table_name, condition_str)
+        self.db.tables[table_name].delete(condition, self.output)
 
-    def select(self, table_name: str, columns: list, condition_str: str = None):
+    def select(self, table_name: str, columns: list, condition_str: str = None, clauses: dict = None):
 
         """
         Selects rows from a table based on columns and conditions.
@@ -143,27 +286,120 @@ class Executor:
             table_name (str): The name of the table.
             columns (list): The list of columns to select. Use ['*'] to select all columns.
             condition_str (str): The condition string to pass to the condition function.
-
-        Returns:
-            list: The selected rows.
+            clauses (dict): The other clauses of the statement: "join", "on", "group_by", "order_by",
+                "limit" and "offset".
         """
         if table_name not in self.db.tables:
             raise ValueError("Table not found")
-        table = self.db.tables[table_name]
-        if condition_str != None:
-            condition_str = "".join(condition_str)  
-            table.select(columns, self.condition_fn, condition_str)
+        if clauses is None:
+            clauses = {}
+        if "join" in clauses:
+            join = Join(self.db, table_name, clauses["join"], clauses.get("on"))
+            condition_text = ",".join(condition_str) if condition_str is not None else None
+            headers, rows = join.select(
+                columns, condition_text, clauses.get("limit"), clauses.get("offset", 0), clauses.get("group_by"),
+                clauses.get("order_by"))
+            self.show(table_name, headers, rows)
+            return
+        condition = self.compile_condition(table_name, condition_str)
+        rows = self.db.tables[table_name].select_rows(
+            columns, condition, clauses.get("limit"), clauses.get("offset", 0), clauses.get("group_by"),
+            clauses.get("order_by"))
+        self.show(table_name, self.db.get_info_table(table_name)["columns"] if columns == ['*'] else columns, rows)
+
+    def show(self, table_name: str, headers: list, rows):
+        '''Prints the selected rows, or hands them to show_rows.
+        
+        Parameters:
+            table_name (str): The name of the table.
+            headers (list): The names of the selected columns.
+            rows (iterable): The selected rows.
+        '''
+        if self.show_rows is None:
+            self.db.tables[table_name].print_selected_rows(rows, headers, self.output)
         else:
-            table.select(columns)
+            self.show_rows(headers, rows)
     
+    def vacuum(self, table_name: str):
+        '''Rewrites the table without its deleted rows.
+        
+        Parameters:
+            table_name (str): The name of the table.
+        '''
+        if table_name not in self.db.tables:
+            raise ValueError("Table not found")
+        self.db.tables[table_name].vacuum(self.output)
+
     def drop_table(self, table_name: str):
         '''Drops a table from the database.
         
         Parameters:
             table_name (str): The name of the table.
             '''
-        self.db.drop_table(table_name)
+        self.db.drop_table(table_name, self.output)
     
     def drop_database(self):
         '''Drops the database.'''
-        self.db.drop_database()
\ No newline at end of file
+        self.db.drop_database(self.output)
+
+    def analyze(self, table_name: str):
+        '''Gathers the statistics of the table used to plan its statements.
+        
+        Parameters:
+            table_name (str): The name of the table.
+        '''
+        if table_name not in self.db.tables:
+            raise ValueError("Table not found")
+        self.db.tables[table_name].analyze(self.output)
+
+    def explain(self, statement: tuple):
+        '''Shows how the rows of a statement are read, with the estimated and actual number of matching rows.
+        
+        Parameters:
+            statement (tuple): The parsed SELECT, UPDATE or DELETE statement.
+        '''
+        command = statement[0]
+        if command == 4 and "join" not in statement[4]:
+            table_name, condition_str = statement[1], statement[3]
+        elif command == 5:
+            table_name, condition_str = statement[1], statement[3]
+        elif command == 6:
+            table_name, condition_str = statement[1], statement[2]
+        else:
+            raise ValueError("EXPLAIN only supports SELECT, UPDATE and DELETE statements on a single table")
+        if table_name not in self.db.tables:
+            raise ValueError("Table not found")
+        condition = self.compile_condition(table_name, condition_str)
+        self.db.tables[table_name].explain(condition, self.output)
+
+    def prepare(self, name: str, text: str):
+        '''Prepares a statement to execute it many times with EXECUTE.
+        
+        Parameters:
+            name (str): The name of the prepared statement.
+            text (str): The statement, with '?' in place of its parameters.
+        '''
+        if name in self.prepared:
+            raise ValueError(f"Prepared statement {name} already exists")
+        self.prepared[name] = self.STATEMENTS.prepare(text)
+        print(f"Statement {name} prepared", file=self.output)
+
+    def prepared_statement(self, name: str) -> PreparedStatement:
+        '''Returns a prepared statement.
+        
+        Parameters:
+            name (str): The name of the prepared statement.
+        '''
+        if name not in self.prepared:
+            raise ValueError(f"Prepared statement {name} not found")
+        return self.prepared[name]
+
+    def deallocate(self, name: str):
+        '''Forgets a prepared statement.
+        
+        Parameters:
+            name (str): The name of the prepared statement.
+        '''
+        self.prepared_statement(name)
+        del self.prepared[name]
+        print(f"Statement {name} deallocated", file=self.output)
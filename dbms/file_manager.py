@@ -4,9 +4,21 @@ file_manager.py
 This module provides the DatabaseFileManager class for managing database files and metadata.
 """
 
-import csv
+import array
+import contextlib
 import os
 import pickle
+import threading
+
+from dbms.cache import TableCache
+from dbms.codec import RowCodec
+from dbms.condition import Condition
+from dbms.index import HashIndex, SortedIndex
+from dbms.lock import LockFile
+from dbms.parallel import ParallelScan
+from dbms.storage import CsvStorage, ColumnarStorage, remove_positions, rows_to_arrays
+from dbms.wal import WriteAheadLog
+from dbms.zonemap import ZoneMap
 
 
 
@@ -14,24 +26,103 @@ class DatabaseFileManager:
     """
     A class to manage database files.
 
+    Several processes may open the same database. Every statement locks what it
+    uses (see locked()): the metadata in shared mode, or in exclusive mode when it
+    changes it, the tables it reads in shared mode, and the tables it changes
+    against other writers. Writers prepare new table files and index changes while
+    readers keep reading the current ones, and only lock the readers out while the
+    changes are installed (see install()). Each process keeps the indexes, zone
+    maps and tombstones it loaded until another process changes their table, which
+    it tells by the version number in the lock file of the table.
+
+    The write-ahead log is only used while a single process has the database
+    open. Other processes apply their statements to the table files directly.
+
     Attributes:
         database_name (str): The name of the database.
         file_path (str): The path to the database files.
+        fsync_policy (str): When appended rows are forced to disk ("never" or "always").
+        primary_indexes (dict): The loaded primary key indexes by table name.
+        secondary_indexes (dict): The loaded secondary indexes by table name and index name.
+        zone_maps (dict): The loaded zone maps by table name.
+        cache (TableCache): The recently used tables kept in memory.
+        codecs (dict): The row codecs built from the schemas of the tables, by table name.
+        wal (WriteAheadLog): The write-ahead log, or None if statements are applied to the table files directly.
+        pending (dict): The logged UPDATE statements not applied to the table files yet,
+            by table name, as lists of (lsn, kind, condition, values).
+        tombstones (dict): The locators of the deleted rows, by table name.
+        vacuum_threshold (float): The fraction of deleted rows above which a table is rewritten without them.
+        unsynced (set): The paths to the table files with appended rows that are only durable in the log.
+        lock (threading.RLock): Held while a statement or a checkpoint runs.
+        database_lock (LockFile): The lock file of the database.
+        table_locks (dict): The lock files of the tables, by table name.
+        schema_version (int): The version of the metadata that was loaded, or None before it is loaded.
+        versions (dict): The versions of the tables whose indexes, zone maps and tombstones are loaded, by table name.
+        scopes (list): The tables locked by the running statements, innermost last, as lists of (lock file, byte).
+        unsaved (dict): The writes of indexes and tombstones that were brought up to date while other processes
+            may read them, by table name, done when the table is installed next.
+        checkpoint_interval (float): The number of seconds between background checkpoints.
+        parallel (ParallelScan): The worker processes that scan large tables.
     """
 
-    def __init__(self, db):
+    FSYNC_POLICIES = ("never", "always")
+    STORAGE_ENGINES = {"csv": CsvStorage, "columnar": ColumnarStorage}
+    # Number of logged statements of a table after which it is checkpointed right away.
+    MAX_PENDING = 64
+    # Bytes of the lock file of the database: held in shared mode by every process that opened it and in exclusive
+    # mode by the process that writes the log, held while a statement uses the metadata, and held while the log
+    # left by a process that did not close the database is replayed.
+    OPEN_LOCK, SCHEMA_LOCK, RECOVERY_LOCK = 0, 1, 2
+    # Bytes of the lock file of a table: held in exclusive mode by the statement that changes the table, and by
+    # the statements that read it in shared mode, or in exclusive mode while changes are installed.
+    WRITE_LOCK, READ_LOCK = 0, 1
+
+    def __init__(self, db, fsync_policy: str = "never", cache_size: int = 64 * 1024 * 1024,
+                 wal: bool = False, checkpoint_interval: float = 1.0, vacuum_threshold: float = 0.25, workers: int = 1):
         """
         The constructor for DatabaseFileManager class.
 
         Parameters:
             db (Database): The database object.
+            fsync_policy (str): "never" leaves flushing to the OS, "always" fsyncs after every write.
+            cache_size (int): The memory budget in bytes for tables kept in memory. 0 disables the cache.
+            wal (bool): Whether INSERT, UPDATE and DELETE statements are written to a write-ahead log.
+            checkpoint_interval (float): The number of seconds between background checkpoints.
+            vacuum_threshold (float): The fraction of deleted rows above which a table is rewritten without them.
+            workers (int): The number of worker processes of parallel scans. 1 disables parallel scans.
         """
 
         ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError("Invalid fsync policy")
+        if not 0 <= vacuum_threshold <= 1:
+            raise ValueError("Invalid vacuum threshold")
         self.db = db
+        self.fsync_policy = fsync_policy
+        self.primary_indexes = {}
+        self.secondary_indexes = {}
+        self.zone_maps = {}
+        self.cache = TableCache(cache_size)
+        self.codecs = {}
         self.database_name = db.db_name
         self.file_path: str = os.path.join(ROOT_DIR,'data' ,self.database_name, '')
         self.create_database_folder()
+        self.wal = WriteAheadLog(self.file_path, fsync_policy == "always") if wal else None
+        self.pending = {}
+        self.tombstones = {}
+        self.vacuum_threshold = vacuum_threshold
+        self.unsynced = set()
+        self.lock = threading.RLock()
+        self.checkpoint_interval = checkpoint_interval
+        self.closing = threading.Event()
+        self.checkpointer = None
+        self.parallel = ParallelScan(workers)
+        self.database_lock = LockFile(self.file_path + "lock")
+        self.table_locks = {}
+        self.schema_version = None
+        self.versions = {}
+        self.scopes = []
+        self.unsaved = {}
 
     def create_database_folder(self) -> None:
         """
@@ -44,136 +135,1180 @@ class DatabaseFileManager:
             with open(self.file_path + "metadata", "wb") as file:
                 pickle.dump({}, file)
 
-    def save_table(self, table_name:str, table: list) -> None:
+    def storage(self, table_name: str):
         """
-        Saves the table to the database.
+        Returns the storage engine of a table, as recorded in its metadata.
 
         Parameters:
             table_name (str): The name of the table.
-            table (list): The table data.
+
+        Returns:
+            CsvStorage | ColumnarStorage: The storage of the table.
         """
-        with open(self.file_path + table_name + ".csv", "w", newline='') as file:
-            writer = csv.writer(file, delimiter='|')
-            writer.writerows(table)
-            file.close()    
+        engine = self.db.get_info_table(table_name).get("storage", "csv")
+        return self.STORAGE_ENGINES[engine](self, table_name)
 
-    def create_csv(self, table_name: str) -> None:
+    def codec(self, table_name: str) -> RowCodec:
         """
-        Creates a new table in the database.
+        Returns the row codec of a table, built again only when its schema changed.
 
         Parameters:
             table_name (str): The name of the table.
-            columns (list): The list of column names.
-            data_types (list): The list of data types for the columns.
-            primary_key (str): The primary key column.
-            foreign_keys (dict): The foreign keys for the table.
+
+        Returns:
+            RowCodec: The codec of the table.
+        """
+        data_types = self.db.get_info_table(table_name)["data_types"]
+        codec = self.codecs.get(table_name)
+        if codec is None or codec.data_types != tuple(data_types):
+            codec = self.codecs[table_name] = RowCodec(data_types)
+        return codec
+
+    def save_table(self, table_name:str, table) -> None:
         """
+        Saves the table to the database and rebuilds its indexes.
 
-        with open(self.file_path + table_name + ".csv", "w") as file:
-            file.close()
+        The rows are streamed to the table storage, so only the indexed values are
+        kept in memory, and the zone map of the table is rebuilt as the rows are
+        written. The table is invalidated in the cache and cached again the next
+        time it is read. The new table has no deleted rows, so its tombstones are
+        removed.
 
-    def load_csv(self, table_name:str) -> list:
+        With a write-ahead log, the new table files are recorded as a checkpoint of
+        every logged statement before they replace the old ones.
+
+        Parameters:
+            table_name (str): The name of the table.
+            table (iterable): The table data. It may be read from the table itself.
+
+        Raises:
+            ValueError: If two rows have the same primary key. The table is not modified.
+        """
+        indexes = self.table_indexes(table_name)
+        primary = self.primary_index(table_name)
+        secondary = [index for index in indexes if index is not primary]
+        primary_keys = {}
+        secondary_keys = [[] for _ in secondary]
+
+        def collect_keys(rows):
+            for position, row in enumerate(rows):
+                if primary is not None:
+                    key = row[primary.column_index]
+                    if key in primary_keys:
+                        raise ValueError(f"Duplicate primary key {key}")
+                    primary_keys[key] = position
+                for index, keys in zip(secondary, secondary_keys):
+                    keys.append(row[index.column_index])
+                yield row
+
+        logging = self.logging()
+        lsn = self.wal.lsn if logging else None
+
+        def before_replace():
+            self.install(table_name)
+            if logging:
+                self.wal.begin_checkpoint(table_name, lsn)
+
+        storage = self.storage(table_name)
+        zone_map = ZoneMap(self.zone_map_path(table_name))
+        self.zone_maps.pop(table_name, None)
+        locators, size = storage.write(zone_map.collect(collect_keys(table)), before_replace)
+        zone_map.place(locators, storage.identity(), size)
+        zone_map.save()
+        self.zone_maps[table_name] = zone_map
+        self.cache.invalidate(table_name)
+        self.clear_dead_rows(table_name)
+        if logging:
+            self.wal.end_checkpoint(table_name)
+
+        if primary is not None:
+            for key, position in primary_keys.items():
+                primary_keys[key] = locators[position]
+            primary.restore(primary_keys)
+            primary.covered_size = size
+            primary.save()
+        for index, keys in zip(secondary, secondary_keys):
+            index.build_keys(zip(keys, locators), size)
+            index.save()
+
+    def create_csv(self, table_name: str) -> None:
+        """
+        Creates the storage of a new table in the database.
+
+        Parameters:
+            table_name (str): The name of the table, already recorded in the metadata.
+        """
+        self.storage(table_name).create()
+
+    def load_csv(self, table_name:str, columns=None) -> list:
         """
         Loads a table from the database.
 
         Parameters:
             table_name (str): The name of the table.
+            columns (list): The positions of the columns a query needs, or None for every column.
+                Storages that read by column leave the other columns as None.
 
         Returns:
-            list: The table data.
+            list: The table data. Rows served from the cache are shared, so they must not be modified.
         """
-        
-        try:
-            with open(self.file_path + table_name + ".csv", "r") as file:
-                reader = csv.reader(file, delimiter='|')
-                table = [self.apply_data_type_input_list(row, table_name) for row in reader]
-                file.close()
-                return table
-        except FileNotFoundError:
-            raise FileNotFoundError("Table not found")
+        if self.pending.get(table_name):
+            return list(self.scan_rows(table_name, columns))
+        storage = self.storage(table_name)
+        stamp = storage.stamp()
+        table = self.cache.get(table_name, stamp)
+        if table is None:
+            if self.dead_rows(table_name):
+                # The deleted rows are skipped, and the table is cached without them
+                return list(self.scan_rows(table_name, columns))
+            table = storage.load(columns)
+            if columns is None or not storage.PARTIAL_ROWS:
+                self.cache.put(table_name, table, stamp)
+        return table
+
+    def scan_rows(self, table_name: str, columns=None, cache: bool = True, condition=None):
+        """
+        Reads the rows of a table one at a time, from the cache or from the table storage.
 
-    def insert_row_csv(self, table_name:str, row: list) -> None:
+        Rows read from the storage are cached once the whole table was read, if it
+        fits in the cache budget. When a condition is given, only the blocks of the
+        zone map that may satisfy it are read from the storage, and those rows are
+        not cached. Deleted rows are skipped, and logged statements that were not
+        checkpointed yet are applied to the rows as they are read.
+
+        Parameters:
+            table_name (str): The name of the table.
+            columns (list): The positions of the columns a query needs, or None for every column.
+            cache (bool): Whether rows read from the storage may be cached.
+            condition (Condition): The condition the caller applies to the rows, or None.
+                Rows that do not satisfy it may be skipped.
+
+        Returns:
+            iterator: The rows. Rows served from the cache are shared, so they must not be modified.
+        """
+        changes = list(self.pending.get(table_name, []))
+        if changes:
+            columns = None
+        storage = self.storage(table_name)
+        stamp = storage.stamp()
+        table = self.cache.get(table_name, stamp)
+        if table is not None:
+            rows = iter(table)
+        else:
+            blocks = self.candidate_blocks(table_name, condition)
+            dead = self.dead_rows(table_name)
+            if blocks is not None:
+                rows = (row for locator, row in storage.read_blocks(blocks, columns) if locator not in dead)
+            elif dead:
+                rows = (row for locator, row in storage.read_rows(columns) if locator not in dead)
+            else:
+                rows = storage.iter_rows(columns)
+            if blocks is None and cache and (columns is None or not storage.PARTIAL_ROWS):
+                rows = self.cache.collect(table_name, rows, stamp)
+        return self.apply_changes(table_name, rows, changes) if changes else rows
+
+    def is_cached(self, table_name: str) -> bool:
+        """
+        Returns whether the rows of a table are in the cache and up to date.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        return self.cache.get(table_name, self.storage(table_name).stamp()) is not None
+
+    def parallel_scan(self, table_name: str, condition, columns, output: str, argument, blocks: list = None):
+        """
+        Scans a table in the worker processes (see ParallelScan).
+
+        The worker processes read the table files, so the table must not have
+        logged statements that were not checkpointed yet.
+
+        Parameters:
+            table_name (str): The name of the table.
+            condition (Condition): The compiled condition, or None.
+            columns (list): The positions of the columns that are needed, or None for every column.
+            output (str): What is returned for the rows that satisfy the condition: "rows", "groups" or "locators".
+            argument (list | Aggregation): The selected columns or the aggregation (see parallel.scan_chunk()).
+            blocks (list): The blocks of the zone map to read, as (start, count), or None for the whole table.
+
+        Returns:
+            iterator: The results of the chunks of the table, in table order.
+        """
+        if blocks is None:
+            blocks = [(start, count) for start, count, _, _ in self.zone_map(table_name).blocks]
+        return self.parallel.scan(
+            self.storage(table_name), blocks, columns, self.dead_rows(table_name), condition, output, argument)
+
+    def load_arrays(self, table_name: str, columns: list) -> tuple:
+        """
+        Loads columns of a table as NumPy arrays.
+
+        Parameters:
+            table_name (str): The name of the table.
+            columns (list): The positions of the columns to load.
+
+        Returns:
+            tuple: The arrays by column position (None for the other columns) and the number of rows.
+        """
+        storage = self.storage(table_name)
+        dead = self.dead_rows(table_name)
+        if self.pending.get(table_name):
+            table = list(self.scan_rows(table_name))
+            return rows_to_arrays(table, self.db.get_info_table(table_name)["data_types"], columns), len(table)
+        if isinstance(storage, CsvStorage) and (self.cache.budget or dead):
+            # Text tables are parsed once into the cache and split into arrays from memory,
+            # which are cached with the rows.
+            table = self.load_csv(table_name)
+            cached = self.cache.arrays(table_name, table, storage.stamp()) or {}
+            arrays = rows_to_arrays(
+                table, self.db.get_info_table(table_name)["data_types"], [i for i in columns if i not in cached])
+            for i in columns:
+                if i in cached:
+                    arrays[i] = cached[i]
+                else:
+                    self.cache.put_array(table_name, i, arrays[i])
+            return arrays, len(table)
+        arrays, count = storage.load_arrays(columns)
+        if dead:
+            # The locators of columnar tables are row numbers.
+            return remove_positions(arrays, count, dead)
+        return arrays, count
+
+    def insert_row_csv(self, table_name:str, row: list, log: bool = True) -> None:
         """
         Inserts a row to the table to the database.
 
+        The row is appended to the end of the table storage, so the cost of an
+        insert does not depend on the size of the table. With a write-ahead log the
+        row is logged first, after applying the logged statements of the table that
+        were not checkpointed yet.
+
         Parameters:
             table_name (str): The name of the table.
             row (list): The row will be added.
+            log (bool): Whether the row is written to the write-ahead log.
+
+        Raises:
+            ValueError: If the table already has a row with the same primary key.
         """
-        table = self.load_csv(table_name)
-        table.append(row)
-        self.save_table(table_name, table)
+        self.checkpoint_table(table_name)
+        index = self.primary_index(table_name)
+        if index is not None and row[index.column_index] in index:
+            raise ValueError(f"Duplicate primary key {row[index.column_index]}")
 
-    def update_rows(self, table_name:str,   metadata_table:dict , condition_fn , condition_str:str , update_values:dict) -> None:  
-        
+        self.install(table_name)
+        storage = self.storage(table_name)
+        if self.logging() and log:
+            self.wal.append(table_name, "insert", None, [(storage.size(), row)])
+        zone_map = self.zone_map(table_name)
+        locator, size = storage.append(row)
+
+        for index in self.table_indexes(table_name):
+            index.add(row[index.column_index], locator, size)
+        zone_map.add(locator, row, size)
+        self.cache.append(table_name, row, storage.stamp())
+
+    def insert_rows(self, table_name: str, rows) -> int:
+        """
+        Inserts many rows to the table with a single append to the table storage.
+
+        The primary keys are checked against the primary index and each other while
+        the rows are written. If a row is rejected, the rows already written are
+        removed, so either every row is inserted or none is.
+
+        Parameters:
+            table_name (str): The name of the table.
+            rows (iterable): The rows with the data types applied.
+
+        Returns:
+            int: The number of inserted rows.
+
+        Raises:
+            ValueError: If a primary key is already in the table or repeated in the rows.
+        """
+        # Bulk loads are written to the table files directly instead of the write-ahead log.
+        self.checkpoint_table(table_name)
+        indexes = self.table_indexes(table_name)
+        primary = self.primary_index(table_name)
+        new_keys = [[] for _ in indexes]
+        key_columns = [(index.column_index, keys.append) for index, keys in zip(indexes, new_keys)]
+        primary_keys = set()
+
+        def check_keys(rows):
+            for row in rows:
+                for column, add in key_columns:
+                    add(row[column])
+                if primary is not None:
+                    key = row[primary.column_index]
+                    if key in primary_keys or key in primary:
+                        raise ValueError(f"Duplicate primary key {key}")
+                    primary_keys.add(key)
+                yield row
+
+        storage = self.storage(table_name)
+        zone_map = self.zone_map(table_name)
+        self.install(table_name)
+        try:
+            locators, size = storage.append_rows(zone_map.collect(check_keys(rows), append=True))
+        except BaseException:
+            # The zone map is loaded again from its file, which was not changed
+            self.zone_maps.pop(table_name, None)
+            raise
+        zone_map.place(locators, storage.identity(), size)
+        zone_map.save()
+        self.cache.invalidate(table_name)
+
+        for index, keys in zip(indexes, new_keys):
+            index.extend(zip(keys, locators), size)
+        return len(locators)
+
+    def fetch_rows(self, table_name: str, locators: list, columns=None) -> list:
+        """
+        Reads the rows with the given locators.
+
+        Parameters:
+            table_name (str): The name of the table.
+            locators (list): The locators of the rows, as stored in the indexes.
+            columns (list): The positions of the columns a query needs, or None for every column.
+
+        Returns:
+            list: The rows with the data types applied, in the order of the locators.
+        """
+        return self.storage(table_name).fetch(locators, columns)
+
+    def primary_index(self, table_name: str):
+        """
+        Returns the primary key index of a table, loading it on first use.
+
+        Parameters:
+            table_name (str): The name of the table.
+
+        Returns:
+            HashIndex: The index, or None if the table has no primary key column.
+        """
+        if table_name in self.primary_indexes:
+            return self.primary_indexes[table_name]
+
+        metadata = self.db.get_info_table(table_name)
+        if metadata["primary_key"] not in metadata["columns"]:
+            return None
+
+        index = HashIndex(self.file_path + table_name + ".pk", metadata["columns"].index(metadata["primary_key"]))
+        self.load_index(table_name, index)
+        self.primary_indexes[table_name] = index
+        return index
+
+    def secondary_index(self, table_name: str, index_name: str) -> SortedIndex:
+        """
+        Returns a secondary index of a table, loading it on first use.
+
+        Parameters:
+            table_name (str): The name of the table.
+            index_name (str): The name of the index.
+
+        Returns:
+            SortedIndex: The index.
+        """
+        indexes = self.secondary_indexes.setdefault(table_name, {})
+        if index_name not in indexes:
+            metadata = self.db.get_info_table(table_name)
+            column = metadata.get("indexes", {})[index_name]
+            index = SortedIndex(self.index_path(table_name, index_name), metadata["columns"].index(column))
+            self.load_index(table_name, index)
+            indexes[index_name] = index
+        return indexes[index_name]
+
+    def table_indexes(self, table_name: str) -> list:
+        """
+        Returns every index of a table: the primary key index first, then the secondary indexes.
+
+        Parameters:
+            table_name (str): The name of the table.
+
+        Returns:
+            list: The indexes.
+        """
+        primary = self.primary_index(table_name)
+        indexes = [] if primary is None else [primary]
+        for index_name in self.db.get_info_table(table_name).get("indexes", {}):
+            indexes.append(self.secondary_index(table_name, index_name))
+        return indexes
+
+    def load_index(self, table_name: str, index) -> None:
+        """
+        Loads an index, rebuilding it from the table when it is missing or
+        does not cover the whole table.
+
+        Parameters:
+            table_name (str): The name of the table.
+            index (Index): The index to load.
+        """
+        storage = self.storage(table_name)
+        size = storage.size()
+        if not index.load() or index.covered_size != size:
+            rows = storage.read_rows([index.column_index])
+            dead = self.dead_rows(table_name)
+            if dead:
+                rows = (entry for entry in rows if entry[0] not in dead)
+            index.build(rows, size)
+            self.save_later(table_name, index.save)
+
+    def create_index(self, table_name: str, index_name: str) -> None:
+        """
+        Builds the file of a secondary index already recorded in the table metadata.
+
+        Parameters:
+            table_name (str): The name of the table.
+            index_name (str): The name of the index.
+        """
+        self.checkpoint_table(table_name)
+        self.install(table_name)
+        self.secondary_indexes.get(table_name, {}).pop(index_name, None)
+        SortedIndex(self.index_path(table_name, index_name), 0).drop()
+        self.secondary_index(table_name, index_name)
+
+    def index_path(self, table_name: str, index_name: str) -> str:
+        """
+        Returns the path to the file of a secondary index.
+
+        Parameters:
+            table_name (str): The name of the table.
+            index_name (str): The name of the index.
+        """
+        return self.file_path + table_name + "." + index_name + ".idx"
+
+    def zone_map(self, table_name: str) -> ZoneMap:
+        """
+        Returns the zone map of a table, loading it on first use.
+
+        A zone map that is behind its table is brought up to date with the rows
+        appended since it was written, and it is rebuilt from the table when it is
+        missing or covers table files that were replaced.
+
+        Parameters:
+            table_name (str): The name of the table.
+
+        Returns:
+            ZoneMap: The zone map.
+        """
+        if table_name not in self.zone_maps:
+            storage = self.storage(table_name)
+            zone_map = ZoneMap(self.zone_map_path(table_name))
+            identity, size = storage.identity(), storage.size()
+            if not zone_map.load() or not zone_map.covers(identity, size):
+                zone_map.build(storage.read_rows(), identity, size)
+                self.save_later(table_name, zone_map.save)
+            elif zone_map.covered_size < size:
+                zone_map.extend(storage.read_rows(start=zone_map.covered_size), size)
+                self.save_later(table_name, zone_map.save)
+            self.zone_maps[table_name] = zone_map
+        return self.zone_maps[table_name]
+
+    def zone_map_path(self, table_name: str) -> str:
+        """
+        Returns the path to the zone map file of a table.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        return self.file_path + table_name + ".zone"
+
+    def candidate_blocks(self, table_name: str, condition) -> list:
+        """
+        Finds the blocks of the zone map of a table that may have rows satisfying a condition.
+
+        Only the comparisons of columns with literal values that are AND'ed at the
+        top level of the condition are used (see Condition.bounds()).
+
+        Parameters:
+            table_name (str): The name of the table.
+            condition (Condition): The compiled condition, or None.
+
+        Returns:
+            list: The blocks as (start, count) in table order, or None if no block can be skipped.
+        """
+        # The zone map does not cover logged statements that were not checkpointed yet.
+        if condition is None or self.has_pending(table_name):
+            return None
+        bounds = {}
+        for i in condition.used_columns:
+            column_bounds = condition.bounds(condition.columns[i])
+            if column_bounds is not None:
+                bounds[i] = column_bounds
+        if not bounds:
+            return None
+        zone_map = self.zone_map(table_name)
+        blocks = zone_map.candidates(bounds)
+        return None if len(blocks) == len(zone_map.blocks) else blocks
+
+    def sync(self, file, deferred: bool = False) -> None:
+        """
+        Forces the written data of an open file to disk according to the fsync policy.
+
+        Parameters:
+            file (file): The open file object.
+            deferred (bool): Whether the data is also in the write-ahead log, if there is one,
+                in which case the file is forced to disk by the next checkpoint.
+        """
+        if self.fsync_policy != "always":
+            return
+        if deferred and self.logging():
+            self.unsynced.add(file.name)
+            return
+        file.flush()
+        os.fsync(file.fileno())
+
+    def update_rows(self, table_name:str, metadata_table:dict, condition, update_values:dict) -> None:
         """
         Updates a row to the table.
 
+        Nothing is done when the zone map of the table shows that no row can
+        satisfy the condition. With a write-ahead log the statement is only logged,
+        unless it changes the primary key, which has to be checked against every row right away. Otherwise
+        the rows are streamed from the table through the condition into a new
+        version of the table, which replaces the old one once it is complete.
+
         Parameters:
             table_name (str): The name of the table.
-            conditions (list): The conditions in functions to update the row.
-            kwargs (dict): The columns and values to update.
+            metadata_table (dict): The metadata of the table.
+            condition (Condition): The compiled condition, or None to update every row.
+            update_values (dict): The columns and values to update.
         """
-        table = self.load_csv(table_name)
-        
-        for row in table:
-            if condition_fn(row, metadata_table, condition_str):
-                for key, value in update_values.items():
-                    index = metadata_table["columns"].index(key)
-                    row[index] = value
-        
-        self.save_table(table_name, table)
+        if self.candidate_blocks(table_name, condition) == []:
+            return
+        if self.logging() and metadata_table["primary_key"] not in update_values:
+            self.defer(table_name, "update", condition, update_values)
+            return
 
-    def delete_rows(self, table_name:str, metadata_table, condition_fn, condition_str) -> None:
+        self.checkpoint_table(table_name)
+        rows = self.scan_rows(table_name, cache=False)
+        self.save_table(table_name, self.apply_changes(table_name, rows, [(None, "update", condition, update_values)]))
+
+    def delete_rows(self, table_name:str, metadata_table:dict, condition, locators=None, parallel: bool = False) -> None:
         """
         Deletes a rows to the table.
 
+        The matching rows are removed from the indexes and marked as deleted with
+        tombstones, which scans skip, instead of rewriting the table. The table is
+        rewritten without them once they exceed the vacuum threshold, by the
+        background checkpoints when there is a write-ahead log. With a write-ahead
+        log, the locators of the deleted rows are logged first.
+
         Parameters:
             table_name (str): The name of the table.
-            conditions (list): The conditions in functions to delete the row.
+            metadata_table (dict): The metadata of the table.
+            condition (Condition): The compiled condition, or None to delete every row.
+            locators (list): The rows that may satisfy the condition, located with the indexes,
+                or None to scan the blocks of the zone map that may satisfy it.
+            parallel (bool): Whether those blocks are scanned by the worker processes.
         """
-        table = self.load_csv(table_name)
-        
-        
-        table = [row for row in table if not condition_fn(row, metadata_table, condition_str)]
-        self.save_table(table_name, table)
+        if condition is None:
+            self.pending.pop(table_name, None)
+            self.save_table(table_name, [])
+            return
 
-    def drop_csv(self, table_name:str) -> None:
+        storage = self.storage(table_name)
+        dead = self.dead_rows(table_name)
+        changes = self.pending.get(table_name, [])
+        indexes = self.table_indexes(table_name)
+        positions = [index.column_index for index in indexes]
+        columns = None
+        if not changes:
+            columns = sorted(set(condition.used_columns) | set(positions))
+
+        # The deleted rows, with the values of their indexed columns
+        if locators is None and parallel and not changes:
+            chunks = self.parallel_scan(
+                table_name, condition, columns, "locators", positions, self.candidate_blocks(table_name, condition))
+            deleted = [match for chunk in chunks for match in chunk]
+        else:
+            if locators is None:
+                blocks = self.candidate_blocks(table_name, condition)
+                rows = storage.read_rows(columns) if blocks is None else storage.read_blocks(blocks, columns)
+            else:
+                rows = zip(locators, storage.fetch(locators, columns))
+            deleted = []
+            for locator, row in rows:
+                if locator in dead:
+                    continue
+                current = next(self.apply_changes(table_name, iter([row]), changes)) if changes else row
+                if condition.predicate(current):
+                    deleted.append((locator, [row[i] for i in positions]))
+        if not deleted:
+            return
+
+        deleted_locators = [locator for locator, _ in deleted]
+        self.install(table_name)
+        if self.logging():
+            self.wal.append(table_name, "delete", condition.text, deleted_locators)
+        self.add_dead_rows(table_name, deleted_locators)
+        self.cache.invalidate(table_name)
+        size = storage.size()
+        for i, index in enumerate(indexes):
+            index.remove([(values[i], locator) for locator, values in deleted], size)
+        if not self.logging() and self.needs_vacuum(table_name):
+            self.vacuum(table_name)
+
+    def dead_rows(self, table_name: str) -> set:
         """
-        Drops a table from the database.
+        Returns the locators of the deleted rows of a table, loading them on first use.
+
+        The tombstone file starts with the identity of the table files it applies to
+        (see the identity() method of the storage engines), so the tombstones of table
+        files that were replaced are discarded.
 
         Parameters:
             table_name (str): The name of the table.
+
+        Returns:
+            set: The locators of the deleted rows.
         """
-        os.remove(self.file_path + table_name + ".csv")
+        if table_name not in self.tombstones:
+            path = self.tombstone_path(table_name)
+            values = array.array("q")
+            try:
+                with open(path, "rb") as file:
+                    data = file.read()
+                values.frombytes(data[:len(data) - len(data) % values.itemsize])
+            except FileNotFoundError:
+                pass
+            if values and values[0] != self.storage(table_name).identity():
+                self.save_later(table_name, lambda: self.remove_stale_tombstones(table_name))
+                values = array.array("q")
+            self.tombstones[table_name] = set(values[1:])
+        return self.tombstones[table_name]
 
-    def apply_data_type_input_list(self, values:list, table_name:str) -> list:
-        '''
-        Applies the data types to the input values.
+    def add_dead_rows(self, table_name: str, locators: list) -> None:
+        """
+        Marks rows of a table as deleted.
 
         Parameters:
             table_name (str): The name of the table.
-            values (list/dict): The values to apply the data types.
-        '''
-        
-        data_types = self.db.get_info_table(table_name)["data_types"]
-        if len(values) != len(data_types):
-            raise ValueError("Bad input values")
-        
-        for i in range(len(values)):
-                if data_types[i] == "int":
-                    try:
-                        values[i] = int(values[i])
-                    except:
-                        raise ValueError("Bad input values")
-                elif data_types[i] == "float":
+            locators (list): The locators of the rows.
+        """
+        dead = self.dead_rows(table_name)
+        with open(self.tombstone_path(table_name), "ab") as file:
+            if file.tell() == 0:
+                file.write(array.array("q", [self.storage(table_name).identity()]).tobytes())
+            file.write(array.array("q", locators).tobytes())
+            self.sync(file, deferred=True)
+        dead.update(locators)
+
+    def remove_stale_tombstones(self, table_name: str) -> None:
+        """
+        Removes the tombstone file of a table if it applies to table files that were replaced.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        path = self.tombstone_path(table_name)
+        try:
+            with open(path, "rb") as file:
+                data = file.read(8)
+        except FileNotFoundError:
+            return
+        if len(data) == 8 and array.array("q", data)[0] != self.storage(table_name).identity():
+            os.remove(path)
+
+    def clear_dead_rows(self, table_name: str) -> None:
+        """
+        Removes the tombstones of a table.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        self.tombstones.pop(table_name, None)
+        if os.path.exists(self.tombstone_path(table_name)):
+            os.remove(self.tombstone_path(table_name))
+
+    def tombstone_path(self, table_name: str) -> str:
+        """
+        Returns the path to the file with the locators of the deleted rows of a table.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        return self.file_path + table_name + ".dead"
+
+    def apply_changes(self, table_name: str, rows, changes: list):
+        """
+        Applies UPDATE statements to rows as they are read, in order.
+
+        Parameters:
+            table_name (str): The name of the table.
+            rows (iterable): The rows.
+            changes (list): The statements, as (lsn, kind, condition, values) where kind is "update",
+                condition is a Condition or None and values are the updated values.
+
+        Returns:
+            iterator: The updated rows.
+        """
+        columns = self.db.get_info_table(table_name)["columns"]
+        for _, _, condition, values in changes:
+            predicate = condition.predicate if condition is not None else None
+            updates = [(columns.index(key), value) for key, value in values.items()]
+            rows = self.updated_rows(rows, predicate, updates)
+        return rows
+
+    @staticmethod
+    def updated_rows(rows, predicate, updates: list):
+        """
+        Applies the updated values to the rows that match a predicate.
+
+        Parameters:
+            rows (iterable): The rows.
+            predicate (function): The predicate, or None to update every row.
+            updates (list): The positions of the updated columns and their values.
+
+        Yields:
+            list: The rows, updated or not. Updated rows are copies.
+        """
+        for row in rows:
+            if predicate is None or predicate(row):
+                row = list(row)
+                for index, value in updates:
+                    row[index] = value
+            yield row
+
+    def has_pending(self, table_name: str) -> bool:
+        """
+        Returns whether a table has logged statements that were not checkpointed yet.
+
+        The table files, and so the indexes, do not reflect those statements.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        return bool(self.pending.get(table_name))
+
+    def defer(self, table_name: str, kind: str, condition, values, lsn: int = None) -> None:
+        """
+        Logs an UPDATE statement and keeps it until the next checkpoint of the table.
+
+        Parameters:
+            table_name (str): The name of the table.
+            kind (str): "update".
+            condition (Condition): The compiled condition, or None.
+            values (dict): The updated values.
+            lsn (int): The sequence number of the record when it is replayed from the log, or None to log it.
+        """
+        if lsn is None:
+            self.install(table_name)
+            lsn = self.wal.append(table_name, kind, condition.text if condition is not None else None, values)
+        changes = self.pending.setdefault(table_name, [])
+        changes.append((lsn, kind, condition, values))
+        if len(changes) >= self.MAX_PENDING:
+            self.checkpoint_table(table_name)
+
+    def checkpoint_table(self, table_name: str, compact: bool = False) -> None:
+        """
+        Applies the logged statements of a table that were not checkpointed yet to its files.
+
+        The checkpoint is recorded in the log once the new table files are written
+        and before they replace the old ones, so an interrupted checkpoint is either
+        finished or discarded by recover().
+
+        Parameters:
+            table_name (str): The name of the table.
+            compact (bool): Whether the table is also rewritten to remove its deleted rows.
+        """
+        with self.lock:
+            changes = self.pending.pop(table_name, None)
+            if not changes and not (compact and self.dead_rows(table_name)):
+                return
+            try:
+                rows = self.scan_rows(table_name, cache=False)
+                self.save_table(table_name, self.apply_changes(table_name, rows, changes or []))
+            except BaseException:
+                if changes:
+                    self.pending[table_name] = changes
+                raise
+
+    def vacuum(self, table_name: str) -> None:
+        """
+        Rewrites a table without its deleted rows and applies its logged statements.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        self.checkpoint_table(table_name, compact=True)
+
+    def needs_vacuum(self, table_name: str) -> bool:
+        """
+        Returns whether the deleted rows of a table exceed the vacuum threshold.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        dead = len(self.dead_rows(table_name))
+        if not dead:
+            return False
+        primary = self.primary_index(table_name)
+        live = len(primary) if primary is not None else sum(1 for _ in self.scan_rows(table_name))
+        return dead > self.vacuum_threshold * (dead + live)
+
+    def checkpoint(self) -> None:
+        """
+        Applies every logged statement to the table files and empties the log.
+        """
+        if not self.logging():
+            return
+        with self.lock:
+            for table_name in list(self.pending):
+                self.checkpoint_table(table_name)
+            stored = self.db.stored_tables()
+            for table_name in list(self.tombstones):
+                if table_name in stored and self.needs_vacuum(table_name):
+                    self.vacuum(table_name)
+            for path in self.unsynced:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self.unsynced.clear()
+            self.wal.truncate()
+
+    def run_checkpoints(self) -> None:
+        """
+        Checkpoints the database every checkpoint_interval seconds until it is closed.
+
+        Every checkpoint also stops logging, so other processes may open the
+        database. The next statement that changes a table logs again if it can.
+        """
+        while not self.closing.wait(self.checkpoint_interval):
+            with self.lock:
+                if self.closing.is_set() or not self.logging():
+                    continue
+                try:
+                    self.stop_logging()
+                except Exception:
+                    # The statements stay in the log and the checkpoint is tried again.
+                    continue
+
+    def open(self) -> None:
+        """
+        Opens the database in this process, loads its metadata and starts the background checkpoints.
+
+        The process holds the open lock in shared mode until the database is closed.
+        A write-ahead log left by a process that did not close the database is
+        replayed first, even if this process does not log its statements, while
+        other processes wait to open the database.
+        """
+        with self.lock:
+            self.database_lock.acquire(self.RECOVERY_LOCK, exclusive=True)
+            try:
+                self.database_lock.acquire(self.OPEN_LOCK)
+                with self.locked():
+                    wal = self.wal
+                    if wal is None:
+                        self.wal = WriteAheadLog(self.file_path, self.fsync_policy == "always")
                     try:
-                        values[i] = float(values[i])
-                    except:
-                        raise ValueError("Bad input values")
-                elif data_types[i] == "str":
-                    values[i] = str(values[i])
+                        if self.wal.has_records() and self.start_logging():
+                            self.stop_logging()
+                    finally:
+                        self.wal = wal
+            finally:
+                self.database_lock.release(self.RECOVERY_LOCK)
+
+        if self.wal is not None:
+            self.checkpointer = threading.Thread(target=self.run_checkpoints, daemon=True)
+            self.checkpointer.start()
+
+    def recover(self) -> None:
+        """
+        Brings the table files up to date with the write-ahead log when it is opened.
+
+        Interrupted checkpoints are finished if they were recorded in the log and
+        discarded otherwise, then the logged statements that were not checkpointed
+        are replayed. Logged rows that were already written to their table are
+        skipped, whether or not they were deleted later.
+        """
+        with self.lock:
+            stored = self.db.stored_tables()
+            for table_name, (_, installing) in list(self.wal.checkpoints.items()):
+                if installing and table_name in stored:
+                    self.storage(table_name).replace_temp()
+                    self.drop_indexes(table_name)
+                    self.wal.end_checkpoint(table_name)
+            for table_name in stored:
+                self.storage(table_name).remove_temp()
+
+            for lsn, table_name, kind, condition, values in self.wal.records(stored):
+                if kind == "insert":
+                    self.checkpoint_table(table_name)
+                    storage = self.storage(table_name)
+                    for locator, row in values:
+                        # Rows are appended where the log says, so rows below the end of the table were written
+                        if locator >= storage.size():
+                            self.insert_row_csv(table_name, row, log=False)
+                elif kind == "delete":
+                    dead = self.dead_rows(table_name)
+                    locators = [locator for locator in values if locator not in dead]
+                    if locators:
+                        self.add_dead_rows(table_name, locators)
+                        # The indexes are rebuilt without the deleted rows
+                        self.drop_indexes(table_name)
                 else:
-                    raise ValueError("Bad input values")
-        
-        return values
\ No newline at end of file
+                    if condition is not None:
+                        condition = Condition(condition, self.db.get_info_table(table_name)["columns"])
+                    self.defer(table_name, kind, condition, values, lsn)
+            self.checkpoint()
+
+    def logging(self) -> bool:
+        """
+        Returns whether statements are written to the write-ahead log.
+        """
+        return self.wal is not None and self.wal.is_open()
+
+    def start_logging(self) -> bool:
+        """
+        Opens the write-ahead log if no other process has the database open, and replays what it holds.
+
+        Returns:
+            bool: Whether statements are written to the log.
+        """
+        if self.logging():
+            return True
+        if self.wal is None or not self.database_lock.acquire(self.OPEN_LOCK, exclusive=True, blocking=False):
+            return False
+        self.wal.open()
+        self.recover()
+        return True
+
+    def stop_logging(self) -> None:
+        """
+        Applies the write-ahead log to the table files and closes it, so other processes may open the database.
+        """
+        if not self.logging():
+            return
+        with self.lock:
+            self.checkpoint()
+            self.wal.close()
+            self.database_lock.release(self.OPEN_LOCK)
+
+    def claim(self) -> bool:
+        """
+        Keeps other processes from opening the database until it is closed.
+
+        Returns:
+            bool: Whether no other process had the database open.
+        """
+        return self.database_lock.acquire(self.OPEN_LOCK, exclusive=True, blocking=False)
+
+    @contextlib.contextmanager
+    def locked(self, reads=(), writes=(), schema: bool = False):
+        """
+        Locks the metadata and the tables a statement uses, against other threads and processes.
+
+        The metadata is loaded again if another process changed it, and so are the
+        indexes, zone maps and tombstones of the tables another process changed.
+        Tables are locked in the order of their names, so statements never wait for
+        each other in a cycle. The versions of the tables changed by the statement,
+        and of the metadata if it may change it, are incremented when it ends.
+
+        Parameters:
+            reads (iterable): The names of the tables the statement reads.
+            writes (iterable): The names of the tables the statement changes.
+            schema (bool): Whether the statement changes the metadata, in which case no other statement runs meanwhile.
+        """
+        with self.lock:
+            self.scopes.append([])
+            try:
+                self.hold(self.database_lock, self.SCHEMA_LOCK, schema)
+                version = self.database_lock.version()
+                if version != self.schema_version:
+                    self.reload()
+                    self.schema_version = version
+
+                writes = set(writes)
+                for name in sorted(set(reads) | writes):
+                    if name not in self.db.metadata:
+                        continue
+                    for table_name in self.db.stored_tables(name):
+                        lock = self.table_lock(table_name)
+                        if name in writes:
+                            self.hold(lock, self.WRITE_LOCK, True)
+                        else:
+                            self.hold(lock, self.READ_LOCK, False)
+                        version = lock.version()
+                        if self.versions.get(table_name) != version:
+                            self.forget(table_name)
+                            self.versions[table_name] = version
+                if writes:
+                    self.start_logging()
+                yield
+            finally:
+                if schema and self.database_lock.held(self.SCHEMA_LOCK, exclusive=True):
+                    self.schema_version = self.database_lock.bump()
+                for lock, offset, table_name in reversed(self.scopes.pop()):
+                    if table_name is not None and lock.held(offset, exclusive=True):
+                        self.versions[table_name] = lock.bump()
+                    lock.release(offset)
+
+    def hold(self, lock: LockFile, offset: int, exclusive: bool, table_name: str = None) -> None:
+        """
+        Locks a byte of a lock file until the innermost running statement ends.
+
+        Parameters:
+            lock (LockFile): The lock file.
+            offset (int): The byte.
+            exclusive (bool): Whether the byte is locked in exclusive mode.
+            table_name (str): The table whose version is incremented when the statement ends, or None.
+        """
+        lock.acquire(offset, exclusive)
+        self.scopes[-1].append((lock, offset, table_name))
+
+    def table_lock(self, table_name: str) -> LockFile:
+        """
+        Returns the lock file of a table.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        if table_name not in self.table_locks:
+            self.table_locks[table_name] = LockFile(self.file_path + table_name + ".lock")
+        return self.table_locks[table_name]
+
+    def install(self, table_name: str) -> None:
+        """
+        Locks a table against its readers until the running statement ends, before its files are changed.
+
+        The index, zone map and tombstone files that were brought up to date while
+        the table was shared with other processes are written first.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        if not self.scopes:
+            return
+        lock = self.table_lock(table_name)
+        if not lock.held(self.READ_LOCK, exclusive=True):
+            self.hold(lock, self.WRITE_LOCK, True)
+            self.hold(lock, self.READ_LOCK, True, table_name)
+        for save in self.unsaved.pop(table_name, []):
+            save()
+
+    def save_later(self, table_name: str, save) -> None:
+        """
+        Writes an index, zone map or tombstone file that was brought up to date with its table,
+        or waits until the table is installed if other processes may be reading the file.
+
+        Parameters:
+            table_name (str): The name of the table.
+            save (function): Writes the file.
+        """
+        if not self.scopes or self.table_lock(table_name).held(self.READ_LOCK, exclusive=True):
+            save()
+        else:
+            self.unsaved.setdefault(table_name, []).append(save)
+
+    def forget(self, table_name: str) -> None:
+        """
+        Forgets the indexes, zone map and tombstones loaded for a table, after another process changed it.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        self.primary_indexes.pop(table_name, None)
+        self.secondary_indexes.pop(table_name, None)
+        self.zone_maps.pop(table_name, None)
+        self.tombstones.pop(table_name, None)
+        self.unsaved.pop(table_name, None)
+        self.cache.invalidate(table_name)
+
+    def reload(self) -> None:
+        """
+        Loads the metadata again and forgets everything loaded for the tables, after another process changed the metadata.
+        """
+        for lock in self.table_locks.values():
+            lock.close()
+        self.table_locks.clear()
+        self.versions.clear()
+        self.primary_indexes.clear()
+        self.secondary_indexes.clear()
+        self.zone_maps.clear()
+        self.tombstones.clear()
+        self.unsaved.clear()
+        self.codecs.clear()
+        self.cache.clear()
+        self.db.reload()
+
+    def commit(self) -> None:
+        """
+        Waits until the logged statements are durable, forcing several statements to disk at once.
+        """
+        if self.wal is not None:
+            self.wal.commit()
+
+    def close(self) -> None:
+        """
+        Stops the worker processes and the background checkpoints, checkpoints the database and closes the log.
+        """
+        self.parallel.close()
+        self.closing.set()
+        if self.checkpointer is not None:
+            self.checkpointer.join()
+        with self.lock:
+            self.stop_logging()
+            for lock in self.table_locks.values():
+                lock.close()
+            self.database_lock.close()
+
+    def drop_wal(self) -> None:
+        """
+        Stops the background checkpoints and removes the log without applying it, when the database is dropped.
+        """
+        if self.wal is None:
+            return
+        with self.lock:
+            self.closing.set()
+        self.pending.clear()
+        self.wal.drop()
+
+    def drop_locks(self) -> None:
+        """
+        Removes the lock files of the database, when it is dropped.
+        """
+        for lock in self.table_locks.values():
+            lock.remove()
+        self.table_locks.clear()
+        self.database_lock.remove()
+
+    def drop_csv(self, table_name:str) -> None:
+        """
+        Drops a table from the database.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        self.cache.invalidate(table_name)
+        self.pending.pop(table_name, None)
+        if self.logging():
+            self.wal.skip(table_name)
+        self.storage(table_name).drop()
+        self.codecs.pop(table_name, None)
+        self.clear_dead_rows(table_name)
+        self.drop_indexes(table_name)
+        self.table_lock(table_name).remove()
+        del self.table_locks[table_name]
+        self.versions.pop(table_name, None)
+        self.unsaved.pop(table_name, None)
+
+    def drop_indexes(self, table_name: str) -> None:
+        """
+        Removes the index and zone map files of a table, so they are rebuilt from the table when they are used next.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        HashIndex(self.file_path + table_name + ".pk", 0).drop()
+        ZoneMap(self.zone_map_path(table_name)).drop()
+        self.zone_maps.pop(table_name, None)
+        for index_name in self.db.get_info_table(table_name).get("indexes", {}):
+            SortedIndex(self.index_path(table_name, index_name), 0).drop()
+        self.primary_indexes.pop(table_name, None)
+        self.secondary_indexes.pop(table_name, None)
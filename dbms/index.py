@@ -0,0 +1,321 @@
+"""
+index.py
+
+This module provides the index classes used by DatabaseFileManager to find rows without scanning tables.
+"""
+
+import bisect
+import itertools
+import os
+import pickle
+
+
+class Index:
+    """
+    Base class for the indexes from the values of a column to the locators of their rows.
+
+    A locator is the byte offset of the row in the table file for CSV tables and
+    the row number for columnar tables (see storage.py). Both are called offsets here.
+
+    The index file holds a pickled snapshot followed by the entries added and
+    removed since the snapshot was written, so changing a key never rewrites the
+    file. Each record also stores the size of the table it covers, which is used
+    to detect an index that is out of date with its table.
+
+    Attributes:
+        file_path (str): The path to the index file.
+        column_index (int): The position of the indexed column in a row.
+        covered_size (int): The size of the table covered by the index.
+    """
+
+    def __init__(self, file_path: str, column_index: int):
+        """
+        Initializes an empty index.
+
+        Parameters:
+            file_path (str): The path to the index file.
+            column_index (int): The position of the indexed column in a row.
+        """
+        self.file_path = file_path
+        self.column_index = column_index
+        self.covered_size = 0
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the index.
+        """
+        raise NotImplementedError
+
+    def snapshot(self):
+        """
+        Returns the entries of the index in the form they are pickled.
+        """
+        raise NotImplementedError
+
+    def restore(self, snapshot) -> None:
+        """
+        Replaces the entries of the index with a pickled snapshot.
+
+        Parameters:
+            snapshot: The entries, as returned by snapshot().
+        """
+        raise NotImplementedError
+
+    def put(self, key, offset: int) -> None:
+        """
+        Adds an entry to the index in memory.
+
+        Parameters:
+            key: The value of the indexed column.
+            offset (int): The offset of the row in the table file.
+        """
+        raise NotImplementedError
+
+    def discard(self, entries) -> None:
+        """
+        Removes entries from the index in memory.
+
+        Parameters:
+            entries (list): Pairs of (key, offset) of the removed rows.
+        """
+        raise NotImplementedError
+
+    def load(self) -> bool:
+        """
+        Loads the index from its file.
+
+        Returns:
+            bool: False if the index file does not exist.
+        """
+        try:
+            with open(self.file_path, "rb") as file:
+                snapshot, self.covered_size = pickle.load(file)
+                self.restore(snapshot)
+                while True:
+                    try:
+                        record = pickle.load(file)
+                    except (EOFError, pickle.UnpicklingError):
+                        break
+                    key, offset, self.covered_size = record[:3]
+                    # Removals are recorded with a fourth element
+                    if len(record) > 3:
+                        self.discard([(key, offset)])
+                    else:
+                        self.put(key, offset)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self) -> None:
+        """
+        Writes a snapshot of the whole index to its file.
+        """
+        with open(self.file_path, "wb") as file:
+            pickle.dump((self.snapshot(), self.covered_size), file)
+
+    def build(self, rows, covered_size: int) -> None:
+        """
+        Rebuilds the index from the rows of the table without saving it.
+
+        Parameters:
+            rows (iterable): Pairs of (offset, row) for every row of the table.
+            covered_size (int): The size of the table file.
+        """
+        self.build_keys(((row[self.column_index], offset) for offset, row in rows), covered_size)
+
+    def build_keys(self, entries, covered_size: int) -> None:
+        """
+        Rebuilds the index from the values of the indexed column without saving it.
+
+        Parameters:
+            entries (iterable): Pairs of (key, offset) for every row of the table.
+            covered_size (int): The size of the table file.
+        """
+        self.clear()
+        for key, offset in entries:
+            self.put(key, offset)
+        self.covered_size = covered_size
+
+    def add(self, key, offset: int, covered_size: int) -> None:
+        """
+        Adds a key and appends it to the index file.
+
+        Parameters:
+            key: The value of the indexed column.
+            offset (int): The offset of the row in the table file.
+            covered_size (int): The size of the table file after the row was written.
+        """
+        self.put(key, offset)
+        self.covered_size = covered_size
+        with open(self.file_path, "ab") as file:
+            pickle.dump((key, offset, covered_size), file)
+
+    def remove(self, entries, covered_size: int) -> None:
+        """
+        Removes the keys of deleted rows and appends the removals to the index file.
+
+        Parameters:
+            entries (list): Pairs of (key, offset) of the deleted rows.
+            covered_size (int): The size of the table file.
+        """
+        self.discard(entries)
+        self.covered_size = covered_size
+        with open(self.file_path, "ab") as file:
+            for key, offset in entries:
+                pickle.dump((key, offset, covered_size, False), file)
+
+    def extend(self, entries, covered_size: int) -> None:
+        """
+        Adds many keys and writes a snapshot of the whole index to its file.
+
+        Parameters:
+            entries (iterable): Pairs of (key, offset) of the new rows.
+            covered_size (int): The size of the table file after the rows were written.
+        """
+        for key, offset in entries:
+            self.put(key, offset)
+        self.covered_size = covered_size
+        self.save()
+
+    def drop(self) -> None:
+        """
+        Removes the index file.
+        """
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+
+class HashIndex(Index):
+    """
+    A unique hash index, used for primary keys.
+
+    Attributes:
+        entries (dict): The indexed values mapped to row offsets.
+    """
+
+    def clear(self) -> None:
+        self.entries = {}
+
+    def snapshot(self):
+        return self.entries
+
+    def restore(self, snapshot) -> None:
+        self.entries = snapshot
+
+    def put(self, key, offset: int) -> None:
+        """
+        Adds an entry to the index in memory.
+
+        Parameters:
+            key: The value of the indexed column.
+            offset (int): The offset of the row in the table file.
+
+        Raises:
+            ValueError: If the key is already in the index.
+        """
+        if key in self.entries:
+            raise ValueError(f"Duplicate primary key {key}")
+        self.entries[key] = offset
+
+    def discard(self, entries) -> None:
+        for key, offset in entries:
+            if self.entries.get(key) == offset:
+                del self.entries[key]
+
+    def get(self, key):
+        """
+        Returns the offset of the row with the given key, or None if there is none.
+
+        Parameters:
+            key: The value of the indexed column.
+        """
+        return self.entries.get(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class SortedIndex(Index):
+    """
+    A secondary index that keeps the values of a column sorted, used for range predicates.
+
+    Attributes:
+        keys (list): The indexed values in ascending order.
+        offsets (list): The row offsets, in the same order as the keys.
+    """
+
+    # Number of removed entries above which discard() filters the whole index
+    # instead of searching each entry.
+    BULK_DISCARD = 64
+
+    def clear(self) -> None:
+        self.keys = []
+        self.offsets = []
+
+    def snapshot(self):
+        return self.keys, self.offsets
+
+    def restore(self, snapshot) -> None:
+        self.keys, self.offsets = snapshot
+
+    def put(self, key, offset: int) -> None:
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.offsets.insert(i, offset)
+
+    def discard(self, entries) -> None:
+        if len(entries) > self.BULK_DISCARD:
+            removed = set(entries)
+            kept = [(key, offset) for key, offset in zip(self.keys, self.offsets) if (key, offset) not in removed]
+            self.keys = [key for key, _ in kept]
+            self.offsets = [offset for _, offset in kept]
+            return
+        for key, offset in entries:
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.offsets[i] == offset:
+                    del self.keys[i]
+                    del self.offsets[i]
+                    break
+                i += 1
+
+    def build_keys(self, entries, covered_size: int) -> None:
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.offsets = [offset for _, offset in entries]
+        self.covered_size = covered_size
+
+    def extend(self, entries, covered_size: int) -> None:
+        entries = sorted(itertools.chain(zip(self.keys, self.offsets), entries))
+        self.keys = [key for key, _ in entries]
+        self.offsets = [offset for _, offset in entries]
+        self.covered_size = covered_size
+        self.save()
+
+    def range(self, low=None, low_inclusive=True, high=None, high_inclusive=True) -> list:
+        """
+        Returns the offsets of the rows whose value lies in a range.
+
+        Parameters:
+            low: The lower bound, or None if there is none.
+            low_inclusive (bool): Whether the lower bound itself is in the range.
+            high: The upper bound, or None if there is none.
+            high_inclusive (bool): Whether the upper bound itself is in the range.
+
+        Returns:
+            list: The offsets, in the order of their keys.
+        """
+        start = 0
+        end = len(self.keys)
+        if low is not None:
+            start = bisect.bisect_left(self.keys, low) if low_inclusive else bisect.bisect_right(self.keys, low)
+        if high is not None:
+            end = bisect.bisect_right(self.keys, high) if high_inclusive else bisect.bisect_left(self.keys, high)
+        return self.offsets[start:end]
+
+    def __len__(self) -> int:
+        return len(self.keys)
@@ -0,0 +1,396 @@
+"""
+join.py
+
+This module provides the Join class for selecting rows of two tables joined on equal columns.
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+from itertools import chain, islice
+
+from dbms.aggregate import Aggregation
+from dbms.condition import Condition
+from dbms.sort import Sorter
+
+
+class Join:
+    """
+    An inner join of two tables on equal columns, evaluated as a hash join.
+
+    The smaller table (by size on disk) is the build side: its rows are loaded
+    into a hash table by their join value, and the rows of the other table are
+    streamed through it. If the hash table grows beyond MEMORY_LIMIT bytes, both
+    sides are split by the hash of their join values into PARTITIONS temporary
+    files, and every pair of partitions is joined in memory (grace hash join).
+
+    When the larger table is joined on its primary key and the smaller table is
+    at most 1/INDEX_RATIO of its size, the larger table is not scanned at all: the
+    rows of the smaller table look their matches up in the primary key index.
+
+    The columns of the joined rows are the columns of the left table followed
+    by the columns of the right table, named 'table.column'. Column names that
+    are unique across both tables may also be used without the table name.
+
+    Attributes:
+        database (Database): The database of the tables.
+        left (Table): The table before JOIN.
+        right (Table): The table after JOIN.
+        columns (list): The qualified names of the columns of the joined rows.
+        data_types (list): The data types of the columns of the joined rows.
+        aliases (dict): The unqualified column names that are unique, mapped to their qualified names.
+        left_key (int): The position of the join column in the rows of the left table.
+        right_key (int): The position of the join column in the rows of the right table.
+    """
+
+    # Maximum estimated size in bytes of the in-memory hash table before spilling to partitions.
+    MEMORY_LIMIT = 64 * 1024 * 1024
+    # Number of partitions of each side when spilling.
+    PARTITIONS = 16
+    # Number of rows looked up in the primary key index, or written to a partition, at a time.
+    BATCH_SIZE = 1000
+    # Minimum ratio between the sizes of the tables to look the rows up in the primary key index.
+    INDEX_RATIO = 4
+
+    def __init__(self, database, left: str, right: str, on: list = None):
+        """
+        Resolves the tables and the join columns.
+
+        Parameters:
+            database (Database): The database of the tables.
+            left (str): The name of the table before JOIN.
+            right (str): The name of the table after JOIN.
+            on (list): The two joined columns, for example ["orders.user_id", "users.id"], or None
+                to join on a foreign key declared between the tables.
+
+        Raises:
+            ValueError: If a table or a column does not exist, or the join columns cannot be found.
+        """
+        for table_name in (left, right):
+            if table_name not in database.tables:
+                raise ValueError("Table not found")
+        if left == right:
+            raise ValueError("A table cannot be joined with itself")
+        self.database = database
+        self.left = database.tables[left]
+        self.right = database.tables[right]
+
+        self.columns = []
+        self.data_types = []
+        names = {}
+        for table in (self.left, self.right):
+            for column, data_type in zip(table.metadata["columns"], table.metadata["data_types"]):
+                self.columns.append(f"{table.name}.{column}")
+                self.data_types.append(data_type)
+                names.setdefault(column, []).append(f"{table.name}.{column}")
+        self.aliases = {column: qualified[0] for column, qualified in names.items() if len(qualified) == 1}
+
+        if on is None:
+            on = self.foreign_key()
+        if len(on) != 2:
+            raise ValueError("Invalid join condition")
+        keys = [self.columns.index(self.resolve(column)) for column in on]
+        width = len(self.left.metadata["columns"])
+        if (keys[0] < width) == (keys[1] < width):
+            raise ValueError("Invalid join condition")
+        self.left_key, self.right_key = min(keys), max(keys) - width
+
+    def foreign_key(self) -> list:
+        """
+        Finds the join columns from a foreign key declared between the two tables.
+
+        Returns:
+            list: The qualified names of the foreign key column and the referenced column.
+
+        Raises:
+            ValueError: If no foreign key links the tables.
+        """
+        for table, other in ((self.left, self.right), (self.right, self.left)):
+            foreign_keys = table.metadata.get("foreign_keys") or {}
+            if not isinstance(foreign_keys, dict):
+                continue
+            for column, (referenced_table, referenced_column) in foreign_keys.items():
+                if referenced_table == other.name:
+                    return [f"{table.name}.{column}", f"{other.name}.{referenced_column}"]
+        raise ValueError("Invalid join condition")
+
+    def resolve(self, column: str) -> str:
+        """
+        Returns the qualified name of a column of the joined rows.
+
+        Parameters:
+            column (str): The name of the column, qualified or not.
+
+        Raises:
+            ValueError: If the column does not exist or is ambiguous.
+        """
+        if column in self.columns:
+            return column
+        if column in self.aliases:
+            return self.aliases[column]
+        if "." not in column and any(name.endswith("." + column) for name in self.columns):
+            raise ValueError(f"Column {column} is ambiguous")
+        raise ValueError(f"Column {column} not found")
+
+    def qualify(self, item: str) -> str:
+        """
+        Returns a selected item with its column qualified, for columns and aggregate functions.
+
+        Parameters:
+            item (str): The selected item.
+        """
+        function = Aggregation.parse_function(item)
+        if function is None:
+            return self.resolve(item)
+        name, argument = function
+        return f"{name}({argument if argument == '*' else self.resolve(argument)})"
+
+    def select(self, items: list, condition_text: str = None, limit: int = None, offset: int = 0,
+               group_by: list = None, order_by: list = None) -> tuple:
+        """
+        Selects joined rows.
+
+        Parameters:
+            items (list): The selected columns or aggregate functions. Use ['*'] to select all columns.
+            condition_text (str): The WHERE condition, or None.
+            limit (int): The maximum number of rows to select, or None for no limit.
+            offset (int): The number of matching rows to skip.
+            group_by (list): The names of the grouped columns, or None.
+            order_by (list): The sort columns as (name, descending), or None.
+
+        Returns:
+            tuple: The headers of the selected columns and an iterator over the selected rows.
+        """
+        items = list(self.columns) if items == ['*'] else [self.qualify(item) for item in items]
+        group_by = [self.resolve(column) for column in group_by or []]
+        condition = None
+        if condition_text is not None:
+            condition = Condition.compiled(condition_text, self.columns, self.aliases)
+        stop = None if limit is None else offset + limit
+
+        order_by = [(self.qualify(column), descending) for column, descending in order_by or []]
+
+        if group_by or Aggregation.is_aggregate(items):
+            aggregation = Aggregation(items, group_by, self.columns, self.data_types)
+            needed = set(aggregation.used_columns)
+            keys = []
+            for column, descending in order_by:
+                if column not in items:
+                    raise ValueError(f"Column {column} must be selected to sort groups")
+                keys.append((items.index(column), descending))
+        else:
+            aggregation = None
+            # The sort columns are selected after the selected columns and dropped once sorted.
+            indices = [self.columns.index(item) for item in items]
+            indices += [self.columns.index(column) for column, _ in order_by]
+            keys = [(len(items) + i, descending) for i, (_, descending) in enumerate(order_by)]
+            needed = set(indices)
+        if condition is not None:
+            needed |= set(condition.used_columns)
+
+        rows = self.rows(needed)
+        if condition is not None:
+            predicate = condition.predicate
+            rows = (row for row in rows if predicate(row))
+        if aggregation is not None:
+            rows = iter(aggregation.aggregate(rows))
+        else:
+            rows = ([row[i] for i in indices] for row in rows)
+        if keys:
+            rows = Sorter(keys, self.database.file_path).sort(rows, stop)
+        rows = islice(rows, offset, stop)
+        if aggregation is None and order_by:
+            rows = (row[:len(items)] for row in rows)
+        return items, rows
+
+    def rows(self, needed: set):
+        """
+        Joins the rows of the two tables.
+
+        Parameters:
+            needed (set): The positions of the columns of the joined rows that are needed.
+
+        Yields:
+            list: The joined rows. Columns that are not needed may be None.
+        """
+        width = len(self.left.metadata["columns"])
+        left_columns = {i for i in needed if i < width} | {self.left_key}
+        right_columns = {i - width for i in needed if i >= width} | {self.right_key}
+
+        left_size = self.left.disk_size()
+        right_size = self.right.disk_size()
+        if left_size <= right_size:
+            build, build_key, build_columns = self.left, self.left_key, left_columns
+            probe, probe_key, probe_columns = self.right, self.right_key, right_columns
+        else:
+            build, build_key, build_columns = self.right, self.right_key, right_columns
+            probe, probe_key, probe_columns = self.left, self.left_key, left_columns
+        build_is_left = build is self.left
+
+        if self.uses_primary_key(probe, probe_key) and min(left_size, right_size) * self.INDEX_RATIO <= max(left_size, right_size):
+            pairs = self.index_join(build.scan(columns=build_columns), build_key, probe, probe_columns)
+        else:
+            pairs = self.hash_join(build.scan(columns=build_columns), build_key,
+                                   probe.scan(columns=probe_columns), probe_key)
+        for build_row, probe_row in pairs:
+            yield build_row + probe_row if build_is_left else probe_row + build_row
+
+    def uses_primary_key(self, table, key: int) -> bool:
+        """
+        Returns whether a table is joined on its primary key and its index can be used.
+
+        Parameters:
+            table (Table): The table.
+            key (int): The position of the join column in its rows.
+        """
+        file_manager = self.database.file_manager
+        # The index does not cover logged statements that were not checkpointed yet, and
+        # the rows of a partitioned table are indexed by each partition.
+        return table.partitioning is None \
+            and table.metadata["columns"][key] == table.metadata["primary_key"] \
+            and not file_manager.has_pending(table.name) \
+            and file_manager.primary_index(table.name) is not None
+
+    def index_join(self, rows, key: int, table, columns: set):
+        """
+        Joins rows with the rows of a table that have their join value as primary key.
+
+        Parameters:
+            rows (iterable): The rows of the outer table.
+            key (int): The position of the join column in the outer rows.
+            table (Table): The table joined on its primary key.
+            columns (set): The positions of the columns of the table that are needed.
+
+        Yields:
+            tuple: The outer row and the matching row of the table.
+        """
+        file_manager = self.database.file_manager
+        index = file_manager.primary_index(table.name)
+        rows = iter(rows)
+        for batch in iter(lambda: list(islice(rows, self.BATCH_SIZE)), []):
+            matches = [(row, index.get(row[key])) for row in batch]
+            matches = [(row, locator) for row, locator in matches if locator is not None]
+            fetched = file_manager.fetch_rows(table.name, [locator for _, locator in matches], columns)
+            for (row, _), match in zip(matches, fetched):
+                yield row, match
+
+    def hash_join(self, build_rows, build_key: int, probe_rows, probe_key: int):
+        """
+        Joins two streams of rows with a hash table of the build rows, spilling to partitions if it grows too large.
+
+        Parameters:
+            build_rows (iterable): The rows of the smaller table.
+            build_key (int): The position of the join column in the build rows.
+            probe_rows (iterable): The rows of the larger table.
+            probe_key (int): The position of the join column in the probe rows.
+
+        Yields:
+            tuple: The build row and the probe row of every match.
+        """
+        build_rows = iter(build_rows)
+        table = {}
+        count = 0
+        for row in build_rows:
+            table.setdefault(row[build_key], []).append(row)
+            count += 1
+            if count % self.BATCH_SIZE == 0 and count * self.row_size(row) > self.MEMORY_LIMIT:
+                rows = (row for matches in table.values() for row in matches)
+                table = None
+                yield from self.partitioned_join(chain(rows, build_rows), build_key, probe_rows, probe_key)
+                return
+
+        for row in probe_rows:
+            matches = table.get(row[probe_key])
+            if matches is not None:
+                for match in matches:
+                    yield match, row
+
+    def partitioned_join(self, build_rows, build_key: int, probe_rows, probe_key: int):
+        """
+        Joins two streams of rows by splitting both into partitions on disk by the hash of their join values.
+
+        Parameters:
+            build_rows (iterable): The rows of the smaller table.
+            build_key (int): The position of the join column in the build rows.
+            probe_rows (iterable): The rows of the larger table.
+            probe_key (int): The position of the join column in the probe rows.
+
+        Yields:
+            tuple: The build row and the probe row of every match.
+        """
+        with tempfile.TemporaryDirectory(dir=self.database.file_path) as directory:
+            build_paths = self.partition(build_rows, build_key, os.path.join(directory, "build"))
+            probe_paths = self.partition(probe_rows, probe_key, os.path.join(directory, "probe"))
+            for build_path, probe_path in zip(build_paths, probe_paths):
+                table = {}
+                for row in self.read_partition(build_path):
+                    table.setdefault(row[build_key], []).append(row)
+                if not table:
+                    continue
+                for row in self.read_partition(probe_path):
+                    matches = table.get(row[probe_key])
+                    if matches is not None:
+                        for match in matches:
+                            yield match, row
+
+    def partition(self, rows, key: int, prefix: str) -> list:
+        """
+        Writes rows to PARTITIONS files by the hash of their join values, in pickled batches.
+
+        Parameters:
+            rows (iterable): The rows.
+            key (int): The position of the join column in the rows.
+            prefix (str): The path prefix of the partition files.
+
+        Returns:
+            list: The paths to the partition files.
+        """
+        paths = [f"{prefix}{i}" for i in range(self.PARTITIONS)]
+        files = [open(path, "wb") for path in paths]
+        batches = [[] for _ in paths]
+        try:
+            for row in rows:
+                i = hash(row[key]) % self.PARTITIONS
+                batches[i].append(row)
+                if len(batches[i]) == self.BATCH_SIZE:
+                    pickle.dump(batches[i], files[i])
+                    batches[i] = []
+            for file, batch in zip(files, batches):
+                if batch:
+                    pickle.dump(batch, file)
+        finally:
+            for file in files:
+                file.close()
+        return paths
+
+    @staticmethod
+    def read_partition(path: str):
+        """
+        Reads the rows of a partition file.
+
+        Parameters:
+            path (str): The path to the partition file.
+
+        Yields:
+            list: The rows.
+        """
+        with open(path, "rb") as file:
+            while True:
+                try:
+                    yield from pickle.load(file)
+                except EOFError:
+                    return
+
+    @staticmethod
+    def row_size(row: list) -> int:
+        """
+        Estimates the memory used by a row in the hash table.
+
+        Parameters:
+            row (list): The row.
+
+        Returns:
+            int: The estimated size in bytes.
+        """
+        return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
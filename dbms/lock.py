@@ -0,0 +1,354 @@
+"""
+lock.py
+
+This module provides the LockFile class used by DatabaseFileManager to coordinate the processes that open the same database.
+"""
+
+import errno
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ProcessLocks:
+    """
+    The bytes of a lock file held by the LockFile objects of this process.
+
+    POSIX record locks belong to a process, so two LockFile objects of the same
+    file in one process, such as those of two Database objects opened on the same
+    database, would share their locks instead of excluding each other, and
+    closing the file of one of them would release the locks of the other. The
+    LockFile objects of a file share one ProcessLocks instead, which opens the
+    file once, locks a byte for the process while any of them holds it, and makes
+    them wait for each other like other processes do.
+
+    Attributes:
+        file_path (str): The path to the lock file.
+        fd (int): The open lock file, or None until it is first used.
+        condition (threading.Condition): Held while the holders change, and notified when a byte is released.
+        shared (dict): The LockFile objects that hold every byte in shared mode.
+        exclusive (dict): The LockFile object that holds every byte in exclusive mode.
+        pending (set): The bytes this process is waiting for from other processes.
+        upgrading (dict): The LockFile object waiting to upgrade every byte from shared to exclusive mode.
+        users (int): The number of LockFile objects of the file.
+    """
+
+    # The ProcessLocks of the lock files used by this process, by absolute path.
+    files = {}
+    files_lock = threading.Lock()
+    # Number of seconds before asking again for a lock refused by the operating system to avoid a deadlock.
+    RETRY_DELAY = 0.01
+
+    def __init__(self, file_path: str):
+        """
+        Initializes the holders of a lock file without opening it.
+
+        Parameters:
+            file_path (str): The path to the lock file.
+        """
+        self.file_path = file_path
+        self.fd = None
+        self.condition = threading.Condition()
+        self.shared = {}
+        self.exclusive = {}
+        self.pending = set()
+        self.upgrading = {}
+        self.users = 0
+
+    @classmethod
+    def open(cls, file_path: str) -> "ProcessLocks":
+        """
+        Returns the ProcessLocks of a lock file, shared by every LockFile of the file in this process.
+
+        Parameters:
+            file_path (str): The path to the lock file.
+        """
+        key = os.path.abspath(file_path)
+        with cls.files_lock:
+            locks = cls.files.get(key)
+            if locks is None:
+                locks = cls.files[key] = ProcessLocks(file_path)
+            locks.users += 1
+            return locks
+
+    def close(self) -> None:
+        """
+        Closes the file once no LockFile of this process uses it.
+        """
+        key = os.path.abspath(self.file_path)
+        with ProcessLocks.files_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            ProcessLocks.files.pop(key, None)
+            with self.condition:
+                if self.fd is not None:
+                    os.close(self.fd)
+                    self.fd = None
+
+    def file(self) -> int:
+        """
+        Returns the open lock file, opening it on first use. The condition must be held.
+        """
+        if self.fd is None:
+            self.fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self.fd
+
+    def acquire(self, owner, offset: int, exclusive: bool, blocking: bool) -> bool:
+        """
+        Locks a byte for a LockFile that does not hold it, or holds it in shared mode and wants it exclusive.
+
+        Parameters:
+            owner (LockFile): The LockFile.
+            offset (int): The byte.
+            exclusive (bool): Whether the byte is locked in exclusive mode.
+            blocking (bool): Whether to wait until the byte is free.
+
+        Returns:
+            bool: Whether the byte was locked.
+
+        Raises:
+            ValueError: If another process or LockFile upgrades the byte to exclusive mode at
+                the same time, so both would wait for each other forever.
+        """
+        with self.condition:
+            shared = self.shared.setdefault(offset, set())
+            upgrade = owner in shared
+            try:
+                while offset in self.pending or offset in self.exclusive or (exclusive and shared - {owner}):
+                    if not blocking:
+                        return False
+                    if upgrade:
+                        if self.upgrading.get(offset, owner) is not owner:
+                            raise ValueError("Deadlock detected: another connection is waiting for this lock")
+                        self.upgrading[offset] = owner
+                    self.condition.wait()
+            finally:
+                if self.upgrading.get(offset) is owner:
+                    del self.upgrading[offset]
+            if not exclusive and shared:
+                # The process already holds the byte in shared mode.
+                shared.add(owner)
+                return True
+            if fcntl is None:
+                self.hold(owner, offset, exclusive)
+                return True
+            fd = self.file()
+            self.pending.add(offset)
+
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            while True:
+                try:
+                    fcntl.lockf(fd, mode if blocking else mode | fcntl.LOCK_NB, 1, offset)
+                    break
+                except (BlockingIOError, PermissionError):
+                    return False
+                except OSError as error:
+                    if error.errno != errno.EDEADLK:
+                        raise
+                    # A byte held in shared mode keeps it while waiting to be exclusive, so two
+                    # processes that upgrade the same byte would wait for each other forever.
+                    if upgrade:
+                        raise ValueError("Deadlock detected: another connection is waiting for this lock")
+                    # Otherwise the locks are always taken in the same order and the deadlock
+                    # reported by the operating system involves locks of other files.
+                    time.sleep(self.RETRY_DELAY)
+            with self.condition:
+                self.hold(owner, offset, exclusive)
+            return True
+        finally:
+            with self.condition:
+                self.pending.discard(offset)
+                self.condition.notify_all()
+
+    def hold(self, owner, offset: int, exclusive: bool) -> None:
+        """
+        Records that a LockFile holds a byte. The condition must be held.
+
+        Parameters:
+            owner (LockFile): The LockFile.
+            offset (int): The byte.
+            exclusive (bool): Whether the byte is held in exclusive mode.
+        """
+        if exclusive:
+            self.shared.get(offset, set()).discard(owner)
+            self.exclusive[offset] = owner
+        else:
+            self.shared.setdefault(offset, set()).add(owner)
+
+    def release(self, owner, offset: int, shared: bool) -> None:
+        """
+        Releases the byte of a LockFile, or changes it back to shared mode.
+
+        Parameters:
+            owner (LockFile): The LockFile.
+            offset (int): The byte.
+            shared (bool): Whether the LockFile keeps the byte in shared mode.
+        """
+        with self.condition:
+            if self.exclusive.get(offset) is owner:
+                del self.exclusive[offset]
+                if shared:
+                    self.shared.setdefault(offset, set()).add(owner)
+                    mode = fcntl.LOCK_SH if fcntl is not None else None
+                else:
+                    mode = fcntl.LOCK_UN if fcntl is not None else None
+            else:
+                holders = self.shared.get(offset, set())
+                holders.discard(owner)
+                mode = fcntl.LOCK_UN if fcntl is not None and not holders else None
+            if mode is not None and self.fd is not None:
+                fcntl.lockf(self.fd, mode, 1, offset)
+            self.condition.notify_all()
+
+
+class LockFile:
+    """
+    A file whose bytes are locked in shared or exclusive mode by the processes that open a database.
+
+    Every byte is a separate lock, held with POSIX record locks (lockf), so a
+    lock is released when its process exits, even if it crashes. A process may
+    acquire a byte it already holds again: the holds are nested, and the byte
+    stays exclusive as long as any of them is exclusive. A byte held in shared
+    mode keeps it while waiting to become exclusive; if another process waits to
+    upgrade the same byte, one of them fails instead of both waiting forever.
+
+    The LockFile objects of the same file in one process exclude each other as
+    if they were in different processes (see ProcessLocks).
+
+    The file also holds a version number, incremented by the process that
+    changes what the lock protects, so other processes can tell when what they
+    keep in memory is out of date.
+
+    Without fcntl (on Windows) the locks only exclude the LockFile objects of
+    the same process and the version never changes, so a database must only be
+    opened by one process at a time.
+
+    Attributes:
+        file_path (str): The path to the lock file.
+        locks (ProcessLocks): The holders of the bytes of the file in this process, or None until first used.
+        holds (dict): The nested holds of every locked byte, as lists of modes (True for exclusive).
+    """
+
+    # Offset of the version number in the file, after the locked bytes.
+    VERSION_OFFSET = 8
+
+    def __init__(self, file_path: str):
+        """
+        Initializes the lock without opening its file.
+
+        Parameters:
+            file_path (str): The path to the lock file, created on first use.
+        """
+        self.file_path = file_path
+        self.locks = None
+        self.holds = {}
+
+    def process_locks(self) -> ProcessLocks:
+        """
+        Returns the holders of the bytes of the file in this process.
+        """
+        if self.locks is None:
+            self.locks = ProcessLocks.open(self.file_path)
+        return self.locks
+
+    def acquire(self, offset: int, exclusive: bool = False, blocking: bool = True) -> bool:
+        """
+        Locks a byte of the file.
+
+        Parameters:
+            offset (int): The byte.
+            exclusive (bool): Whether no other process may hold the byte at the same time.
+            blocking (bool): Whether to wait until the byte is free.
+
+        Returns:
+            bool: Whether the byte was locked. Always True when blocking.
+
+        Raises:
+            ValueError: If the byte is held in shared mode and another process waits to
+                upgrade it too, so waiting would never end.
+        """
+        holds = self.holds.setdefault(offset, [])
+        if not (holds and (any(holds) or not exclusive)):
+            if not self.process_locks().acquire(self, offset, exclusive, blocking):
+                return False
+        holds.append(exclusive)
+        return True
+
+    def release(self, offset: int) -> None:
+        """
+        Releases the last hold of a byte, going back to the mode of the previous one.
+
+        Parameters:
+            offset (int): The byte.
+        """
+        holds = self.holds.get(offset)
+        if not holds:
+            return
+        exclusive = holds.pop()
+        if not holds:
+            self.locks.release(self, offset, False)
+        elif exclusive and not any(holds):
+            self.locks.release(self, offset, True)
+
+    def held(self, offset: int, exclusive: bool = False) -> bool:
+        """
+        Returns whether this process holds a byte.
+
+        Parameters:
+            offset (int): The byte.
+            exclusive (bool): Whether the byte must be held in exclusive mode.
+        """
+        holds = self.holds.get(offset)
+        return bool(holds) and (any(holds) or not exclusive)
+
+    def version(self) -> int:
+        """
+        Returns the version number stored in the file.
+        """
+        if fcntl is None:
+            return 0
+        locks = self.process_locks()
+        with locks.condition:
+            data = os.pread(locks.file(), 8, self.VERSION_OFFSET)
+        return int.from_bytes(data, "little") if len(data) == 8 else 0
+
+    def bump(self) -> int:
+        """
+        Increments the version number stored in the file. A byte must be held in exclusive mode.
+
+        Returns:
+            int: The new version number.
+        """
+        version = self.version() + 1
+        if fcntl is not None:
+            locks = self.process_locks()
+            with locks.condition:
+                os.pwrite(locks.file(), version.to_bytes(8, "little"), self.VERSION_OFFSET)
+        return version
+
+    def close(self) -> None:
+        """
+        Releases every byte and closes the file.
+        """
+        if self.locks is not None:
+            for offset, holds in self.holds.items():
+                if holds:
+                    self.locks.release(self, offset, False)
+            self.locks.close()
+            self.locks = None
+        self.holds.clear()
+
+    def remove(self) -> None:
+        """
+        Closes and removes the lock file.
+        """
+        self.close()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
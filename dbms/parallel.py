@@ -0,0 +1,137 @@
+"""
+parallel.py
+
+This module provides the ParallelScan class that splits the scans of large tables among worker processes.
+"""
+
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+
+
+def scan_chunk(storage, blocks: list, columns, dead: set, condition, output: str, argument):
+    """
+    Scans a chunk of a table in a worker process.
+
+    Parameters:
+        storage (CsvStorage | ColumnarStorage): The storage of the table.
+        blocks (list): The blocks of the chunk, as (start, count) in table order.
+        columns (list): The positions of the columns that are needed, or None for every column.
+        dead (set): The locators of the deleted rows of the chunk.
+        condition (Condition): The compiled condition, or None.
+        output (str): What is returned for the rows that satisfy the condition:
+            "rows" for the selected columns, "groups" for the partial aggregates and
+            "locators" for the locators with some of the columns.
+        argument (list | Aggregation): The positions of the selected columns (None for every
+            column) for "rows" and "locators", the aggregation for "groups".
+
+    Returns:
+        list | dict: The selected rows, the (locator, values) pairs or the partial groups.
+    """
+    pairs = ((locator, row) for locator, row in storage.read_blocks(blocks, columns) if locator not in dead)
+    if condition is not None:
+        predicate = condition.predicate
+        pairs = ((locator, row) for locator, row in pairs if predicate(row))
+    if output == "groups":
+        return argument.accumulate(row for _, row in pairs)
+    if output == "locators":
+        return [(locator, [row[i] for i in argument]) for locator, row in pairs]
+    if argument is None:
+        return [row for _, row in pairs]
+    return [[row[i] for i in argument] for _, row in pairs]
+
+
+class ParallelScan:
+    """
+    A pool of worker processes that scan chunks of a table at the same time.
+
+    A table is split into chunks of consecutive blocks of its zone map, which
+    always start at a row. Every worker reads its chunks from the table files and
+    evaluates the condition and the projection, or the partial aggregates, of
+    their rows, so only the results are sent back. The results of the chunks are
+    returned in table order. The processes are started the first time a scan is
+    split, and kept until the database is closed.
+
+    Attributes:
+        workers (int): The number of worker processes. Scans are never split with 1.
+        pool (ProcessPoolExecutor): The worker processes, or None until they are started.
+    """
+
+    # Number of chunks of a scan per worker, so workers that finish early take more chunks.
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, workers: int):
+        """
+        Initializes the pool without starting its processes.
+
+        Parameters:
+            workers (int): The number of worker processes.
+
+        Raises:
+            ValueError: If the number of workers is not positive.
+        """
+        if workers < 1:
+            raise ValueError("Invalid number of workers")
+        self.workers = workers
+        self.pool = None
+
+    def chunks(self, blocks: list) -> list:
+        """
+        Splits blocks into chunks of consecutive blocks with about the same number of rows.
+
+        Parameters:
+            blocks (list): The blocks, as (start, count) in table order.
+
+        Returns:
+            list: The chunks, as lists of blocks.
+        """
+        total = sum(count for _, count in blocks)
+        size = max(1, -(-total // (self.workers * self.CHUNKS_PER_WORKER)))
+        chunks = []
+        chunk = []
+        rows = 0
+        for block in blocks:
+            chunk.append(block)
+            rows += block[1]
+            if rows >= size:
+                chunks.append(chunk)
+                chunk = []
+                rows = 0
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def scan(self, storage, blocks: list, columns, dead: set, condition, output: str, argument):
+        """
+        Scans blocks of a table in the worker processes.
+
+        Parameters:
+            storage (CsvStorage | ColumnarStorage): The storage of the table.
+            blocks (list): The blocks to read, as (start, count) in table order.
+            columns (list): The positions of the columns that are needed, or None for every column.
+            dead (set): The locators of the deleted rows of the table.
+            condition (Condition): The compiled condition, or None.
+            output (str): What is returned for the rows that satisfy the condition (see scan_chunk()).
+            argument (list | Aggregation): The selected columns or the aggregation (see scan_chunk()).
+
+        Returns:
+            iterator: The results of the chunks, in table order.
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers)
+        chunks = self.chunks(blocks)
+        # Only the deleted rows between the first row of a chunk and the next chunk are sent with it.
+        dead = sorted(dead)
+        starts = [bisect.bisect_left(dead, chunk[0][0]) for chunk in chunks] + [len(dead)]
+        tasks = []
+        for i, chunk in enumerate(chunks):
+            chunk_dead = set(dead[starts[i]:starts[i + 1]])
+            tasks.append(self.pool.submit(scan_chunk, storage, chunk, columns, chunk_dead, condition, output, argument))
+        return (task.result() for task in tasks)
+
+    def close(self) -> None:
+        """
+        Stops the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
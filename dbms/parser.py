@@ -1,5 +1,8 @@
 
 class Parser:
+    # Keywords that start a clause of a SELECT after the table name.
+    SELECT_CLAUSES = ("JOIN", "ON", "WHERE", "GROUP", "ORDER", "LIMIT", "OFFSET")
+
     def __init__(self, msg):
         self.msg = msg
         self_lex = None
@@ -38,12 +41,51 @@ class Parser:
                 self.args["columns"] = columns
                 self.args["data_types"] = data_types
                 self.args["primary_key"] = self.lex[i+1]
-                try:
-                    self.args.append({"foreign_keys": self.lex[i+2:]})
-                except:
-                    pass
+                for j in range(i+2, len(self.lex)):
+                    if self.lex[j].upper() == "STORAGE":
+                        if j + 1 >= len(self.lex):
+                            raise ValueError("Invalid command")
+                        self.args["storage"] = self.lex[j+1].lower()
+                        del self.lex[j:j+2]
+                        break
+                # PARTITION BY HASH(<column>) <partitions> | PARTITION BY RANGE(<column>) <bound> ...
+                for j in range(i+2, len(self.lex)):
+                    if self.lex[j].upper() == "PARTITION":
+                        if j + 2 >= len(self.lex) or self.lex[j+1].upper() != "BY":
+                            raise ValueError("Invalid command")
+                        kind, _, column = self.lex[j+2].partition("(")
+                        if not column.endswith(")"):
+                            raise ValueError("Invalid command")
+                        k = j + 3
+                        while k < len(self.lex) and self.lex[k].upper() != "FOREIGN_KEY":
+                            k += 1
+                        self.args["partitioning"] = {"kind": kind.lower(), "column": column[:-1],
+                                                     "values": self.lex[j+3:k]}
+                        del self.lex[j:k]
+                        break
+                # FOREIGN_KEY <column> <table>.<column> ...
+                rest = self.lex[i+2:]
+                if rest:
+                    if rest[0].upper() != "FOREIGN_KEY" or len(rest) < 3 or len(rest) % 2 == 0:
+                        raise ValueError("Invalid command")
+                    foreign_keys = {}
+                    for column, reference in zip(rest[1::2], rest[2::2]):
+                        if reference.count(".") != 1:
+                            raise ValueError("Invalid command")
+                        foreign_keys[column] = reference.split(".")
+                    self.args["foreign_keys"] = foreign_keys
                 return self.command, self.table, self.args
             
+            # Index operation
+            elif self.lex[1].upper() == "INDEX":
+                if len(self.lex) != 6 or self.lex[3].upper() != "ON":
+                    raise ValueError("Invalid command")
+                self.command = 9
+                self.table = self.lex[4]
+                self.args["name"] = self.lex[2]
+                self.args["column"] = self.lex[5]
+                return self.command, self.table, self.args
+
             # Database operation
             elif self.lex[1].upper() == "DATABASE":
                 self.command = 1
@@ -55,26 +97,77 @@ class Parser:
 
         # INSERT operation
         elif self.lex[0].upper() == "INSERT" and self.lex[1].upper() == "INTO":
-            self.command = 3
             self.table = self.lex[2]
-            self.args = self.lex[4:]
+            # Several rows are separated by commas outside quoted values
+            rows = self.split_rows(self.msg.split(None, 4)[4] if len(self.lex) > 4 else "")
+            if len(rows) > 1:
+                self.command = 10
+                self.args = rows
+            else:
+                self.command = 3
+                self.args = rows[0]
+            return self.command, self.table, self.args
+
+        # COPY operation
+        elif self.lex[0].upper() == "COPY":
+            if len(self.lex) not in (4, 5) or self.lex[2].upper() != "FROM" \
+                    or (len(self.lex) == 5 and self.lex[4].upper() != "HEADER"):
+                raise ValueError("Invalid command")
+            self.command = 11
+            self.table = self.lex[1]
+            self.args["file"] = self.lex[3].strip("'\"")
+            self.args["header"] = len(self.lex) == 5
             return self.command, self.table, self.args
         
         # SELECT operation
         elif self.lex[0].upper() == "SELECT":
             self.command = 4
+            clauses = {}
             for i in range(1, len(self.lex)):
                 if self.lex[i].upper() == "FROM":
                     self.table = self.lex[i+1]
-                    self.args = self.lex[1:i]
+                    self.args = self.split_columns(" ".join(self.lex[1:i]))
                     break
-            if "WHERE" in self.lex:
-                for i in range(len(self.lex)):
-                    if self.lex[i].upper() == "WHERE":
-                        condition = self.lex[i+1:]
-                        self.conditions = " ".join(condition).split(",")
-                        break
-            return self.command, self.table, self.args, self.conditions
+            i = self.lex.index(self.table, i) + 1 if self.table is not None else len(self.lex)
+            while i < len(self.lex):
+                keyword = self.lex[i].upper()
+                end = i + 1
+                while end < len(self.lex) and self.lex[end].upper() not in self.SELECT_CLAUSES:
+                    end += 1
+                value = self.lex[i+1:end]
+                if keyword == "JOIN":
+                    if len(value) != 1:
+                        raise ValueError("Invalid command")
+                    clauses["join"] = value[0]
+                elif keyword == "ON":
+                    on = " ".join(value).split("==")
+                    if "join" not in clauses or len(on) != 2:
+                        raise ValueError("Invalid command")
+                    clauses["on"] = [column.strip() for column in on]
+                elif keyword == "WHERE":
+                    self.conditions = " ".join(value).split(",")
+                elif keyword == "GROUP":
+                    if len(value) < 2 or value[0].upper() != "BY":
+                        raise ValueError("Invalid command")
+                    clauses["group_by"] = " ".join(value[1:]).replace(",", " ").split()
+                elif keyword == "ORDER":
+                    if len(value) < 2 or value[0].upper() != "BY":
+                        raise ValueError("Invalid command")
+                    order_by = []
+                    for key in " ".join(value[1:]).split(","):
+                        key = key.split()
+                        if len(key) not in (1, 2) or (len(key) == 2 and key[1].upper() not in ("ASC", "DESC")):
+                            raise ValueError("Invalid command")
+                        order_by.append((key[0], len(key) == 2 and key[1].upper() == "DESC"))
+                    clauses["order_by"] = order_by
+                elif keyword in ("LIMIT", "OFFSET"):
+                    if len(value) != 1 or not value[0].isdigit():
+                        raise ValueError("Invalid command")
+                    clauses[keyword.lower()] = int(value[0])
+                else:
+                    raise ValueError("Invalid command")
+                i = end
+            return self.command, self.table, self.args, self.conditions, clauses
         
         # UPDATE operation
         elif self.lex[0].upper() == "UPDATE" and self.lex[2].upper() == "SET":
@@ -104,6 +197,45 @@ class Parser:
                     self.conditions = " ".join(condition).split(",")
                     break
             return self.command, self.table, self.conditions
+        # VACUUM operation
+        elif self.lex[0].upper() == "VACUUM":
+            if len(self.lex) != 2:
+                raise ValueError("Invalid command")
+            self.command = 12
+            self.table = self.lex[1]
+            return self.command, self.table
+        # ANALYZE operation
+        elif self.lex[0].upper() == "ANALYZE":
+            if len(self.lex) != 2:
+                raise ValueError("Invalid command")
+            self.command = 13
+            self.table = self.lex[1]
+            return self.command, self.table
+        # EXPLAIN operation
+        elif self.lex[0].upper() == "EXPLAIN":
+            if len(self.lex) < 2:
+                raise ValueError("Invalid command")
+            self.command = 14
+            return self.command, Parser(" ".join(self.lex[1:])).parse()
+        # PREPARE <name> AS <statement>
+        elif self.lex[0].upper() == "PREPARE":
+            if len(self.lex) < 4 or self.lex[2].upper() != "AS":
+                raise ValueError("Invalid command")
+            self.command = 15
+            # The statement is kept as written, with the spaces of its quoted values
+            return self.command, self.lex[1], self.msg.split(None, 3)[3].strip()
+        # EXECUTE <name> <value1> <value2> ...
+        elif self.lex[0].upper() == "EXECUTE":
+            if len(self.lex) < 2:
+                raise ValueError("Invalid command")
+            self.command = 16
+            return self.command, self.lex[1], self.lex[2:]
+        # DEALLOCATE <name>
+        elif self.lex[0].upper() == "DEALLOCATE":
+            if len(self.lex) != 2:
+                raise ValueError("Invalid command")
+            self.command = 17
+            return self.command, self.lex[1]
         # DROP operation
         elif self.lex[0].upper() == "DROP":
             if self.lex[1].upper() == "DATABASE":
@@ -118,6 +250,81 @@ class Parser:
         else:
             raise ValueError("Invalid command")
 
+    @staticmethod
+    def split_rows(text: str) -> list:
+        """
+        Splits the values of an INSERT into rows, at the commas, and the rows into values, at the spaces.
+
+        Quoted values are kept whole, quotes included, so they may hold commas and spaces.
+
+        Parameters:
+            text (str): The text after VALUES.
+
+        Returns:
+            list: The rows, as lists of values.
+
+        Raises:
+            ValueError: If a quoted value is not closed.
+        """
+        rows = [[]]
+        value = []
+        quote = None
+        for char in text + " ":
+            if quote is not None:
+                value.append(char)
+                if char == quote:
+                    quote = None
+            elif char in "\"'":
+                value.append(char)
+                quote = char
+            elif char.isspace() or char == ",":
+                if value:
+                    rows[-1].append("".join(value))
+                    value = []
+                if char == ",":
+                    rows.append([])
+            else:
+                value.append(char)
+        if quote is not None:
+            raise ValueError("Invalid command")
+        return rows
+
+    @staticmethod
+    def split_columns(text: str) -> list:
+        """
+        Splits the select list into items, at the commas and spaces outside parentheses.
+
+        Spaces inside parentheses are removed, so "COUNT( * )" is read as "COUNT(*)".
+
+        Parameters:
+            text (str): The text between SELECT and FROM.
+
+        Returns:
+            list: The selected items.
+
+        Raises:
+            ValueError: If the parentheses are not balanced.
+        """
+        items = []
+        item = []
+        depth = 0
+        for char in text + " ":
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth < 0:
+                    raise ValueError("Invalid command")
+            if char.isspace() or (char == "," and depth == 0):
+                if depth == 0 and item:
+                    items.append("".join(item))
+                    item = []
+            else:
+                item.append(char)
+        if depth != 0:
+            raise ValueError("Invalid command")
+        return items
+
     def normalize(self, value:list[str], n_to_group:int) -> list[str]:
         """
         Normalizes the values of the list, deleting spaces and divide it in places.
@@ -0,0 +1,226 @@
+"""
+partition.py
+
+This module provides the Partitioning class that spreads the rows of a partitioned table among its partitions.
+"""
+
+import ast
+import bisect
+import zlib
+
+from dbms.codec import CONVERTERS
+
+
+class Partitioning:
+    """
+    How the rows of a partitioned table are spread among its partitions.
+
+    Every partition is stored as a table of its own, named after the partitioned
+    table and its number (see table_name()), with its own files, indexes, zone map
+    and deleted rows, so statements only read and rewrite the partitions they need.
+    The partitions share the metadata of the partitioned table.
+
+    HASH(column) n spreads the rows among n partitions by the CRC32 checksum of
+    the text of their value in the partition column. RANGE(column) b1 ... bk
+    makes k + 1 partitions: partition 0 holds the values below b1, partition i
+    the values from bi up to b(i+1), and partition k the values from bk.
+
+    Attributes:
+        kind (str): "hash" or "range".
+        column (str): The name of the partition column.
+        position (int): The position of the partition column in a row.
+        convert (function): Converts a value to the data type of the partition column.
+        bounds (list): The lowest value of every partition after the first one, for range partitioning.
+        tables (list): The names of the partitions, in order.
+    """
+
+    KINDS = ("hash", "range")
+
+    def __init__(self, definition: dict, columns: list, data_types: list):
+        """
+        Initializes the partitioning of a table from its metadata.
+
+        Parameters:
+            definition (dict): The "partitioning" entry of the table metadata, as returned by define().
+            columns (list): The list of column names of the table.
+            data_types (list): The data types of the columns.
+        """
+        self.kind = definition["kind"]
+        self.column = definition["column"]
+        self.position = columns.index(self.column)
+        self.convert = CONVERTERS[data_types[self.position]]
+        self.bounds = definition.get("bounds", [])
+        self.tables = definition["tables"]
+
+    @staticmethod
+    def table_name(table_name: str, number: int) -> str:
+        """
+        Returns the name of a partition of a table.
+
+        Parameters:
+            table_name (str): The name of the partitioned table.
+            number (int): The number of the partition.
+        """
+        return f"{table_name}#{number}"
+
+    @classmethod
+    def define(cls, table_name: str, kind: str, column: str, values: list, columns: list, data_types: list) -> dict:
+        """
+        Validates the partitioning of a new table.
+
+        Parameters:
+            table_name (str): The name of the table.
+            kind (str): "hash" or "range".
+            column (str): The name of the partition column.
+            values (list): The number of partitions for hash partitioning, or the bounds of the
+                partitions for range partitioning, as text.
+            columns (list): The list of column names of the table.
+            data_types (list): The data types of the columns.
+
+        Returns:
+            dict: The "partitioning" entry of the table metadata.
+
+        Raises:
+            ValueError: If the partitioning is not valid.
+        """
+        if kind not in cls.KINDS:
+            raise ValueError("Invalid partitioning")
+        if column not in columns:
+            raise ValueError(f"Column {column} not found")
+        convert = CONVERTERS.get(data_types[columns.index(column)])
+        if convert is None:
+            raise ValueError("Bad data type for a partition column")
+
+        definition = {"kind": kind, "column": column}
+        if kind == "hash":
+            if len(values) != 1 or not values[0].isdigit() or int(values[0]) < 1:
+                raise ValueError("Invalid number of partitions")
+            count = int(values[0])
+        else:
+            try:
+                bounds = [convert(value) for value in values]
+            except ValueError:
+                raise ValueError("Bad input values")
+            if not bounds or any(low >= high for low, high in zip(bounds, bounds[1:])):
+                raise ValueError("The bounds of the partitions must be increasing")
+            definition["bounds"] = bounds
+            count = len(bounds) + 1
+        definition["tables"] = [cls.table_name(table_name, number) for number in range(count)]
+        return definition
+
+    def route(self, row: list) -> int:
+        """
+        Returns the partition of a row.
+
+        Parameters:
+            row (list): The row with the data types applied.
+
+        Returns:
+            int: The number of the partition.
+        """
+        return self.partition(row[self.position])
+
+    def partition(self, value) -> int:
+        """
+        Returns the partition of a value of the partition column.
+
+        Parameters:
+            value: The value, with the data type of the column.
+
+        Returns:
+            int: The number of the partition.
+        """
+        if self.kind == "hash":
+            if isinstance(value, float) and value == 0:
+                # -0.0 is equal to 0.0 but has another text.
+                value = 0.0
+            return zlib.crc32(str(value).encode("utf-8")) % len(self.tables)
+        return bisect.bisect_right(self.bounds, value)
+
+    def prune(self, condition) -> list:
+        """
+        Finds the partitions that may have rows satisfying a condition.
+
+        Hash partitions are pruned when the condition requires the partition column to
+        be equal to a value or in a list of values, and range partitions when it
+        restricts the partition column to a range (see Condition.bounds()).
+
+        Parameters:
+            condition (Condition): The compiled condition, or None.
+
+        Returns:
+            list: The numbers of the partitions, in order.
+        """
+        partitions = list(range(len(self.tables)))
+        if condition is None:
+            return partitions
+        if self.kind == "hash":
+            values = self.values(condition)
+            if values is None:
+                return partitions
+            return sorted({self.partition(value) for value in values})
+
+        bounds = condition.bounds(self.column)
+        if bounds is None:
+            return partitions
+        low, _, high, high_inclusive = bounds
+        try:
+            first = 0 if low is None else bisect.bisect_right(self.bounds, low)
+            if high is None:
+                last = len(self.bounds)
+            elif high_inclusive:
+                last = bisect.bisect_right(self.bounds, high)
+            else:
+                last = bisect.bisect_left(self.bounds, high)
+        except TypeError:
+            return partitions
+        return partitions[first:last + 1]
+
+    def values(self, condition):
+        """
+        Finds the values that the partition column must be equal to for a condition to hold.
+
+        Only the comparisons that are AND'ed at the top level of the condition are
+        used: equalities with a literal value and 'column in (values)'.
+
+        Parameters:
+            condition (Condition): The compiled condition.
+
+        Returns:
+            list: The values with the data type of the column, or None if any value may satisfy the condition.
+        """
+        values = None
+        for column, operator, value in condition.conjuncts():
+            if column == self.column and operator == "==":
+                values = [value]
+                break
+        if values is None:
+            for node in self.top_level(condition.tree.body):
+                if isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.ops[0], ast.In) \
+                        and isinstance(node.left, ast.Name) and node.left.id == self.column \
+                        and isinstance(node.comparators[0], (ast.Tuple, ast.List)) \
+                        and all(map(condition.is_literal, node.comparators[0].elts)):
+                    values = [ast.literal_eval(element) for element in node.comparators[0].elts]
+                    break
+        if values is None:
+            return None
+        converted = []
+        for value in values:
+            try:
+                converted.append(self.convert(value))
+            except (TypeError, ValueError):
+                # A value of another type is never equal to a value of the column.
+                continue
+        return converted
+
+    @staticmethod
+    def top_level(node: ast.AST) -> list:
+        """
+        Returns the expressions AND'ed at the top level of a condition.
+
+        Parameters:
+            node (ast.AST): The body of the syntax tree of the condition.
+        """
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            return node.values
+        return [node]
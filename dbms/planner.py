@@ -0,0 +1,185 @@
+"""
+planner.py
+
+This module provides the Planner class that chooses how to read the rows of a table that may satisfy a condition.
+"""
+
+from dbms.statistics import TableStatistics
+
+
+class Plan:
+    """
+    The access path chosen for a condition on a table.
+
+    Attributes:
+        access (str): How the rows are read, one of the access paths of Planner.
+        index (str): The name of the index that locates the rows, or None.
+        locators (list): The located rows in table order for index access paths, or None.
+        blocks (list): The blocks of the zone map that are read when skipping blocks, or None.
+        rows_read (int): The estimated number of rows read from the table.
+        estimated_rows (int): The estimated number of rows that satisfy the condition.
+        cost (float): The estimated cost of reading the rows.
+        workers (int): The number of worker processes that read the rows, 1 when they are not read in parallel.
+    """
+
+    def __init__(self, access: str, rows_read: int, cost: float, index: str = None, blocks: list = None,
+                 workers: int = 1):
+        """
+        Initializes a plan.
+
+        Parameters:
+            access (str): How the rows are read.
+            rows_read (int): The estimated number of rows read from the table.
+            cost (float): The estimated cost of reading the rows.
+            index (str): The name of the index that locates the rows, or None.
+            blocks (list): The blocks of the zone map that are read, or None.
+            workers (int): The number of worker processes that read the rows.
+        """
+        self.access = access
+        self.rows_read = rows_read
+        self.cost = cost
+        self.index = index
+        self.blocks = blocks
+        self.workers = workers
+        self.locators = None
+        self.estimated_rows = 0
+
+    def describe(self) -> str:
+        """
+        Returns the access path with the index or the worker processes it uses, for EXPLAIN.
+        """
+        if self.workers > 1:
+            return f"parallel {self.access} ({self.workers} workers)"
+        return self.access if self.index is None else f"{self.access} ({self.index})"
+
+
+class Planner:
+    """
+    Chooses the cheapest access path to the rows of a table that may satisfy a condition.
+
+    The candidates are a full scan of the table, a lookup in the primary key index
+    when the condition requires the key to be equal to a value, a range scan of the
+    secondary indexes of the columns the condition restricts, and a scan of only
+    the blocks of the zone map that may satisfy the condition. Scans of the table
+    or of its blocks may also be split among the worker processes of the database
+    (see ParallelScan), which divides the cost of reading the rows by the number
+    of workers but adds the cost of starting the scan and of sending the matching
+    rows back. The cost of a path is the number of rows it reads times the cost of
+    reading a row that way.
+
+    The rows read by a block scan are known from the zone map. The rows read from
+    an index are estimated from the selectivity of the range of its column, using
+    the statistics gathered by ANALYZE (see TableStatistics), and the number of
+    rows of the table is taken from the primary key index or the zone map.
+
+    Attributes:
+        table (Table): The table.
+        file_manager (DatabaseFileManager): The file manager of the database.
+        statistics (TableStatistics): The statistics of the table.
+    """
+
+    FULL_SCAN = "full scan"
+    PRIMARY_KEY = "primary key lookup"
+    INDEX_RANGE = "index range scan"
+    BLOCKS = "block scan"
+
+    # Cost of reading a row, relative to reading the next row of a text table, by storage engine:
+    # the next row of a scan, a row of a scan evaluated with NumPy, and a row fetched by its locator.
+    ROW_COSTS = {
+        "csv": {"scan": 1.0, "vectorized": 1.6, "fetch": 1.7},
+        "columnar": {"scan": 0.65, "vectorized": 0.35, "fetch": 0.95},
+    }
+    # Cost of reading a row of a table that is cached in memory.
+    CACHED_COST = 0.1
+    # Cost of starting a parallel scan, and of receiving a row from a worker process.
+    PARALLEL_COST = 2000
+    TRANSFER_COST = 0.6
+
+    def __init__(self, table):
+        """
+        Initializes the planner of a table.
+
+        Parameters:
+            table (Table): The table.
+        """
+        self.table = table
+        self.file_manager = table.file_manager
+        self.statistics = TableStatistics(table.metadata.get("statistics"))
+
+    def row_count(self) -> int:
+        """
+        Returns the number of rows of the table, not counting the deleted rows.
+        """
+        primary = self.file_manager.primary_index(self.table.name)
+        if primary is not None:
+            return len(primary)
+        zone_map = self.file_manager.zone_map(self.table.name)
+        return max(0, zone_map.row_count() - len(self.file_manager.dead_rows(self.table.name)))
+
+    def plan(self, condition=None, vectorized: bool = False, parallel: str = None) -> Plan:
+        """
+        Chooses the access path for a condition.
+
+        Parameters:
+            condition (Condition): The compiled condition, or None.
+            vectorized (bool): Whether a full scan may be evaluated with NumPy.
+            parallel (str): What the worker processes would send back if the scan is split among them:
+                "rows", "locators" or "groups" (see ParallelScan), or None if it may not be split.
+
+        Returns:
+            Plan: The cheapest plan, with the located rows of index plans.
+        """
+        name = self.table.name
+        metadata = self.table.metadata
+        file_manager = self.file_manager
+        costs = self.ROW_COSTS[metadata.get("storage", "csv")]
+        rows = self.row_count()
+        estimated_rows = round(rows * self.statistics.selectivity(condition))
+
+        if file_manager.is_cached(name):
+            plans = [Plan(self.FULL_SCAN, rows, rows * self.CACHED_COST)]
+        else:
+            plans = [Plan(self.FULL_SCAN, rows, rows * costs["vectorized" if vectorized else "scan"])]
+            blocks = file_manager.candidate_blocks(name, condition)
+            if blocks is not None:
+                read = sum(count for _, count in blocks)
+                plans.append(Plan(self.BLOCKS, read, read * costs["scan"], blocks=blocks))
+            workers = file_manager.parallel.workers
+            # The worker processes read the table files, which do not have the logged statements.
+            if parallel is not None and workers > 1 and not file_manager.has_pending(name):
+                sent = 0 if parallel == "groups" else estimated_rows
+                for plan in list(plans):
+                    cost = self.PARALLEL_COST + plan.rows_read * costs["scan"] / workers + sent * self.TRANSFER_COST
+                    plans.append(Plan(plan.access, plan.rows_read, cost, blocks=plan.blocks, workers=workers))
+
+        # The indexes do not cover logged statements that were not checkpointed yet.
+        if condition is not None and not file_manager.has_pending(name):
+            primary_key = metadata["primary_key"]
+            if any(column == primary_key and operator == "==" for column, operator, _ in condition.conjuncts()):
+                if file_manager.primary_index(name) is not None:
+                    plans.append(Plan(self.PRIMARY_KEY, 1, costs["fetch"], index=primary_key))
+            for index_name, column in metadata.get("indexes", {}).items():
+                bounds = condition.bounds(column)
+                if bounds is None:
+                    continue
+                try:
+                    read = round(rows * self.statistics.range(column, *bounds))
+                except TypeError:
+                    read = rows
+                plans.append(Plan(self.INDEX_RANGE, read, read * costs["fetch"], index=index_name))
+
+        # Ties are resolved in favor of the paths added first.
+        plan = min(plans, key=lambda plan: plan.cost)
+        if plan.access == self.PRIMARY_KEY:
+            value = next(value for column, operator, value in condition.conjuncts()
+                         if column == plan.index and operator == "==")
+            locator = file_manager.primary_index(name).get(value)
+            plan.locators = [] if locator is None else [locator]
+        elif plan.access == self.INDEX_RANGE:
+            bounds = condition.bounds(metadata["indexes"][plan.index])
+            plan.locators = sorted(file_manager.secondary_index(name, plan.index).range(*bounds))
+        plan.estimated_rows = estimated_rows
+        if plan.access == self.PRIMARY_KEY:
+            # At most one row has the key.
+            plan.estimated_rows = min(plan.estimated_rows, 1)
+        return plan
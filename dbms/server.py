@@ -0,0 +1,460 @@
+"""
+server.py
+
+This module provides the DatabaseServer class that serves databases to many clients over a socket, and the Client class that connects to it.
+"""
+
+import asyncio
+import io
+import json
+import pickle
+import re
+import socket
+import struct
+import tempfile
+import threading
+from itertools import islice
+
+from dbms.database import Database
+from dbms.exeptions import DroppedDatabaseError
+from dbms.executor import Executor
+
+
+# Header of every frame the server sends: the kind of the frame and the length of its payload.
+FRAME = struct.Struct(">cI")
+
+
+def encode_value(value):
+    """
+    Converts a value that JSON does not support, such as a NumPy number, to one it does.
+
+    Parameters:
+        value: The value.
+    """
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class ResultSpool:
+    """
+    The selected rows of a statement, kept until they are sent to the client.
+
+    The rows are read while the statement holds the locks of its tables, and only
+    sent once it released them, so a client that reads its answer slowly does not
+    hold up the other statements. The first rows are kept in memory and the rest
+    in a temporary file.
+
+    Attributes:
+        headers (list): The names of the selected columns.
+        batch_size (int): The number of rows of every batch.
+        batches (list): The batches of rows kept in memory.
+        rows (int): The number of rows kept in memory.
+        file (file): The temporary file with the other batches, pickled one after another, or None.
+    """
+
+    # Number of rows kept in memory before the rest are written to a temporary file.
+    MEMORY_ROWS = 65536
+
+    def __init__(self, headers: list, batch_size: int):
+        self.headers = list(headers)
+        self.batch_size = batch_size
+        self.batches = []
+        self.rows = 0
+        self.file = None
+
+    def extend(self, rows) -> None:
+        """
+        Keeps rows.
+
+        Parameters:
+            rows (iterable): The rows.
+        """
+        rows = iter(rows)
+        while True:
+            batch = [list(row) for row in islice(rows, self.batch_size)]
+            if not batch:
+                return
+            if self.rows < self.MEMORY_ROWS:
+                self.batches.append(batch)
+                self.rows += len(batch)
+            else:
+                if self.file is None:
+                    self.file = tempfile.TemporaryFile()
+                pickle.dump(batch, self.file)
+
+    def read(self):
+        """
+        Reads the kept rows.
+
+        Yields:
+            list: The batches of rows, in order.
+        """
+        yield from self.batches
+        if self.file is None:
+            return
+        self.file.seek(0)
+        while True:
+            try:
+                yield pickle.load(self.file)
+            except EOFError:
+                return
+
+    def close(self) -> None:
+        """
+        Removes the temporary file.
+        """
+        self.batches = []
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Session:
+    """
+    The state of a client connection.
+
+    Attributes:
+        server (DatabaseServer): The server.
+        writer (asyncio.StreamWriter): The connection.
+        loop (asyncio.AbstractEventLoop): The event loop of the server.
+        database_name (str): The database of the connection, or None until the client chooses one.
+        executor (Executor): The executor of the statements of the connection, or None.
+        result (ResultSpool): The rows selected by the running statement, or None.
+        output (io.StringIO): The text printed by the running statement.
+    """
+
+    def __init__(self, server, writer, loop):
+        self.server = server
+        self.writer = writer
+        self.loop = loop
+        self.database_name = server.database_name
+        self.executor = None
+        self.result = None
+        self.output = io.StringIO()
+
+    def run(self, statement: str) -> None:
+        """
+        Runs a statement and sends its answer, in a thread of the server.
+
+        Parameters:
+            statement (str): The statement, or "USE <database>" to choose the database of the connection.
+        """
+        error = None
+        self.result = None
+        self.output.seek(0)
+        self.output.truncate()
+        try:
+            words = statement.split()
+            if words[0].upper() == "USE":
+                if len(words) != 2 or not re.fullmatch(r"\w+", words[1]):
+                    raise ValueError("Invalid database name")
+                self.database_name = words[1]
+                self.server.database(self.database_name)
+                print(f"Using database {self.database_name}", file=self.output)
+            else:
+                if self.database_name is None:
+                    raise ValueError("No database chosen. Send USE <database> first")
+                db = self.server.database(self.database_name)
+                if self.executor is None or self.executor.db is not db:
+                    self.executor = Executor(db, self.send_rows, self.output)
+                self.executor.run(statement)
+        except DroppedDatabaseError as e:
+            # The statement succeeded: the connection has no database until the client chooses one.
+            self.server.forget(self.executor.db)
+            self.database_name = None
+            self.executor = None
+            print(e, file=self.output)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            error = str(e)
+        text = self.output.getvalue()
+        # The locks of the statement are released, so the rows are sent without holding up other statements.
+        result, self.result = self.result, None
+        if result is not None:
+            try:
+                if error is None:
+                    self.send(b"H", result.headers)
+                    for batch in result.read():
+                        self.send(b"R", batch)
+            finally:
+                result.close()
+        if text:
+            self.send(b"M", text)
+        if error is not None:
+            self.send(b"E", error)
+
+    def send_rows(self, headers: list, rows) -> None:
+        """
+        Keeps the column names and the selected rows of a SELECT, which are sent when the statement ends.
+
+        Parameters:
+            headers (list): The names of the selected columns.
+            rows (iterable): The selected rows.
+        """
+        if self.result is not None:
+            self.result.close()
+        self.result = ResultSpool(headers, self.server.BATCH_SIZE)
+        self.result.extend(rows)
+
+    def send(self, kind: bytes, payload) -> None:
+        """
+        Sends a frame from the thread of a statement, waiting until the connection accepts it.
+
+        Parameters:
+            kind (bytes): The kind of the frame.
+            payload: The content of the frame, which JSON can encode.
+
+        Raises:
+            ConnectionError: If the connection was closed or the client stopped reading.
+        """
+        asyncio.run_coroutine_threadsafe(self.server.send(self.writer, kind, payload), self.loop).result()
+
+
+class DatabaseServer:
+    """
+    Serves databases to many clients over a TCP or Unix socket.
+
+    Every database is opened once, when a client first uses it, and shared by all
+    the connections to it, so its metadata, indexes and cached tables stay warm
+    between statements and clients. Statements run in a pool of threads, so one
+    connection does not hold up the others while its statement runs, although the
+    statements on the same database still run one at a time (see
+    DatabaseFileManager.locked()). The selected rows are kept (see ResultSpool)
+    and only sent once the statement released its locks, and clients that do not
+    read their answer for WRITE_TIMEOUT seconds are disconnected, so a slow client
+    neither blocks the database nor keeps a thread of the pool.
+
+    Clients send one statement per line, in UTF-8, and "USE <database>" chooses
+    the database of the connection. The server answers every line with frames made
+    of one byte with the kind of the frame, the length of its payload as 4 bytes in
+    big endian, and the payload as JSON:
+        H: the names of the selected columns.
+        R: a list of selected rows. The rows are sent in several frames.
+        M: the text the statement printed, such as "Table t created".
+        E: the error message, if the statement failed.
+        Z: the end of the answer, with a null payload.
+
+    Attributes:
+        database_name (str): The database of new connections, or None if they must choose one.
+        options (dict): The keyword arguments of the opened databases (see Database).
+        databases (dict): The open databases, by name.
+        lock (threading.Lock): Held while a database is opened or closed.
+        connections (dict): The outgoing side of every open connection, by the task that answers it.
+    """
+
+    PORT = 5433
+    # Number of rows in each R frame.
+    BATCH_SIZE = 256
+    # Longest line a client may send, in bytes.
+    MAX_LINE = 16 * 1024 * 1024
+    # Seconds a connection may keep the server waiting to send a frame before it is closed.
+    WRITE_TIMEOUT = 30.0
+
+    def __init__(self, database_name: str = None, **options):
+        """
+        Initializes the server without opening any database.
+
+        Parameters:
+            database_name (str): The database of new connections, or None if they must choose one.
+            options: The keyword arguments of the opened databases, such as wal=True (see Database).
+        """
+        self.database_name = database_name
+        self.options = options
+        self.databases = {}
+        self.lock = threading.Lock()
+        self.connections = {}
+
+    def database(self, name: str) -> Database:
+        """
+        Returns an open database, opening it on first use.
+
+        Parameters:
+            name (str): The name of the database.
+        """
+        with self.lock:
+            if name not in self.databases:
+                self.databases[name] = Database(name, **self.options)
+            return self.databases[name]
+
+    def forget(self, db: Database) -> None:
+        """
+        Closes a database that was dropped, so it is created again if a client uses it.
+
+        Parameters:
+            db (Database): The database.
+        """
+        with self.lock:
+            if self.databases.get(db.db_name) is db:
+                del self.databases[db.db_name]
+        db.close()
+
+    def close(self) -> None:
+        """
+        Closes every open database.
+        """
+        with self.lock:
+            for db in self.databases.values():
+                db.close()
+            self.databases.clear()
+
+    async def send(self, writer: asyncio.StreamWriter, kind: bytes, payload) -> None:
+        """
+        Writes a frame to a connection and waits until it can take more data.
+
+        Parameters:
+            writer (asyncio.StreamWriter): The connection.
+            kind (bytes): The kind of the frame.
+            payload: The content of the frame, which JSON can encode.
+
+        Raises:
+            ConnectionError: If the connection does not take more data within WRITE_TIMEOUT seconds,
+                in which case it is closed.
+        """
+        data = json.dumps(payload, default=encode_value).encode("utf-8")
+        writer.write(FRAME.pack(kind, len(data)) + data)
+        try:
+            await asyncio.wait_for(writer.drain(), self.WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            writer.transport.abort()
+            raise ConnectionError("The client stopped reading") from None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answers the statements of a connection until the client closes it or sends "exit".
+
+        Parameters:
+            reader (asyncio.StreamReader): The incoming side of the connection.
+            writer (asyncio.StreamWriter): The outgoing side of the connection.
+        """
+        loop = asyncio.get_running_loop()
+        session = Session(self, writer, loop)
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await self.send(writer, b"E", "Statement too long")
+                    break
+                if not line:
+                    break
+                statement = line.decode("utf-8", "replace").strip()
+                if statement.lower() == "exit":
+                    break
+                if statement:
+                    await loop.run_in_executor(None, session.run, statement)
+                await self.send(writer, b"Z", None)
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host: str = "127.0.0.1", port: int = PORT, path: str = None) -> None:
+        """
+        Accepts connections until the task is cancelled, then closes the open connections, waits for their
+        statements to end and closes the databases.
+
+        Parameters:
+            host (str): The address to listen on.
+            port (int): The TCP port to listen on.
+            path (str): The path of a Unix socket to listen on instead of TCP, or None.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path, limit=self.MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=self.MAX_LINE)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # The threads of running statements fail to send their answer instead of waiting for it forever.
+            for writer in self.connections.values():
+                writer.transport.abort()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            self.close()
+
+
+class Client:
+    """
+    A client of DatabaseServer that waits for the answer of every statement.
+
+    Attributes:
+        socket (socket.socket): The connection.
+        file (file): The incoming side of the connection, buffered.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DatabaseServer.PORT, path: str = None):
+        """
+        Connects to a server.
+
+        Parameters:
+            host (str): The address of the server.
+            port (int): The TCP port of the server.
+            path (str): The path of the Unix socket of the server instead of TCP, or None.
+        """
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile("rb")
+
+    def stream(self, statement: str):
+        """
+        Sends a statement and reads its answer as it arrives.
+
+        Parameters:
+            statement (str): The statement, on a single line.
+
+        Yields:
+            tuple: The kind and the payload of every frame before the end of the answer.
+        """
+        self.socket.sendall(statement.encode("utf-8") + b"\n")
+        while True:
+            header = self.file.read(FRAME.size)
+            if len(header) < FRAME.size:
+                raise ConnectionError("The server closed the connection")
+            kind, length = FRAME.unpack(header)
+            payload = json.loads(self.file.read(length))
+            if kind == b"Z":
+                return
+            yield kind, payload
+
+    def execute(self, statement: str) -> tuple:
+        """
+        Runs a statement.
+
+        Parameters:
+            statement (str): The statement, on a single line.
+
+        Returns:
+            tuple: The names of the selected columns (or None), the selected rows and the printed text.
+
+        Raises:
+            ValueError: If the statement failed.
+        """
+        headers, rows, text, error = None, [], "", None
+        for kind, payload in self.stream(statement):
+            if kind == b"H":
+                headers = payload
+            elif kind == b"R":
+                rows.extend(payload)
+            elif kind == b"M":
+                text += payload
+            elif kind == b"E":
+                error = payload
+        if error is not None:
+            raise ValueError(error)
+        return headers, rows, text
+
+    def close(self) -> None:
+        """
+        Closes the connection.
+        """
+        self.file.close()
+        self.socket.close()
@@ -0,0 +1,201 @@
+"""
+sort.py
+
+This module provides the Sorter class for ORDER BY, with an external merge sort for results that do not fit in memory.
+"""
+
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+from itertools import islice
+from operator import itemgetter
+
+
+class Descending:
+    """
+    Wraps a value so it sorts in the opposite order, for keys that mix ascending and descending columns.
+
+    Attributes:
+        value: The wrapped value.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class Sorter:
+    """
+    Sorts rows by some of their columns.
+
+    Rows are sorted in memory while they fit in MEMORY_LIMIT bytes. Larger
+    results are sorted in runs of at most that size, which are written to
+    temporary files and merged while the sorted rows are read. When only the
+    first rows are needed (ORDER BY ... LIMIT), a bounded heap keeps just those
+    rows, in O(n log k) time and O(k) memory. Rows with equal keys keep their
+    order.
+
+    Attributes:
+        directory (str): The folder where the temporary files of the runs are created.
+        keys (list): The positions of the sort columns, with whether each one is descending.
+        key (function): Returns the sort key of a row.
+        reverse (bool): Whether the keys are sorted in descending order.
+    """
+
+    # Maximum estimated size in bytes of the rows sorted in memory at once.
+    MEMORY_LIMIT = 64 * 1024 * 1024
+    # Number of rows between memory estimates, and written to a run file at a time.
+    BATCH_SIZE = 1000
+
+    def __init__(self, keys: list, directory: str):
+        """
+        Builds the sort key.
+
+        Parameters:
+            keys (list): The positions of the sort columns in the rows, with whether each one is
+                descending, as (position, descending).
+            directory (str): The folder where the temporary files of the runs are created.
+        """
+        self.directory = directory
+        self.keys = keys
+        positions = [position for position, _ in keys]
+        directions = {descending for _, descending in keys}
+        if len(directions) == 1:
+            self.key = itemgetter(*positions)
+            self.reverse = directions.pop()
+        else:
+            self.key = lambda row: tuple(Descending(row[i]) if descending else row[i] for i, descending in keys)
+            self.reverse = False
+
+    def sort(self, rows, limit: int = None):
+        """
+        Sorts rows.
+
+        Parameters:
+            rows (iterable): The rows.
+            limit (int): The number of first sorted rows that are needed, or None for every row.
+
+        Returns:
+            iterator: The sorted rows.
+        """
+        if limit is not None:
+            select = heapq.nlargest if self.reverse else heapq.nsmallest
+            return iter(select(limit, rows, key=self.key))
+        return self.merge_sort(rows)
+
+    def merge_sort(self, rows):
+        """
+        Sorts rows in memory, or in sorted runs on disk that are merged if they do not fit.
+
+        Parameters:
+            rows (iterable): The rows.
+
+        Yields:
+            list: The sorted rows.
+        """
+        rows = iter(rows)
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if self.is_full(buffer):
+                break
+        else:
+            self.sort_in_memory(buffer)
+            yield from buffer
+            return
+
+        with tempfile.TemporaryDirectory(dir=self.directory) as directory:
+            runs = [self.write_run(buffer, os.path.join(directory, "0"))]
+            buffer = []
+            for row in rows:
+                buffer.append(row)
+                if self.is_full(buffer):
+                    runs.append(self.write_run(buffer, os.path.join(directory, str(len(runs)))))
+                    buffer = []
+            runs.append(self.write_run(buffer, os.path.join(directory, str(len(runs)))))
+            buffer = None
+            yield from heapq.merge(*(self.read_run(path) for path in runs), key=self.key, reverse=self.reverse)
+
+    def is_full(self, buffer: list) -> bool:
+        """
+        Returns whether rows sorted in memory reached the memory limit, estimated every BATCH_SIZE rows.
+
+        Parameters:
+            buffer (list): The rows.
+        """
+        return len(buffer) % self.BATCH_SIZE == 0 and len(buffer) * self.row_size(buffer[-1]) > self.MEMORY_LIMIT
+
+    def sort_in_memory(self, rows: list) -> None:
+        """
+        Sorts a list of rows in place.
+
+        Keys that mix ascending and descending columns are sorted one column at a
+        time, from the last to the first, which is faster than comparing wrapped
+        values and gives the same order since the sort is stable.
+
+        Parameters:
+            rows (list): The rows.
+        """
+        if len({descending for _, descending in self.keys}) == 1:
+            rows.sort(key=self.key, reverse=self.reverse)
+            return
+        for position, descending in reversed(self.keys):
+            rows.sort(key=itemgetter(position), reverse=descending)
+
+    def write_run(self, rows: list, path: str) -> str:
+        """
+        Sorts rows and writes them to a run file, in pickled batches.
+
+        Parameters:
+            rows (list): The rows.
+            path (str): The path to the run file.
+
+        Returns:
+            str: The path to the run file.
+        """
+        self.sort_in_memory(rows)
+        with open(path, "wb") as file:
+            batches = iter(rows)
+            for batch in iter(lambda: list(islice(batches, self.BATCH_SIZE)), []):
+                pickle.dump(batch, file)
+        return path
+
+    @staticmethod
+    def read_run(path: str):
+        """
+        Reads the rows of a run file.
+
+        Parameters:
+            path (str): The path to the run file.
+
+        Yields:
+            list: The rows.
+        """
+        with open(path, "rb") as file:
+            while True:
+                try:
+                    yield from pickle.load(file)
+                except EOFError:
+                    return
+
+    @staticmethod
+    def row_size(row: list) -> int:
+        """
+        Estimates the memory used by a row.
+
+        Parameters:
+            row (list): The row.
+
+        Returns:
+            int: The estimated size in bytes.
+        """
+        return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
@@ -0,0 +1,264 @@
+"""
+statement.py
+
+This module provides the PreparedStatement class for statements parsed once and executed many times, and the
+StatementCache class that keeps the recently parsed statements.
+"""
+
+import ast
+
+from dbms.cache import LRUCache
+from dbms.condition import Condition
+from dbms.parser import Parser
+
+
+class PreparedStatement:
+    """
+    A statement parsed once, with optional positional parameters written as '?'.
+
+    Parameters may replace the values of INSERT and UPDATE ... SET and the literal
+    values of WHERE conditions, and are numbered in the order they are written.
+    Every value is used as if it was written in place of its parameter, so text
+    values of conditions are quoted like in any other condition. The conditions are
+    compiled once per table (see Condition.compiled()), except the conditions of
+    joins, which get the values written in their text.
+
+    Attributes:
+        text (str): The normalized text of the statement.
+        statement (tuple): The parsed statement, as returned by Parser.parse(), with '?' in place of the parameters.
+        parameters (int): The number of parameters.
+    """
+
+    # Commands that can be prepared and kept in the statement cache: INSERT, SELECT, UPDATE, DELETE,
+    # multi-row INSERT and EXPLAIN.
+    COMMANDS = (3, 4, 5, 6, 10, 14)
+
+    def __init__(self, text: str, statement: tuple = None):
+        """
+        Parses a statement.
+
+        Parameters:
+            text (str): The normalized text of the statement.
+            statement (tuple): The statement already parsed from the text, or None.
+
+        Raises:
+            ValueError: If the statement is not valid or its command cannot be prepared.
+        """
+        self.text = text
+        self.statement = statement if statement is not None else Parser(text).parse()
+        if self.statement[0] not in self.COMMANDS:
+            raise ValueError("Only INSERT, SELECT, UPDATE, DELETE and EXPLAIN statements can be prepared")
+        self.parameters = self.count(self.statement)
+
+    @classmethod
+    def count(cls, statement: tuple) -> int:
+        """
+        Returns the number of parameters of a parsed statement.
+
+        Parameters:
+            statement (tuple): The parsed statement.
+        """
+        command = statement[0]
+        if command == 3:
+            return statement[2].count("?")
+        if command == 10:
+            return sum(row.count("?") for row in statement[2])
+        if command == 14:
+            return cls.count(statement[1])
+        count = list(statement[2].values()).count("?") if command == 5 else 0
+        condition = statement[2] if command == 6 else statement[3]
+        if condition is not None:
+            count += Condition.count_parameters(",".join(condition))
+        return count
+
+    def bind(self, values: list, db) -> tuple:
+        """
+        Writes the values of the parameters in the statement and compiles its condition.
+
+        Parameters:
+            values (list): The values of the parameters, as text.
+            db (Database): The database, whose metadata is used to compile the condition.
+
+        Returns:
+            tuple: The statement, as returned by Parser.parse() but with the condition compiled.
+
+        Raises:
+            ValueError: If the number of values is not the number of parameters or a value
+                of a condition is not a literal.
+        """
+        if len(values) != self.parameters:
+            raise ValueError(f"The statement has {self.parameters} parameters but {len(values)} values were given")
+        if not self.parameters:
+            return self.statement
+        return self.bind_statement(self.statement, iter(values), db)
+
+    def bind_statement(self, statement: tuple, values, db) -> tuple:
+        """
+        Writes the values of the parameters in a parsed statement.
+
+        Parameters:
+            statement (tuple): The parsed statement.
+            values (iterator): The values of the parameters that are left, in order.
+            db (Database): The database.
+
+        Returns:
+            tuple: The statement.
+        """
+        command = statement[0]
+        if command == 3:
+            return command, statement[1], self.bind_values(statement[2], values)
+        if command == 10:
+            return command, statement[1], [self.bind_values(row, values) for row in statement[2]]
+        if command == 4:
+            _, table_name, columns, condition, clauses = statement
+            return command, table_name, columns, self.bind_condition(
+                table_name, condition, values, db, "join" in clauses), clauses
+        if command == 5:
+            _, table_name, update_values, condition = statement
+            update_values = dict(zip(update_values, self.bind_values(list(update_values.values()), values)))
+            return command, table_name, update_values, self.bind_condition(table_name, condition, values, db)
+        if command == 6:
+            return command, statement[1], self.bind_condition(statement[1], statement[2], values, db)
+        return command, self.bind_statement(statement[1], values, db)
+
+    @staticmethod
+    def bind_values(row: list, values) -> list:
+        """
+        Replaces the parameters among the values of a row.
+
+        Parameters:
+            row (list): The values, as text.
+            values (iterator): The values of the parameters that are left, in order.
+        """
+        return [next(values) if value == "?" else value for value in row]
+
+    def bind_condition(self, table_name: str, condition_str: list, values, db, join: bool = False):
+        """
+        Compiles the condition of a statement for the values of its parameters.
+
+        Parameters:
+            table_name (str): The name of the table.
+            condition_str (list): The condition string, as returned by the parser, or None.
+            values (iterator): The values of the parameters that are left, in order.
+            db (Database): The database.
+            join (bool): Whether the statement joins two tables, in which case the values are written
+                in the condition string, which the join compiles.
+
+        Returns:
+            Condition: The condition, or the condition string for joins, or None.
+        """
+        if condition_str is None:
+            return None
+        text = ",".join(condition_str)
+        parameters = [self.literal(next(values)) for _ in range(Condition.count_parameters(text))]
+        if join:
+            return [Condition.substitute(text, parameters)]
+        return Condition.compiled(text, db.get_info_table(table_name)["columns"], parameters=parameters)
+
+    @staticmethod
+    def literal(value: str):
+        """
+        Reads the value of a parameter of a condition as a literal.
+
+        Parameters:
+            value (str): The value, as text.
+
+        Raises:
+            ValueError: If the value is not a literal.
+        """
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise ValueError(f"Invalid parameter {value}")
+
+
+class StatementCache:
+    """
+    A least recently used cache of parsed statements, keyed on their normalized text.
+
+    Statements that differ only in the spaces between their words are the same
+    statement. Only the statements that can be prepared are kept (see
+    PreparedStatement.COMMANDS).
+
+    Attributes:
+        statements (LRUCache): The parsed statements by normalized text.
+    """
+
+    def __init__(self, capacity: int = 256):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+            capacity (int): The maximum number of cached statements.
+        """
+        self.statements = LRUCache(capacity)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Returns the text of a statement with single spaces between its words.
+
+        The spaces of quoted values are kept as they are, since they are part of the values.
+
+        Parameters:
+            text (str): The text of the statement.
+        """
+        words = []
+        word = []
+        quote = None
+        for char in text.strip() + " ":
+            if quote is not None:
+                word.append(char)
+                if char == quote:
+                    quote = None
+            elif char.isspace():
+                if word:
+                    words.append("".join(word))
+                    word = []
+            else:
+                word.append(char)
+                if char in "\"'":
+                    quote = char
+        if word:
+            # A quoted value that is not closed, which the parser rejects.
+            words.append("".join(word).rstrip())
+        return " ".join(words)
+
+    def parse(self, text: str):
+        """
+        Parses a statement, or finds it in the cache.
+
+        Parameters:
+            text (str): The text of the statement.
+
+        Returns:
+            PreparedStatement | tuple: The cached statement, or the parsed statement
+            as returned by Parser.parse() if it cannot be cached.
+        """
+        text = self.normalize(text)
+        prepared = self.statements.get(text)
+        if prepared is None:
+            statement = Parser(text).parse()
+            if statement[0] not in PreparedStatement.COMMANDS:
+                return statement
+            prepared = PreparedStatement(text, statement)
+            self.statements.put(text, prepared)
+        return prepared
+
+    def prepare(self, text: str) -> PreparedStatement:
+        """
+        Parses a statement to prepare it, or finds it in the cache.
+
+        Parameters:
+            text (str): The text of the statement.
+
+        Returns:
+            PreparedStatement: The statement.
+
+        Raises:
+            ValueError: If the statement is not valid or cannot be prepared.
+        """
+        prepared = self.parse(text)
+        if not isinstance(prepared, PreparedStatement):
+            prepared = PreparedStatement(self.normalize(text), prepared)
+        return prepared
@@ -0,0 +1,284 @@
+"""
+statistics.py
+
+This module provides the TableStatistics class that gathers the statistics of a table and estimates the selectivity of conditions from them.
+"""
+
+import ast
+import bisect
+from collections import Counter
+from itertools import islice
+
+
+class TableStatistics:
+    """
+    The statistics of the columns of a table, gathered by ANALYZE and kept in the table metadata.
+
+    For every column ANALYZE counts the distinct values, keeps the COMMON_VALUES
+    most common values with the fraction of rows that have them, and builds an
+    equi-depth histogram: BUCKETS + 1 values such that every bucket between two
+    consecutive values holds the same number of rows. The first and last values
+    of the histogram are the minimum and the maximum of the column.
+
+    The selectivity of a condition is estimated from its syntax tree, assuming
+    that different columns are independent. Comparisons of the same column that
+    are AND'ed together are estimated as a single range. Columns without
+    statistics use fixed default selectivities.
+
+    Attributes:
+        columns (dict): The statistics of the analyzed columns by column name, as dictionaries
+            with "distinct", "common" (a dictionary of values and fractions) and "histogram".
+    """
+
+    # Number of buckets of the histograms.
+    BUCKETS = 32
+    # Number of most common values kept for every column.
+    COMMON_VALUES = 8
+    # Number of rows counted at a time.
+    BATCH_SIZE = 10000
+    # Selectivities of comparisons of columns without statistics.
+    EQUALITY_SELECTIVITY = 0.1
+    RANGE_SELECTIVITY = 1 / 3
+
+    def __init__(self, statistics: dict = None):
+        """
+        Wraps the statistics of a table.
+
+        Parameters:
+            statistics (dict): The statistics as returned by gather(), or None if the table was never analyzed.
+        """
+        self.columns = {}
+        for column, values in (statistics or {}).get("columns", {}).items():
+            self.columns[column] = dict(values, common=dict(values["common"]))
+
+    @classmethod
+    def gather(cls, rows, columns: list) -> dict:
+        """
+        Computes the statistics of a table in a single pass over its rows.
+
+        Parameters:
+            rows (iterable): The rows of the table.
+            columns (list): The column names of the table.
+
+        Returns:
+            dict: The statistics, as {"rows": number of rows, "columns": statistics by column name}.
+        """
+        counters = [Counter() for _ in columns]
+        count = 0
+        rows = iter(rows)
+        for batch in iter(lambda: list(islice(rows, cls.BATCH_SIZE)), []):
+            count += len(batch)
+            for counter, values in zip(counters, zip(*batch)):
+                counter.update(values)
+
+        statistics = {}
+        for column, counter in zip(columns, counters):
+            if not count:
+                continue
+            statistics[column] = {
+                "distinct": len(counter),
+                "common": [(value, frequency / count) for value, frequency in counter.most_common(cls.COMMON_VALUES)],
+                "histogram": cls.histogram(counter, count),
+            }
+        return {"rows": count, "columns": statistics}
+
+    @classmethod
+    def histogram(cls, counter: Counter, count: int) -> list:
+        """
+        Builds the equi-depth histogram of a column.
+
+        Parameters:
+            counter (Counter): The number of rows of every value of the column.
+            count (int): The number of rows.
+
+        Returns:
+            list: The values at the bounds of the buckets, in ascending order.
+        """
+        values = iter(sorted(counter.items()))
+        value, frequency = next(values)
+        seen = 0
+        bounds = []
+        for rank in (bucket * (count - 1) // cls.BUCKETS for bucket in range(cls.BUCKETS + 1)):
+            while seen + frequency <= rank:
+                seen += frequency
+                value, frequency = next(values)
+            bounds.append(value)
+        return bounds
+
+    def selectivity(self, condition) -> float:
+        """
+        Estimates the fraction of the rows of the table that satisfy a condition.
+
+        Parameters:
+            condition (Condition): The compiled condition, or None.
+
+        Returns:
+            float: The estimated fraction, between 0 and 1.
+        """
+        if condition is None:
+            return 1.0
+        return self.estimate(condition, condition.tree.body)
+
+    def estimate(self, condition, node: ast.AST) -> float:
+        """
+        Estimates the fraction of the rows that satisfy an expression node of a condition.
+
+        Parameters:
+            condition (Condition): The compiled condition.
+            node (ast.AST): The expression node.
+
+        Returns:
+            float: The estimated fraction, between 0 and 1.
+        """
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.Or):
+            remaining = 1.0
+            for value in node.values:
+                remaining *= 1 - self.estimate(condition, value)
+            return 1 - remaining
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return 1 - self.estimate(condition, node.operand)
+        if isinstance(node, ast.Constant):
+            return 1.0 if node.value else 0.0
+        if not isinstance(node, (ast.BoolOp, ast.Compare)):
+            return self.RANGE_SELECTIVITY
+
+        # A conjunction: the comparisons of a column with literals are combined into a range
+        parts = node.values if isinstance(node, ast.BoolOp) else [node]
+        ranges = {}
+        fraction = 1.0
+        for part in parts:
+            if isinstance(part, ast.Compare) and self.is_range(condition, part):
+                for column, operator, value in condition.conjuncts(part):
+                    ranges.setdefault(column, []).append((operator, value))
+            elif isinstance(part, ast.Compare):
+                fraction *= self.comparison(condition, part)
+            else:
+                fraction *= self.estimate(condition, part)
+        for column, comparisons in ranges.items():
+            try:
+                fraction *= self.range(column, *condition.combine(comparisons))
+            except TypeError:
+                fraction *= self.RANGE_SELECTIVITY
+        return fraction
+
+    @staticmethod
+    def is_range(condition, node: ast.Compare) -> bool:
+        """
+        Returns whether every comparison of a comparison node is between a column and a literal, with
+        one of the operators that restrict a range.
+
+        Parameters:
+            condition (Condition): The compiled condition.
+            node (ast.Compare): The comparison node.
+        """
+        return len(list(condition.conjuncts(node))) == len(node.ops)
+
+    def comparison(self, condition, node: ast.Compare) -> float:
+        """
+        Estimates the fraction of the rows that satisfy a comparison node that is not a range.
+
+        Parameters:
+            condition (Condition): The compiled condition.
+            node (ast.Compare): The comparison node.
+
+        Returns:
+            float: The estimated fraction, between 0 and 1.
+        """
+        fraction = 1.0
+        operands = [node.left] + node.comparators
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            if isinstance(op, (ast.In, ast.NotIn)) and isinstance(left, ast.Name) \
+                    and isinstance(right, (ast.Tuple, ast.List)) and all(map(condition.is_literal, right.elts)):
+                values = {ast.literal_eval(element) for element in right.elts}
+                matching = min(1.0, sum(self.equality(left.id, value) for value in values))
+                fraction *= matching if isinstance(op, ast.In) else 1 - matching
+            elif isinstance(op, (ast.Eq, ast.NotEq)):
+                column, value = None, None
+                if isinstance(left, ast.Name) and condition.is_literal(right):
+                    column, value = left.id, ast.literal_eval(right)
+                elif isinstance(right, ast.Name) and condition.is_literal(left):
+                    column, value = right.id, ast.literal_eval(left)
+                matching = self.EQUALITY_SELECTIVITY if column is None else self.equality(column, value)
+                fraction *= matching if isinstance(op, ast.Eq) else 1 - matching
+            else:
+                fraction *= self.RANGE_SELECTIVITY
+        return fraction
+
+    def equality(self, column: str, value) -> float:
+        """
+        Estimates the fraction of the rows where a column is equal to a value.
+
+        Parameters:
+            column (str): The name of the column.
+            value: The value.
+
+        Returns:
+            float: The estimated fraction, between 0 and 1.
+        """
+        statistics = self.columns.get(column)
+        if statistics is None:
+            return self.EQUALITY_SELECTIVITY
+        common = statistics["common"]
+        try:
+            if value in common:
+                return common[value]
+            histogram = statistics["histogram"]
+            if value < histogram[0] or value > histogram[-1]:
+                return 0.0
+        except TypeError:
+            return 0.0
+        others = statistics["distinct"] - len(common)
+        return max(0.0, 1 - sum(common.values())) / others if others > 0 else 0.0
+
+    def range(self, column: str, low, low_inclusive: bool, high, high_inclusive: bool) -> float:
+        """
+        Estimates the fraction of the rows where a column lies in a range.
+
+        Parameters:
+            column (str): The name of the column.
+            low: The lower bound, or None if there is none.
+            low_inclusive (bool): Whether the lower bound itself is in the range.
+            high: The upper bound, or None if there is none.
+            high_inclusive (bool): Whether the upper bound itself is in the range.
+
+        Returns:
+            float: The estimated fraction, between 0 and 1.
+
+        Raises:
+            TypeError: If the bounds cannot be compared with the values of the column.
+        """
+        if low is not None and high is not None and (low > high or (low == high and not (low_inclusive and high_inclusive))):
+            return 0.0
+        if low is not None and low == high:
+            return self.equality(column, low)
+        if column not in self.columns:
+            return self.RANGE_SELECTIVITY
+        upper = 1.0 if high is None else self.below(column, high) + (self.equality(column, high) if high_inclusive else 0)
+        lower = 0.0 if low is None else self.below(column, low) + (0 if low_inclusive else self.equality(column, low))
+        return min(1.0, max(0.0, upper - lower))
+
+    def below(self, column: str, value) -> float:
+        """
+        Estimates the fraction of the rows where a column is less than a value, from its histogram.
+
+        Values within a bucket are assumed to be evenly spread between its bounds.
+
+        Parameters:
+            column (str): The name of the column, which has statistics.
+            value: The value.
+
+        Returns:
+            float: The estimated fraction, between 0 and 1.
+        """
+        histogram = self.columns[column]["histogram"]
+        if value <= histogram[0]:
+            return 0.0
+        if value > histogram[-1]:
+            return 1.0
+        i = bisect.bisect_left(histogram, value)
+        low, high = histogram[i - 1], histogram[i]
+        try:
+            within = (value - low) / (high - low)
+        except (TypeError, ZeroDivisionError):
+            within = 0.5
+        return (i - 1 + within) / (len(histogram) - 1)
@@ -0,0 +1,786 @@
+"""
+storage.py
+
+This module provides the storage engines used by DatabaseFileManager to keep the rows of a table on disk.
+
+Every engine locates a row with an integer, its locator, which is what the
+indexes store: the byte offset of the row for CSV tables and the row number for
+columnar tables. The size of a table (used to check that an index covers the
+whole table) is the size of the file for CSV tables and the number of rows for
+columnar tables.
+"""
+
+import array
+import contextlib
+import csv
+import io
+import itertools
+import mmap
+import os
+
+from dbms.codec import CONVERTERS, LINE_BREAK_ERROR
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# NumPy types of the column arrays built by load_arrays.
+NUMPY_TYPES = {"int": "int64", "float": "float64", "str": "object"}
+
+
+def rows_to_arrays(rows: list, data_types: list, columns) -> list:
+    """
+    Splits rows that already have their data types applied into NumPy column arrays.
+
+    Parameters:
+        rows (list): The rows.
+        data_types (list): The data types of the columns.
+        columns (list): The positions of the columns to convert.
+
+    Returns:
+        list: The arrays by column position, None for the other columns.
+    """
+    arrays = [None] * len(data_types)
+    for i in columns:
+        arrays[i] = np.array([row[i] for row in rows], dtype=NUMPY_TYPES[data_types[i]])
+    return arrays
+
+
+def remove_positions(arrays: list, count: int, positions) -> tuple:
+    """
+    Removes the values at some positions from column arrays.
+
+    Parameters:
+        arrays (list): The arrays by column position, or None for the columns that were not loaded.
+        count (int): The number of values of each array.
+        positions (set): The positions to remove.
+
+    Returns:
+        tuple: The arrays without the removed values and their new length.
+    """
+    keep = np.ones(count, dtype=bool)
+    keep[np.fromiter(positions, dtype=np.int64, count=len(positions))] = False
+    return [None if values is None else values[keep] for values in arrays], int(keep.sum())
+
+
+class CsvStorage:
+    """
+    Stores a table as a '|' delimited text file with one row per line.
+
+    Rows are read with the csv module by full scans and line by line from their
+    locators, which only agree because no value may contain a line break, so a
+    quoted row never spans several lines.
+
+    Attributes:
+        file_manager (DatabaseFileManager): The file manager of the database.
+        table_name (str): The name of the table.
+        file_path (str): The path to the table file.
+        codec (RowCodec): The codec of the rows of the table.
+    """
+
+    # Every column of a text row is always read, so loaded rows are always complete.
+    PARTIAL_ROWS = False
+    # Number of rows encoded at a time and size in bytes of the write buffer used by append_rows.
+    BATCH_SIZE = 4096
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, file_manager, table_name: str):
+        """
+        Initializes the storage of a table.
+
+        Parameters:
+            file_manager (DatabaseFileManager): The file manager of the database.
+            table_name (str): The name of the table.
+        """
+        self.file_manager = file_manager
+        self.table_name = table_name
+        self.file_path = file_manager.file_path + table_name + ".csv"
+        self.codec = file_manager.codec(table_name)
+
+    def __getstate__(self) -> dict:
+        """
+        Pickles the storage without its file manager, for the worker processes of parallel scans,
+        which only read rows.
+        """
+        return dict(self.__dict__, file_manager=None)
+
+    def create(self) -> None:
+        """
+        Creates the empty table file.
+        """
+        with open(self.file_path, "w") as file:
+            file.close()
+
+    def drop(self) -> None:
+        """
+        Removes the table file.
+        """
+        os.remove(self.file_path)
+
+    def size(self) -> int:
+        """
+        Returns the size of the table file in bytes.
+        """
+        return os.path.getsize(self.file_path)
+
+    def disk_size(self) -> int:
+        """
+        Returns the size of the table file in bytes.
+        """
+        return self.size()
+
+    def stamp(self) -> tuple:
+        """
+        Returns a value that changes whenever the table file is written.
+        """
+        stat = os.stat(self.file_path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def identity(self) -> int:
+        """
+        Returns a number that changes when write() replaces the table file, but not when rows are appended.
+        """
+        return os.stat(self.file_path).st_ino
+
+    def load(self, columns=None) -> list:
+        """
+        Loads every row of the table.
+
+        Parameters:
+            columns (list): Ignored, every column of a text row is always read.
+
+        Returns:
+            list: The rows with the data types applied.
+        """
+        return list(self.iter_rows())
+
+    def iter_rows(self, columns=None):
+        """
+        Reads the rows of the table one at a time.
+
+        Parameters:
+            columns (list): Ignored, every column of a text row is always read.
+
+        Yields:
+            list: The rows with the data types applied.
+        """
+        try:
+            file = open(self.file_path, "r", newline='', encoding="utf-8")
+        except FileNotFoundError:
+            raise FileNotFoundError("Table not found")
+        decode = self.codec.decode
+        with file:
+            for row in csv.reader(file, delimiter='|'):
+                yield decode(row)
+
+    def load_arrays(self, columns) -> tuple:
+        """
+        Loads columns of the table as NumPy arrays.
+
+        The text rows are split into fields and only the needed columns are converted.
+
+        Parameters:
+            columns (list): The positions of the columns to load.
+
+        Returns:
+            tuple: The arrays by column position (None for the other columns) and the number of rows.
+        """
+        data_types = self.file_manager.db.get_info_table(self.table_name)["data_types"]
+        with open(self.file_path, "r", newline='', encoding="utf-8") as file:
+            rows = list(csv.reader(file, delimiter='|'))
+        if any(len(row) != len(data_types) for row in rows):
+            raise ValueError("Bad input values")
+
+        arrays = [None] * len(data_types)
+        for i in columns:
+            if data_types[i] not in CONVERTERS:
+                raise ValueError("Bad input values")
+            convert = CONVERTERS[data_types[i]]
+            try:
+                arrays[i] = np.array([convert(row[i]) for row in rows], dtype=NUMPY_TYPES[data_types[i]])
+            except ValueError:
+                raise ValueError("Bad input values")
+        return arrays, len(rows)
+
+    def read_rows(self, columns=None, start: int = 0):
+        """
+        Reads the rows of the table together with their locators.
+
+        Parameters:
+            columns (list): Ignored, every column of a text row is always read.
+            start (int): The offset of the first row to read.
+
+        Yields:
+            tuple: The offset of the row and the row with the data types applied.
+        """
+        decode_line = self.codec.decode_line
+        with open(self.file_path, "rb") as file:
+            file.seek(start)
+            offset = start
+            for line in file:
+                yield offset, decode_line(line)
+                offset += len(line)
+
+    def read_blocks(self, blocks: list, columns=None):
+        """
+        Reads the rows of some blocks of consecutive rows together with their locators.
+
+        Parameters:
+            blocks (list): The blocks, as the offset of their first row and their number of rows.
+            columns (list): Ignored, every column of a text row is always read.
+
+        Yields:
+            tuple: The offset of the row and the row with the data types applied.
+        """
+        decode_line = self.codec.decode_line
+        with open(self.file_path, "rb") as file:
+            for offset, count in blocks:
+                file.seek(offset)
+                for _ in range(count):
+                    line = file.readline()
+                    yield offset, decode_line(line)
+                    offset += len(line)
+
+    def fetch(self, locators: list, columns=None) -> list:
+        """
+        Reads the rows that start at the given offsets of the table file.
+
+        Parameters:
+            locators (list): The offsets of the rows.
+            columns (list): Ignored, every column of a text row is always read.
+
+        Returns:
+            list: The rows with the data types applied, in the order of the locators.
+        """
+        rows = []
+        with open(self.file_path, "rb") as file:
+            for offset in locators:
+                file.seek(offset)
+                rows.append(self.codec.decode_line(file.readline()))
+        return rows
+
+    def append(self, row: list) -> tuple:
+        """
+        Appends a row to the end of the table file.
+
+        Parameters:
+            row (list): The row to append.
+
+        Returns:
+            tuple: The locator of the row and the new size of the table.
+        """
+        line = self.codec.encode_line(row)
+        with open(self.file_path, "ab") as file:
+            offset = file.tell()
+            file.write(line)
+            self.file_manager.sync(file, deferred=True)
+        return offset, offset + len(line)
+
+    def append_rows(self, rows) -> tuple:
+        """
+        Appends rows to the end of the table file with a single buffered write.
+
+        The rows are encoded a batch at a time with one CSV writer. If the rows raise an exception, the table file is truncated back to its
+        previous size.
+
+        Parameters:
+            rows (iterable): The rows to append.
+
+        Returns:
+            tuple: The locators of the rows and the new size of the table.
+        """
+        locators = []
+        rows = iter(rows)
+        with open(self.file_path, "ab", buffering=self.BUFFER_SIZE) as file:
+            start = size = file.tell()
+            try:
+                for batch in iter(lambda: list(itertools.islice(rows, self.BATCH_SIZE)), []):
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer, delimiter='|')
+                    lengths = [writer.writerow(row) for row in batch]
+                    data = buffer.getvalue().encode("utf-8")
+                    # Every row must be a single line, since rows with locators are read line by line
+                    if data.count(b"\n") != len(batch) or data.count(b"\r") != len(batch):
+                        raise ValueError(LINE_BREAK_ERROR)
+                    # The lengths are in characters, which differ from bytes for non ASCII text
+                    if len(data) != buffer.tell():
+                        lengths = [len(self.codec.encode_line(row)) for row in batch]
+                    for length in lengths:
+                        locators.append(size)
+                        size += length
+                    file.write(data)
+                file.flush()
+            except BaseException:
+                file.truncate(start)
+                raise
+            self.file_manager.sync(file)
+        return locators, size
+
+    def write(self, table, before_replace=None) -> tuple:
+        """
+        Overwrites the table file with the given rows.
+
+        The rows are streamed to a temporary file that replaces the table file once
+        every row was written, so the rows may be read from the table file itself.
+        If the rows raise an exception, the temporary file is removed and the table
+        file is left untouched.
+
+        Parameters:
+            table (iterable): The rows of the table.
+            before_replace (function): Called without arguments once the temporary file is complete,
+                before it replaces the table file.
+
+        Returns:
+            tuple: The locators of the rows and the new size of the table.
+        """
+        locators = []
+        size = 0
+        try:
+            with open(self.file_path + ".tmp", "wb") as file:
+                for row in table:
+                    line = self.codec.encode_line(row)
+                    locators.append(size)
+                    size += len(line)
+                    file.write(line)
+                self.file_manager.sync(file)
+            if before_replace is not None:
+                before_replace()
+        except BaseException:
+            self.remove_temp()
+            raise
+        self.replace_temp()
+        return locators, size
+
+    def replace_temp(self) -> None:
+        """
+        Replaces the table file with the temporary file written by write(), if there is one.
+        """
+        if os.path.exists(self.file_path + ".tmp"):
+            os.replace(self.file_path + ".tmp", self.file_path)
+
+    def remove_temp(self) -> None:
+        """
+        Removes the temporary file written by write(), if there is one.
+        """
+        if os.path.exists(self.file_path + ".tmp"):
+            os.remove(self.file_path + ".tmp")
+
+
+class ColumnarStorage:
+    """
+    Stores a table as binary files with one file per column, in the directory <table>.columns.
+
+    int and float columns are packed arrays of 8 byte values. str columns use two
+    files: the UTF-8 encoded values back to back, and a packed array with the end
+    offset of every value. The files are read through memory maps and only the
+    columns a query needs are read, so scans never parse text.
+
+    Attributes:
+        file_manager (DatabaseFileManager): The file manager of the database.
+        table_name (str): The name of the table.
+        directory (str): The path to the directory of the column files.
+        data_types (list): The data types of the columns.
+    """
+
+    # Columns that are not needed are left as None in loaded rows.
+    PARTIAL_ROWS = True
+    # Number of rows read or written at a time.
+    BATCH_SIZE = 4096
+    TYPECODES = {"int": "q", "float": "d", "str": "q"}
+
+    def __init__(self, file_manager, table_name: str):
+        """
+        Initializes the storage of a table.
+
+        Parameters:
+            file_manager (DatabaseFileManager): The file manager of the database.
+            table_name (str): The name of the table.
+        """
+        self.file_manager = file_manager
+        self.table_name = table_name
+        self.directory = os.path.join(file_manager.file_path + table_name + ".columns", "")
+        self.data_types = file_manager.db.get_info_table(table_name)["data_types"]
+
+    def __getstate__(self) -> dict:
+        """
+        Pickles the storage without its file manager, for the worker processes of parallel scans,
+        which only read rows.
+        """
+        return dict(self.__dict__, file_manager=None)
+
+    def column_path(self, i: int) -> str:
+        """
+        Returns the path to the packed array file of a column: the values for
+        int and float columns, the end offsets for str columns.
+
+        Parameters:
+            i (int): The position of the column.
+        """
+        return self.directory + str(i) + ".bin"
+
+    def strings_path(self, i: int) -> str:
+        """
+        Returns the path to the file with the encoded values of a str column.
+
+        Parameters:
+            i (int): The position of the column.
+        """
+        return self.directory + str(i) + ".str"
+
+    def create(self) -> None:
+        """
+        Creates the directory and the empty column files.
+
+        Raises:
+            ValueError: If a column has a data type that cannot be stored in columns.
+        """
+        if any(data_type not in self.TYPECODES for data_type in self.data_types):
+            raise ValueError("Bad data type for a columnar table")
+        os.makedirs(self.directory)
+        for i, data_type in enumerate(self.data_types):
+            open(self.column_path(i), "wb").close()
+            if data_type == "str":
+                open(self.strings_path(i), "wb").close()
+
+    def drop(self) -> None:
+        """
+        Removes the directory and the column files.
+        """
+        for name in os.listdir(self.directory):
+            os.remove(self.directory + name)
+        os.rmdir(self.directory)
+
+    def size(self) -> int:
+        """
+        Returns the number of rows of the table.
+        """
+        return min(os.path.getsize(self.column_path(i)) for i in range(len(self.data_types))) // 8
+
+    def disk_size(self) -> int:
+        """
+        Returns the total size of the column files in bytes.
+        """
+        return sum(os.path.getsize(path) for path in self.file_paths())
+
+    def stamp(self) -> tuple:
+        """
+        Returns a value that changes whenever a column file is written.
+        """
+        stamps = []
+        for name in sorted(os.listdir(self.directory)):
+            stat = os.stat(self.directory + name)
+            stamps.append((name, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(stamps)
+
+    def identity(self) -> int:
+        """
+        Returns a number that changes when write() replaces the column files, but not when rows are appended.
+        """
+        return os.stat(self.column_path(0)).st_ino
+
+    def read_column(self, i: int, locators=None) -> list:
+        """
+        Reads the values of a column through a memory map.
+
+        Parameters:
+            i (int): The position of the column.
+            locators (list | range): The row numbers to read, or None to read every row.
+
+        Returns:
+            list: The values.
+        """
+        count = self.size()
+        if count == 0:
+            return []
+        if locators is None:
+            locators = range(count)
+        with open(self.column_path(i), "rb") as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer, \
+                memoryview(buffer) as view, \
+                view.cast(self.TYPECODES[self.data_types[i]]) as values:
+            if self.data_types[i] != "str":
+                if isinstance(locators, range):
+                    return values[locators.start:locators.stop].tolist()
+                return [values[row] for row in locators]
+
+            if os.path.getsize(self.strings_path(i)) == 0:
+                return [""] * len(locators)
+            with open(self.strings_path(i), "rb") as strings_file, \
+                    mmap.mmap(strings_file.fileno(), 0, access=mmap.ACCESS_READ) as strings:
+                return [
+                    strings[values[row - 1] if row > 0 else 0:values[row]].decode("utf-8")
+                    for row in locators
+                ]
+
+    def read_columns(self, columns=None, locators=None) -> list:
+        """
+        Reads the rows of the table, leaving the columns that are not needed as None.
+
+        Parameters:
+            columns (list): The positions of the columns to read, or None to read every column.
+            locators (list | range): The row numbers to read, or None to read every row.
+
+        Returns:
+            list: The rows.
+        """
+        count = self.size() if locators is None else len(locators)
+        values = []
+        for i in range(len(self.data_types)):
+            if columns is None or i in columns:
+                values.append(self.read_column(i, locators))
+            else:
+                values.append([None] * count)
+        return [list(row) for row in zip(*values)]
+
+    def load(self, columns=None) -> list:
+        """
+        Loads every row of the table.
+
+        Parameters:
+            columns (list): The positions of the columns to read, or None to read every column.
+
+        Returns:
+            list: The rows.
+        """
+        return self.read_columns(columns)
+
+    def load_arrays(self, columns) -> tuple:
+        """
+        Loads columns of the table as NumPy arrays.
+
+        int and float columns are memory mapped without copying or converting them.
+
+        Parameters:
+            columns (list): The positions of the columns to load.
+
+        Returns:
+            tuple: The arrays by column position (None for the other columns) and the number of rows.
+        """
+        count = self.size()
+        arrays = [None] * len(self.data_types)
+        for i in columns:
+            if self.data_types[i] == "str":
+                arrays[i] = np.array(self.read_column(i), dtype=NUMPY_TYPES["str"])
+            elif count == 0:
+                arrays[i] = np.empty(0, dtype=NUMPY_TYPES[self.data_types[i]])
+            else:
+                arrays[i] = np.memmap(self.column_path(i), dtype=NUMPY_TYPES[self.data_types[i]],
+                                      mode="r", shape=(count,))
+        return arrays, count
+
+    def read_rows(self, columns=None, start: int = 0):
+        """
+        Reads the rows of the table together with their locators.
+
+        Parameters:
+            columns (list): The positions of the columns to read, or None to read every column.
+            start (int): The number of the first row to read.
+
+        Yields:
+            tuple: The row number and the row.
+        """
+        if start == 0:
+            yield from enumerate(self.iter_rows(columns))
+        else:
+            yield from self.read_blocks([(start, self.size() - start)], columns)
+
+    def iter_rows(self, columns=None):
+        """
+        Reads the rows of the table in batches of BATCH_SIZE rows.
+
+        Parameters:
+            columns (list): The positions of the columns to read, or None to read every column.
+
+        Yields:
+            list: The rows.
+        """
+        count = self.size()
+        for start in range(0, count, self.BATCH_SIZE):
+            yield from self.read_columns(columns, range(start, min(start + self.BATCH_SIZE, count)))
+
+    def read_blocks(self, blocks: list, columns=None):
+        """
+        Reads the rows of some blocks of consecutive rows together with their locators.
+
+        Parameters:
+            blocks (list): The blocks, as the number of their first row and their number of rows.
+            columns (list): The positions of the columns to read, or None to read every column.
+
+        Yields:
+            tuple: The row number and the row.
+        """
+        for start, count in blocks:
+            for batch in range(start, start + count, self.BATCH_SIZE):
+                rows = self.read_columns(columns, range(batch, min(batch + self.BATCH_SIZE, start + count)))
+                yield from enumerate(rows, batch)
+
+    def fetch(self, locators: list, columns=None) -> list:
+        """
+        Reads the rows with the given row numbers.
+
+        Parameters:
+            locators (list): The row numbers.
+            columns (list): The positions of the columns to read, or None to read every column.
+
+        Returns:
+            list: The rows, in the order of the locators.
+        """
+        return self.read_columns(columns, locators)
+
+    def append(self, row: list) -> tuple:
+        """
+        Appends a row to the end of every column file.
+
+        Parameters:
+            row (list): The row to append.
+
+        Returns:
+            tuple: The locator of the row and the new number of rows.
+        """
+        count = self.size()
+        packed = [self.pack(i, [value]) for i, value in enumerate(row)]
+        for i, (values, strings) in enumerate(packed):
+            if strings is not None:
+                with open(self.strings_path(i), "ab") as file:
+                    end = file.tell() + len(strings)
+                    file.write(strings)
+                    self.file_manager.sync(file, deferred=True)
+                values = array.array("q", [end]).tobytes()
+            with open(self.column_path(i), "ab") as file:
+                file.write(values)
+                self.file_manager.sync(file, deferred=True)
+        return count, count + 1
+
+    def append_rows(self, rows) -> tuple:
+        """
+        Appends rows to the end of every column file, a batch at a time.
+
+        If the rows raise an exception, the column files are truncated back to
+        their previous sizes.
+
+        Parameters:
+            rows (iterable): The rows to append.
+
+        Returns:
+            tuple: The locators of the rows and the new number of rows.
+        """
+        paths = self.file_paths()
+        sizes = {path: os.path.getsize(path) for path in paths}
+        start = count = self.size()
+        rows = iter(rows)
+        try:
+            with contextlib.ExitStack() as stack:
+                files = {path: stack.enter_context(open(path, "ab")) for path in paths}
+                for batch in iter(lambda: list(itertools.islice(rows, self.BATCH_SIZE)), []):
+                    self.write_batch(files, batch)
+                    count += len(batch)
+                for file in files.values():
+                    self.file_manager.sync(file)
+        except BaseException:
+            for path, size in sizes.items():
+                os.truncate(path, size)
+            raise
+        return range(start, count), count
+
+    def write(self, table, before_replace=None) -> tuple:
+        """
+        Overwrites the column files with the given rows.
+
+        The rows are streamed in batches to temporary column files, which replace the
+        old ones once every row was written, so the rows may be read from the column
+        files themselves. If the rows raise an exception, the temporary files are
+        removed and the table is left untouched.
+
+        Parameters:
+            table (iterable): The rows of the table.
+            before_replace (function): Called without arguments once the temporary files are complete,
+                before they replace the column files.
+
+        Returns:
+            tuple: The locators of the rows and the new number of rows.
+        """
+        paths = self.file_paths()
+        rows = iter(table)
+        count = 0
+        try:
+            with contextlib.ExitStack() as stack:
+                files = {path: stack.enter_context(open(path + ".tmp", "wb")) for path in paths}
+                for batch in iter(lambda: list(itertools.islice(rows, self.BATCH_SIZE)), []):
+                    self.write_batch(files, batch)
+                    count += len(batch)
+                for file in files.values():
+                    self.file_manager.sync(file)
+            if before_replace is not None:
+                before_replace()
+        except BaseException:
+            self.remove_temp()
+            raise
+        self.replace_temp()
+        return range(count), count
+
+    def replace_temp(self) -> None:
+        """
+        Replaces the column files with the temporary files written by write(), if there are any.
+        """
+        for path in self.file_paths():
+            if os.path.exists(path + ".tmp"):
+                os.replace(path + ".tmp", path)
+
+    def remove_temp(self) -> None:
+        """
+        Removes the temporary files written by write(), if there are any.
+        """
+        for path in self.file_paths():
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+    def file_paths(self) -> list:
+        """
+        Returns the paths to the column files and the strings files of the table.
+        """
+        paths = [self.column_path(i) for i in range(len(self.data_types))]
+        paths += [self.strings_path(i) for i, data_type in enumerate(self.data_types) if data_type == "str"]
+        return paths
+
+    def write_batch(self, files: dict, batch: list) -> None:
+        """
+        Writes a batch of rows at the current end of the open column files.
+
+        Parameters:
+            files (dict): The open column and strings files by path.
+            batch (list): The rows.
+        """
+        for i, column in enumerate(zip(*batch)):
+            strings_file = files.get(self.strings_path(i))
+            values, strings = self.pack(i, column, strings_file.tell() if strings_file is not None else 0)
+            if strings is not None:
+                strings_file.write(strings)
+            files[self.column_path(i)].write(values)
+
+    def pack(self, i: int, values, start: int = 0) -> tuple:
+        """
+        Packs values of a column into bytes.
+
+        Parameters:
+            i (int): The position of the column.
+            values (list): The values.
+            start (int): For str columns, the offset in the strings file where the values will be written.
+
+        Returns:
+            tuple: The packed array and, for str columns, the encoded values (None otherwise).
+            For str columns the array holds the end offsets of the values in the strings file.
+        """
+        if self.data_types[i] != "str":
+            try:
+                return array.array(self.TYPECODES[self.data_types[i]], values).tobytes(), None
+            except OverflowError:
+                raise ValueError("Bad input values")
+
+        encoded = [value.encode("utf-8") for value in values]
+        ends = []
+        end = start
+        for value in encoded:
+            end += len(value)
+            ends.append(end)
+        return array.array("q", ends).tobytes(), b"".join(encoded)
@@ -1,7 +1,23 @@
+from itertools import chain, islice
+
 from tabulate import tabulate
 
+from dbms.aggregate import Aggregation
+from dbms.partition import Partitioning
+from dbms.planner import Planner
+from dbms.sort import Sorter
+from dbms.statistics import TableStatistics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class Table:
+    # Number of rows printed in each table by print_selected_rows.
+    PAGE_SIZE = 1000
+
     def __init__(self, name, database):
         """Initialize a table inside a database.
         
@@ -11,131 +27,432 @@ class Table:
             """
         self.name = name
         self.database = database  # Parent database
-        self.metadata = database.metadata[name]
+        self.metadata = database.get_info_table(name)
         self.file_manager = database.file_manager
+        # The rows of a partitioned table are stored by its partitions, which are tables of their own
+        self.partitioning = None
+        self.partitions = []
+        if "partitioning" in self.metadata and name not in database.partitions:
+            self.partitioning = Partitioning(
+                self.metadata["partitioning"], self.metadata["columns"], self.metadata["data_types"])
+            self.partitions = [Table(partition, database) for partition in self.partitioning.tables]
 
-    def insert_row(self, row):
+    def insert_row(self, row, output=None):
         """Inserts a row into the table, ensuring it follows schema.
         
         Parameters:
-            row (list): The row to insert."""
-        self.apply_data_type_input_list(row)
-        self.file_manager.insert_row_csv(self.name, row)
-        print(f"Succesfully inserted row into {self.name}")
+            row (list): The row to insert.
+            output (file): Where the message is printed, or None for sys.stdout."""
+        codec = self.file_manager.codec(self.name)
+        row = codec.check_line_breaks(codec.decode(row))
+        if self.partitioning is None:
+            self.file_manager.insert_row_csv(self.name, row)
+        else:
+            self.route_rows([row])
+            self.file_manager.insert_row_csv(self.partitions[self.partitioning.route(row)].name, row)
+        print(f"Succesfully inserted row into {self.name}", file=output)
 
-    def update(self, condition_fn, condition_str , update_values:dict):
+    def insert_rows(self, rows, output=None):
+        """Inserts several rows into the table with a single append.
+
+        The statement either inserts every row or none of them.
+        
+        Parameters:
+            rows (iterable): The rows to insert, as lists of values.
+            output (file): Where the message is printed, or None for sys.stdout."""
+        rows = self.file_manager.codec(self.name).decode_rows(rows)
+        if self.partitioning is None:
+            count = self.file_manager.insert_rows(self.name, rows)
+        else:
+            count = 0
+            for partition, partition_rows in zip(self.partitions, self.route_rows(rows)):
+                if partition_rows:
+                    count += self.file_manager.insert_rows(partition.name, partition_rows)
+        print(f"Succesfully inserted {count} rows into {self.name}", file=output)
+
+    def update(self, condition, update_values:dict, output=None):
         """Updates rows based on a condition.
         
         Parameters:
-            condition_fn (function): The function to evaluate conditions on rows.
-            condition_str (str): The condition string to pass to the condition function.
-            update_values (dict): The values to update."""
-        self.apply_data_type_input_dict(update_values)
-        self.file_manager.update_rows(self.name, self.metadata , condition_fn, condition_str , update_values)
-        print(f"Succesfully updated row into {self.name}")
+            condition (Condition): The compiled condition, or None to update every row.
+            update_values (dict): The values to update.
+            output (file): Where the message is printed, or None for sys.stdout."""
+        update_values = self.file_manager.codec(self.name).decode_values(update_values, self.metadata["columns"])
+        if self.partitioning is not None and (
+                self.partitioning.column in update_values or self.metadata["primary_key"] in update_values):
+            raise ValueError("The partition column and the primary key of a partitioned table cannot be updated")
+        for table in self.stored(condition):
+            self.file_manager.update_rows(table.name, self.metadata, condition, update_values)
+        print(f"Succesfully updated row into {self.name}", file=output)
 
-    def delete(self, condition_fn, condition_str):
+    def delete(self, condition, output=None):
         """Deletes rows matching a condition.
         
         Parameters:
-            condition_fn (function): The function to evaluate conditions on rows.
-            condition_str (str): The condition string to pass to the condition function."""
-        self.file_manager.delete_rows(self.name, self.metadata , condition_fn, condition_str)
-        print(f"Succesfully deleted row into {self.name}")
+            condition (Condition): The compiled condition, or None to delete every row.
+            output (file): Where the message is printed, or None for sys.stdout."""
+        for table in self.stored(condition):
+            plan = table.plan(condition, parallel="locators")
+            self.file_manager.delete_rows(table.name, self.metadata, condition, plan.locators, plan.workers > 1)
+        print(f"Succesfully deleted row into {self.name}", file=output)
+
+    def vacuum(self, output=None):
+        """Rewrites the table without its deleted rows.
+
+        Parameters:
+            output (file): Where the message is printed, or None for sys.stdout."""
+        for table in self.stored():
+            self.file_manager.vacuum(table.name)
+        print(f"Table {self.name} vacuumed", file=output)
+
+    def analyze(self, output=None):
+        """Gathers the statistics of the columns of the table used by the planner.
+
+        Parameters:
+            output (file): Where the message is printed, or None for sys.stdout."""
+        rows = chain.from_iterable(self.file_manager.scan_rows(table.name) for table in self.stored())
+        self.metadata["statistics"] = TableStatistics.gather(rows, self.metadata["columns"])
+        self.database.save_metadata(self.database.metadata)
+        print(f"Table {self.name} analyzed", file=output)
+
+    def explain(self, condition, output=None):
+        """Prints the plan chosen for a condition, with the estimated and actual number of matching rows.
+
+        The rows are read as the plan reads them and counted, but not returned. Partitioned
+        tables show the plan of every partition that is not pruned.
+
+        Parameters:
+            condition (Condition): The compiled condition, or None for every row.
+            output (file): Where the plan is printed, or None for sys.stdout."""
+        vectorized = self.database.vectorized and np is not None
+        rows = []
+        for table in self.stored(condition):
+            plan = table.plan(condition, vectorized, "rows")
+            actual = sum(1 for _ in table.filter_rows([], condition, plan))
+            rows.append([table.name, plan.describe(), plan.rows_read, round(plan.cost, 1), plan.estimated_rows, actual])
+        headers = ["table", "access", "rows read", "cost", "estimated rows", "actual rows"]
+        print(tabulate(rows, headers=headers, tablefmt="grid"), file=output)
     
-    def select(self, columns, condition_fn=None, condition_str=None):
+    def route_rows(self, rows) -> list:
+        """Splits rows among the partitions of the table.
+
+        The primary keys are checked against every partition before any row is
+        inserted, so a statement never inserts the rows of some partitions only.
+
+        Parameters:
+            rows (iterable): The rows with the data types applied.
+
+        Returns:
+            list: The rows of every partition, in partition order.
+
+        Raises:
+            ValueError: If a primary key is already in the table or repeated in the rows."""
+        partition_rows = [[] for _ in self.partitions]
+        primaries = []
+        for partition in self.partitions:
+            # Deleted rows still in the write-ahead log are removed from the indexes first.
+            self.file_manager.checkpoint_table(partition.name)
+            primaries.append(self.file_manager.primary_index(partition.name))
+        # Rows partitioned by their primary key can only have the key of a row of their own partition.
+        by_key = self.partitioning.column == self.metadata["primary_key"]
+        keys = set()
+        for row in rows:
+            number = self.partitioning.route(row)
+            primary = primaries[number]
+            if primary is not None:
+                key = row[primary.column_index]
+                if key in keys or any(key in index for index in ([primary] if by_key else primaries)):
+                    raise ValueError(f"Duplicate primary key {key}")
+                keys.add(key)
+            partition_rows[number].append(row)
+        return partition_rows
+
+    def stored(self, condition=None) -> list:
+        """Returns the tables that store the rows that may satisfy a condition.
+
+        Parameters:
+            condition (Condition): The compiled condition, or None for every row.
+
+        Returns:
+            list: The partitions that are not pruned for a partitioned table, or else the table itself."""
+        if self.partitioning is None:
+            return [self]
+        return [self.partitions[number] for number in self.partitioning.prune(condition)]
+
+    def disk_size(self) -> int:
+        """Returns the size of the files of the table in bytes."""
+        return sum(self.file_manager.storage(table.name).disk_size() for table in self.stored())
+
+    def select(self, columns, condition=None, limit=None, offset=0, group_by=None, order_by=None):
         """
         Selects rows based on columns and conditions and prints it.
 
         Parameters:
             columns (list): The list of columns to select. Use ['*'] to select all columns.
-            condition_fn (function): The function to evaluate conditions on rows.
-            condition_str (str): The condition string to pass to the condition function.
+            condition (Condition): The compiled condition, or None to select every row.
+            limit (int): The maximum number of rows to select, or None for no limit.
+            offset (int): The number of matching rows to skip.
+            group_by (list): The names of the grouped columns, or None.
+            order_by (list): The sort columns as (name, descending), or None to keep the table order.
 
         """
-        table = self.file_manager.load_csv(self.name)
-        selected_rows = []
+        self.print_selected_rows(self.select_rows(columns, condition, limit, offset, group_by, order_by), columns)
 
-        for row in table:
-            if any(row):  # Check if the row is not empty
-                if condition_fn is None or condition_fn(row, self.metadata, condition_str):
-                    if columns == ['*']:
-                        selected_rows.append(row)
-                    else:
-                        selected_row = [row[self.metadata['columns'].index(col)] for col in columns]
-                        selected_rows.append(selected_row)
+    def select_rows(self, columns, condition=None, limit=None, offset=0, group_by=None, order_by=None):
+        """
+        Selects rows based on columns and conditions.
 
-        self.print_selected_rows(selected_rows, columns)
+        Rows are streamed from the table through the condition and the projection,
+        so reading stops as soon as the limit is reached. Aggregate functions and
+        GROUP BY are evaluated in a single pass over the matching rows. With ORDER BY,
+        the rows are sorted before the offset and the limit are applied.
 
-    def print_selected_rows(self, selected_rows, columns):
+        Parameters:
+            columns (list): The list of columns to select. Use ['*'] to select all columns.
+            condition (Condition): The compiled condition, or None to select every row.
+            limit (int): The maximum number of rows to select, or None for no limit.
+            offset (int): The number of matching rows to skip.
+            group_by (list): The names of the grouped columns, or None.
+            order_by (list): The sort columns as (name, descending), or None to keep the table order.
+
+        Returns:
+            iterator: The selected rows.
         """
-        Prints the selected rows in a tabular format.
+        stop = None if limit is None else offset + limit
+        if group_by or Aggregation.is_aggregate(columns):
+            rows = self.select_groups(columns, condition, group_by or [])
+            if order_by:
+                rows = self.sort_rows(rows, columns, order_by, stop)
+            return islice(rows, offset, stop)
+
+        indices = None if columns == ['*'] else self.column_indices(columns)
+        if order_by:
+            # The sort columns are selected after the selected columns and dropped once sorted.
+            selected = indices if indices is not None else list(range(len(self.metadata["columns"])))
+            sort_indices = self.column_indices([column for column, _ in order_by])
+            rows = chain.from_iterable(
+                table.filter_rows(selected + sort_indices, condition, table.plan(condition, parallel="rows"))
+                for table in self.stored(condition))
+            keys = [(len(selected) + i, descending) for i, (_, descending) in enumerate(order_by)]
+            rows = Sorter(keys, self.file_manager.file_path).sort(rows, stop)
+            return (row[:len(selected)] for row in islice(rows, offset, stop))
+
+        if self.partitioning is not None:
+            # Every partition stops at the end of the page, which is taken from the rows of all of them.
+            rows = chain.from_iterable(table.select_rows(columns, condition, stop) for table in self.stored(condition))
+            return islice(rows, offset, stop)
+
+        vectorized = limit is None and self.database.vectorized and np is not None
+        # Scans stop at the limit, so they are only split among worker processes without one.
+        plan = self.plan(condition, vectorized, "rows" if limit is None else None)
+        if plan.access == Planner.FULL_SCAN and plan.workers == 1 and vectorized:
+            selected_rows = self.select_vectorized(indices, condition)
+            if selected_rows is not None:
+                return iter(selected_rows[offset:])
+
+        return islice(self.filter_rows(indices, condition, plan), offset, stop)
+
+    def sort_rows(self, rows, columns, order_by, limit=None):
+        """
+        Sorts result rows by some of their columns.
 
         Parameters:
-            selected_rows (list): The list of selected rows.
-            columns (list): The list of columns to select. Use ['*'] to select all columns.
+            rows (iterable): The result rows.
+            columns (list): The names of the columns of the result rows.
+            order_by (list): The sort columns as (name, descending).
+            limit (int): The number of first sorted rows that are needed, or None for every row.
+
+        Returns:
+            iterator: The sorted rows.
+
+        Raises:
+            ValueError: If a sort column is not a column of the result rows.
         """
-        if columns == ['*']:
-            columns = self.metadata['columns']
-        
-        # Print the table using tabulate
-        print(tabulate(selected_rows, headers=columns, tablefmt="grid"))
+        keys = []
+        for column, descending in order_by:
+            if column not in columns:
+                raise ValueError(f"Column {column} must be selected to sort groups")
+            keys.append((columns.index(column), descending))
+        return Sorter(keys, self.file_manager.file_path).sort(rows, limit)
 
-    def apply_data_type_input_dict(self, values:dict):
+    def select_groups(self, columns, condition, group_by):
         """
-        Applies the data types to the input values.
+        Aggregates the rows that satisfy a condition.
 
         Parameters:
-            values (dict): The values to apply the data types.
+            columns (list): The grouped columns and aggregate functions to select.
+            condition (Condition): The compiled condition, or None to aggregate every row.
+            group_by (list): The names of the grouped columns.
+
+        Returns:
+            iterator: One row per group.
         """
-        data_types = self.metadata["data_types"]
-        columns = self.metadata["columns"]
-        
-        for key, value in values.items():
-            if key not in columns:
-                raise ValueError("Bad input values")
-            i = columns.index(key)
-            if data_types[i] == "int":
-                try:
-                    values[key] = int(value)
-                except:
-                    raise ValueError("Bad input values")
-            elif data_types[i] == "float":
-                try:
-                    values[key] = float(value)
-                except:
-                    raise ValueError("Bad input values")
-            elif data_types[i] == "str":
-                values[key] = str(value)
+        aggregation = Aggregation(columns, group_by, self.metadata["columns"], self.metadata["data_types"])
+        needed = set(aggregation.used_columns) | set(condition.used_columns if condition is not None else [])
+        groups = aggregation.accumulate([])
+        for table in self.stored(condition):
+            aggregation.merge(groups, table.group_states(aggregation, condition, needed))
+        return iter(aggregation.finish(groups))
+
+    def group_states(self, aggregation, condition, needed) -> dict:
+        """
+        Computes the running states of the groups of the rows of the table that satisfy a condition.
+
+        Parameters:
+            aggregation (Aggregation): The compiled aggregation.
+            condition (Condition): The compiled condition, or None to aggregate every row.
+            needed (set): The positions of the columns the aggregation and the condition read.
+
+        Returns:
+            dict: The states of the groups (see Aggregation.accumulate()).
+        """
+        plan = self.plan(condition, parallel="groups")
+        if plan.workers > 1:
+            chunks = self.file_manager.parallel_scan(self.name, condition, sorted(needed), "groups", aggregation, plan.blocks)
+            groups = {}
+            for chunk in chunks:
+                aggregation.merge(groups, chunk)
+            return groups
+        rows = self.scan(condition, needed, plan)
+        if condition is not None:
+            predicate = condition.predicate
+            rows = (row for row in rows if predicate(row))
+        return aggregation.accumulate(rows)
+
+    def filter_rows(self, indices, condition, plan=None):
+        """
+        Applies the condition and the projection to the scanned rows one at a time, or in the
+        worker processes when the plan splits the scan among them.
+
+        Parameters:
+            indices (list): The positions of the selected columns, or None for every column.
+            condition (Condition): The compiled condition, or None to select every row.
+            plan (Plan): The plan that reads the rows, or None to plan it here.
+
+        Yields:
+            list: The selected rows.
+        """
+        needed = None
+        if indices is not None:
+            needed = set(indices) | set(condition.used_columns if condition is not None else [])
+        if plan is not None and plan.workers > 1:
+            columns = None if needed is None else sorted(needed)
+            for chunk in self.file_manager.parallel_scan(self.name, condition, columns, "rows", indices, plan.blocks):
+                yield from chunk
+            return
+        predicate = condition.predicate if condition is not None else None
+
+        for row in self.scan(condition, needed, plan):
+            if row:  # Check if the row is not empty
+                if predicate is None or predicate(row):
+                    if indices is None:
+                        yield row
+                    else:
+                        yield [row[i] for i in indices]
+
+    def select_vectorized(self, indices, condition):
+        """
+        Selects rows of a full table scan with NumPy.
+
+        The needed columns are loaded as arrays, the condition is evaluated as a
+        boolean mask over them and the projection takes the masked arrays.
+
+        Parameters:
+            indices (list): The positions of the selected columns, or None for every column.
+            condition (Condition): The compiled condition, or None to select every row.
+
+        Returns:
+            list: The selected rows, or None if the condition cannot be evaluated on
+            arrays (for example when comparing values of different types), in which
+            case the rows have to be selected one by one.
+        """
+        if indices is None:
+            indices = list(range(len(self.metadata["columns"])))
+        needed = set(indices) | set(condition.used_columns if condition is not None else [])
+        try:
+            arrays, count = self.file_manager.load_arrays(self.name, sorted(needed))
+            if condition is not None:
+                mask = condition.mask(arrays, count)
+                projected = [arrays[i][mask] for i in indices]
             else:
-                raise ValueError("Bad input values")      
+                projected = [arrays[i] for i in indices]
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return [list(row) for row in zip(*(array.tolist() for array in projected))]
 
-    def apply_data_type_input_list(self, values:list) -> None:
-        '''
-        Applies the data types to the input values.
+    def plan(self, condition=None, vectorized: bool = False, parallel: str = None):
+        """
+        Chooses how to read the rows that may satisfy a condition (see Planner).
 
         Parameters:
-            table_name (str): The name of the table.
-            values (list/dict): The values to apply the data types.
-        '''
-        
-        data_types = self.metadata["data_types"]
-        if len(values) != len(data_types):
-            raise ValueError("Bad input values")
+            condition (Condition): The compiled condition, or None.
+            vectorized (bool): Whether a full scan may be evaluated with NumPy.
+            parallel (str): What worker processes would send back if the scan is split among them
+                ("rows", "locators" or "groups"), or None if it may not be split.
+
+        Returns:
+            Plan: The plan.
+        """
+        return Planner(self).plan(condition, vectorized, parallel)
+
+    def scan(self, condition=None, columns=None, plan=None):
+        """
+        Returns the rows that may satisfy a condition, reading only the rows located by the plan
+        when it uses an index, or else only the blocks of the zone map that may satisfy it.
+
+        The condition itself still has to be applied to the rows.
+
+        Parameters:
+            condition (Condition): The compiled condition, or None.
+            columns (set): The positions of the columns that are needed, or None for every column.
+            plan (Plan): The plan chosen with plan(), or None to plan it here.
+
+        Returns:
+            iterator: The candidate rows.
+        """
+        if self.partitioning is not None:
+            return chain.from_iterable(table.scan(condition, columns) for table in self.stored(condition))
+        if plan is None and condition is not None:
+            plan = self.plan(condition)
+        if plan is None or plan.locators is None:
+            return self.file_manager.scan_rows(self.name, columns, condition=condition)
+        return iter(self.file_manager.fetch_rows(self.name, plan.locators, columns))
+
+    def column_indices(self, columns: list) -> list:
+        """
+        Resolves column names to their positions in a row.
+
+        Parameters:
+            columns (list): The list of column names.
+
+        Returns:
+            list: The list of indices.
+        """
+        for column in columns:
+            if column not in self.metadata["columns"]:
+                raise ValueError(f"Column {column} not found")
+        return [self.metadata["columns"].index(column) for column in columns]
+
+    def print_selected_rows(self, selected_rows, columns, output=None):
+        """
+        Prints the selected rows in a tabular format.
+
+        The rows are printed in pages of PAGE_SIZE rows, so they never have to be
+        held in memory all at once.
+
+        Parameters:
+            selected_rows (iterable): The selected rows.
+            columns (list): The list of columns to select. Use ['*'] to select all columns.
+            output (file): Where the rows are printed, or None for sys.stdout.
+        """
+        if columns == ['*']:
+            columns = self.metadata['columns']
         
-        for i in range(len(values)):
-                if data_types[i] == "int":
-                    try:
-                        values[i] = int(values[i])
-                    except:
-                        raise ValueError("Bad input values")
-                elif data_types[i] == "float":
-                    try:
-                        values[i] = float(values[i])
-                    except:
-                        raise ValueError("Bad input values")
-                elif data_types[i] == "str":
-                    values[i] = str(values[i])
-                else:
-                    raise ValueError("Bad input values")
-        
\ No newline at end of file
+        # Print the table using tabulate
+        selected_rows = iter(selected_rows)
+        page = list(islice(selected_rows, self.PAGE_SIZE))
+        print(tabulate(page, headers=columns, tablefmt="grid"), file=output)
+        while len(page) == self.PAGE_SIZE:
+            page = list(islice(selected_rows, self.PAGE_SIZE))
+            if page:
+                print(tabulate(page, headers=columns, tablefmt="grid"), file=output)
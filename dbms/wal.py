@@ -0,0 +1,249 @@
+"""
+wal.py
+
+This module provides the WriteAheadLog class used by DatabaseFileManager to make statements durable without rewriting tables.
+"""
+
+import os
+import pickle
+import threading
+
+
+class WriteAheadLog:
+    """
+    A per-database log of the statements that changed tables.
+
+    Every record is pickled as (lsn, table_name, kind, condition, values), where
+    lsn is the increasing log sequence number of the record, kind is "insert",
+    "update" or "delete", condition is the text of the WHERE condition (or None)
+    and values are the locators and values of the inserted rows, the updated
+    values or the locators of the deleted rows.
+
+    Records are written to the log file as they are appended, but only forced to
+    disk by commit(). Statements committed while another commit is forcing the
+    log to disk wait for it and are then forced together with one fsync (group
+    commit).
+
+    The log also keeps a checkpoint file with the last record applied to the
+    files of every table, so the records of a table are not replayed twice.
+
+    The log files are only read and written between open() and close(), by the
+    one process that has the database to itself (see DatabaseFileManager).
+
+    Attributes:
+        file_path (str): The path to the log file.
+        checkpoint_path (str): The path to the checkpoint file.
+        fsync (bool): Whether commit() forces the log to disk, or only hands it to the OS.
+        checkpoints (dict): The table names mapped to [lsn, installing], where lsn is the last
+            record applied to the table files and installing tells that new table files
+            were written but may not have replaced the old ones yet.
+        lsn (int): The sequence number of the last appended record.
+        durable_lsn (int): The sequence number of the last committed record.
+        file (file): The open log file, or None when the log is closed.
+    """
+
+    def __init__(self, directory: str, fsync: bool):
+        """
+        Initializes the log of a database without opening it.
+
+        Parameters:
+            directory (str): The folder of the database.
+            fsync (bool): Whether commit() forces the log to disk.
+        """
+        self.file_path = directory + "wal"
+        self.checkpoint_path = directory + "checkpoint"
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.committed = threading.Condition(self.lock)
+        self.flushing = False
+        self.checkpoints = {}
+        self.lsn = 0
+        self.durable_lsn = 0
+        self.file = None
+
+    def open(self) -> None:
+        """
+        Opens the log files, discarding a partially written last record.
+        """
+        try:
+            with open(self.checkpoint_path, "rb") as file:
+                self.checkpoints = pickle.load(file)
+        except FileNotFoundError:
+            self.checkpoints = {}
+
+        end = 0
+        self.lsn = max((lsn for lsn, _ in self.checkpoints.values()), default=0)
+        for record, end in self.read():
+            self.lsn = max(self.lsn, record[0])
+        self.durable_lsn = self.lsn
+        self.file = open(self.file_path, "ab")
+        self.file.truncate(end)
+
+    def has_records(self) -> bool:
+        """
+        Returns whether the log file holds records, even if it is not open.
+        """
+        return os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0
+
+    def is_open(self) -> bool:
+        """
+        Returns whether the log files are open.
+        """
+        return self.file is not None and not self.file.closed
+
+    def read(self):
+        """
+        Reads the records of the log file.
+
+        Yields:
+            tuple: The record and the offset in the log file where it ends.
+        """
+        try:
+            file = open(self.file_path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            while True:
+                try:
+                    record = pickle.load(file)
+                except (EOFError, pickle.UnpicklingError, ValueError, IndexError):
+                    return
+                yield record, file.tell()
+
+    def records(self, table_names):
+        """
+        Returns the records that were not applied to the table files yet.
+
+        Parameters:
+            table_names (iterable): The tables of the database. Records of other tables are skipped.
+
+        Returns:
+            list: The records, in the order they were appended.
+        """
+        table_names = set(table_names)
+        return [record for record, _ in self.read()
+                if record[1] in table_names and record[0] > self.checkpoints.get(record[1], [0])[0]]
+
+    def append(self, table_name: str, kind: str, condition, values) -> int:
+        """
+        Writes a record at the end of the log file, without forcing it to disk.
+
+        Parameters:
+            table_name (str): The name of the table.
+            kind (str): "insert", "update" or "delete".
+            condition (str): The text of the condition, or None.
+            values: The locators and values of the inserted rows (list of pairs), the updated values (dict)
+                or the locators of the deleted rows (list).
+
+        Returns:
+            int: The sequence number of the record.
+        """
+        with self.lock:
+            self.lsn += 1
+            pickle.dump((self.lsn, table_name, kind, condition, values), self.file)
+            return self.lsn
+
+    def commit(self) -> None:
+        """
+        Waits until every appended record is forced to disk.
+
+        The first caller forces the log to disk while later callers wait, and the
+        records appended in the meantime are forced by the next fsync.
+        """
+        with self.lock:
+            if not self.is_open():
+                return
+            target = self.lsn
+            while self.durable_lsn < target:
+                if self.flushing:
+                    self.committed.wait()
+                    continue
+                self.flushing = True
+                durable = self.lsn
+                self.file.flush()
+                self.lock.release()
+                try:
+                    if self.fsync:
+                        os.fsync(self.file.fileno())
+                finally:
+                    self.lock.acquire()
+                    self.flushing = False
+                self.durable_lsn = max(self.durable_lsn, durable)
+                self.committed.notify_all()
+
+    def begin_checkpoint(self, table_name: str, lsn: int) -> None:
+        """
+        Records that new files of a table that apply every record up to lsn are
+        written and about to replace the old ones.
+
+        Parameters:
+            table_name (str): The name of the table.
+            lsn (int): The sequence number of the last applied record.
+        """
+        self.checkpoints[table_name] = [lsn, True]
+        self.save_checkpoints()
+
+    def end_checkpoint(self, table_name: str) -> None:
+        """
+        Records that the new files of a table replaced the old ones.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        self.checkpoints[table_name][1] = False
+        self.save_checkpoints()
+
+    def skip(self, table_name: str) -> None:
+        """
+        Marks every record of a table appended so far as applied, for example when the table is dropped.
+
+        Parameters:
+            table_name (str): The name of the table.
+        """
+        with self.lock:
+            self.checkpoints[table_name] = [self.lsn, False]
+        self.save_checkpoints()
+
+    def save_checkpoints(self) -> None:
+        """
+        Replaces the checkpoint file with the current checkpoints.
+        """
+        with open(self.checkpoint_path + ".tmp", "wb") as file:
+            pickle.dump(self.checkpoints, file)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def truncate(self) -> None:
+        """
+        Removes every record from the log file once all of them were applied to the table files.
+        """
+        with self.lock:
+            self.file.truncate(0)
+            self.file.seek(0)
+            self.durable_lsn = self.lsn
+
+    def size(self) -> int:
+        """
+        Returns the size of the log file in bytes.
+        """
+        with self.lock:
+            return self.file.tell() if self.is_open() else 0
+
+    def close(self) -> None:
+        """
+        Closes the log file.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+
+    def drop(self) -> None:
+        """
+        Closes and removes the log and checkpoint files.
+        """
+        self.close()
+        for path in (self.file_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
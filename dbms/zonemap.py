@@ -0,0 +1,290 @@
+"""
+zonemap.py
+
+This module provides the ZoneMap class used by DatabaseFileManager to skip blocks of rows that cannot satisfy a condition.
+"""
+
+import os
+import pickle
+
+
+class ZoneMap:
+    """
+    The minimum and maximum value of every column in each block of BLOCK_SIZE consecutive rows of a table.
+
+    A block is recorded as [start, count, minimums, maximums], where start is the
+    locator of its first row (see storage.py) and count the number of rows in the
+    table files, deleted or not. A scan only has to read the blocks whose ranges
+    overlap the bounds of a condition, which skips most of the table when the
+    condition restricts a column whose values follow the order of the rows, such
+    as the time of append-mostly tables. Deleted rows keep their block wider than
+    needed until the table is rewritten, which never skips a block by mistake.
+
+    The zone map file holds a pickled snapshot of the blocks with the identity and
+    the size of the table files it covers. Rows are only appended at the end of the
+    table files, so the size is also the locator of the first row that is not
+    covered: a zone map behind its table catches up by reading the rows appended
+    since the snapshot, which is written again whenever a block is full.
+
+    Attributes:
+        file_path (str): The path to the zone map file.
+        blocks (list): The blocks of the table, in table order.
+        identity (int): The identity of the covered table files.
+        covered_size (int): The size of the covered table.
+    """
+
+    # Number of rows of a block.
+    BLOCK_SIZE = 4096
+
+    def __init__(self, file_path: str):
+        """
+        Initializes an empty zone map.
+
+        Parameters:
+            file_path (str): The path to the zone map file.
+        """
+        self.file_path = file_path
+        self.blocks = []
+        self.identity = None
+        self.covered_size = 0
+        self.placing = []
+
+    def load(self) -> bool:
+        """
+        Loads the zone map from its file.
+
+        Returns:
+            bool: False if the zone map file does not exist.
+        """
+        try:
+            with open(self.file_path, "rb") as file:
+                self.blocks, self.identity, self.covered_size = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False
+        return True
+
+    def save(self) -> None:
+        """
+        Writes a snapshot of the whole zone map to its file.
+        """
+        with open(self.file_path, "wb") as file:
+            pickle.dump((self.blocks, self.identity, self.covered_size), file)
+
+    def drop(self) -> None:
+        """
+        Removes the zone map file.
+        """
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def covers(self, identity: int, size: int) -> bool:
+        """
+        Returns whether the zone map covers the beginning of the table files, up to date or behind them.
+
+        Parameters:
+            identity (int): The identity of the table files.
+            size (int): The size of the table.
+        """
+        return self.identity == identity and self.covered_size <= size
+
+    def build(self, rows, identity: int, covered_size: int) -> None:
+        """
+        Rebuilds the zone map from the rows of the table without saving it.
+
+        Parameters:
+            rows (iterable): Pairs of (locator, row) for every row in the table files, deleted or not.
+            identity (int): The identity of the table files.
+            covered_size (int): The size of the table.
+        """
+        self.blocks = []
+        batch = []
+        for locator, row in rows:
+            if not batch:
+                start = locator
+            batch.append(row)
+            if len(batch) == self.BLOCK_SIZE:
+                self.blocks.append(self.summarize(start, batch))
+                batch = []
+        if batch:
+            self.blocks.append(self.summarize(start, batch))
+        self.identity = identity
+        self.covered_size = covered_size
+
+    def collect(self, rows, append: bool = False):
+        """
+        Summarizes rows into blocks as they are written to the table files.
+
+        The locators of the rows are only known once they are written, so the new
+        blocks start at the position of their first row among the written rows
+        until place() replaces them with locators.
+
+        Parameters:
+            rows (iterable): The rows.
+            append (bool): Whether the rows are appended to the table, in which case they
+                fill the last block first, or replace every row of the table.
+
+        Yields:
+            list: The rows.
+        """
+        if not append:
+            self.blocks = []
+        self.placing = []
+        room = 0
+        if self.blocks:
+            room = self.BLOCK_SIZE - self.blocks[-1][1]
+        batch = []
+        position = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) == (room or self.BLOCK_SIZE):
+                self.add_batch(position - len(batch) + 1, batch, room)
+                room = 0
+                batch = []
+            position += 1
+            yield row
+        if batch:
+            self.add_batch(position - len(batch), batch, room)
+
+    def add_batch(self, position: int, batch: list, room: int) -> None:
+        """
+        Adds a batch of rows collected by collect() to the last block or to a new one.
+
+        Parameters:
+            position (int): The position of the first row of the batch among the written rows.
+            batch (list): The rows.
+            room (int): The number of rows that still fit in the last block, 0 for a new block.
+        """
+        block = self.summarize(position, batch)
+        if room:
+            self.merge(self.blocks[-1], block)
+        else:
+            self.blocks.append(block)
+            self.placing.append(block)
+
+    def place(self, locators, identity: int, covered_size: int) -> None:
+        """
+        Replaces the positions of the blocks added by collect() with the locators of their first rows.
+
+        Parameters:
+            locators (list | range): The locators of the written rows.
+            identity (int): The identity of the table files.
+            covered_size (int): The size of the table after the rows were written.
+        """
+        for block in self.placing:
+            block[0] = locators[block[0]]
+        self.placing = []
+        self.identity = identity
+        self.covered_size = covered_size
+
+    def add(self, locator: int, row: list, covered_size: int) -> None:
+        """
+        Adds an appended row, and writes a snapshot when its block is full.
+
+        Parameters:
+            locator (int): The locator of the row.
+            row (list): The row.
+            covered_size (int): The size of the table after the row was written.
+        """
+        self.put(locator, row)
+        self.covered_size = covered_size
+        if self.blocks[-1][1] == self.BLOCK_SIZE:
+            self.save()
+
+    def extend(self, rows, covered_size: int) -> None:
+        """
+        Adds the rows appended to the table since the zone map was written, without saving it.
+
+        Parameters:
+            rows (iterable): Pairs of (locator, row) for the appended rows.
+            covered_size (int): The size of the table.
+        """
+        for locator, row in rows:
+            self.put(locator, row)
+        self.covered_size = covered_size
+
+    def put(self, locator: int, row: list) -> None:
+        """
+        Adds an appended row to the last block, or to a new block if it is full.
+
+        Parameters:
+            locator (int): The locator of the row.
+            row (list): The row.
+        """
+        block = self.summarize(locator, [row])
+        if self.blocks and self.blocks[-1][1] < self.BLOCK_SIZE:
+            self.merge(self.blocks[-1], block)
+        else:
+            self.blocks.append(block)
+
+    @staticmethod
+    def summarize(start: int, rows: list) -> list:
+        """
+        Builds the block of some rows.
+
+        Parameters:
+            start (int): The locator of the first row.
+            rows (list): The rows.
+
+        Returns:
+            list: The block, as [start, count, minimums, maximums].
+        """
+        columns = list(zip(*rows))
+        return [start, len(rows), [min(values) for values in columns], [max(values) for values in columns]]
+
+    @staticmethod
+    def merge(block: list, other: list) -> None:
+        """
+        Adds the rows of a block to the block before it.
+
+        Parameters:
+            block (list): The block, which is updated.
+            other (list): The block of the rows that follow it.
+        """
+        block[1] += other[1]
+        block[2] = [min(values) for values in zip(block[2], other[2])]
+        block[3] = [max(values) for values in zip(block[3], other[3])]
+
+    def row_count(self) -> int:
+        """
+        Returns the number of rows in the covered table files, deleted or not.
+        """
+        return sum(block[1] for block in self.blocks)
+
+    def candidates(self, bounds: dict) -> list:
+        """
+        Returns the blocks that may have rows within some bounds.
+
+        Parameters:
+            bounds (dict): The ranges of values allowed for some columns, by column position,
+                as (low, low_inclusive, high, high_inclusive) where a missing bound is None.
+
+        Returns:
+            list: The blocks, as (start, count), in table order.
+        """
+        return [
+            (start, count) for start, count, minimums, maximums in self.blocks
+            if all(self.overlaps(minimums[i], maximums[i], *bounds[i]) for i in bounds)
+        ]
+
+    @staticmethod
+    def overlaps(minimum, maximum, low, low_inclusive: bool, high, high_inclusive: bool) -> bool:
+        """
+        Returns whether the values of a block may lie in a range.
+
+        Parameters:
+            minimum: The minimum value of the block.
+            maximum: The maximum value of the block.
+            low: The lower bound, or None if there is none.
+            low_inclusive (bool): Whether the lower bound itself is in the range.
+            high: The upper bound, or None if there is none.
+            high_inclusive (bool): Whether the upper bound itself is in the range.
+        """
+        try:
+            if low is not None and (maximum < low or (maximum == low and not low_inclusive)):
+                return False
+            if high is not None and (minimum > high or (minimum == high and not high_inclusive)):
+                return False
+        except TypeError:
+            # Values that cannot be compared to the bounds are left to the condition.
+            return True
+        return True
@@ -0,0 +1,96 @@
+"""
+conftest.py
+
+This module provides the fixtures of the tests, which run statements on new databases that are removed afterwards.
+"""
+
+import contextlib
+import glob
+import io
+import os
+import shutil
+import sys
+import uuid
+
+import pytest
+
+# Add project root (UDSQL) to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbms.database import Database
+from dbms.executor import Executor
+
+
+class Session:
+    """
+    Runs statements on a database and keeps the rows selected by the last one.
+
+    Attributes:
+        db (Database): The database.
+        executor (Executor): The executor of the statements.
+        rows (list): The rows selected by the last statement, or None if it was not a SELECT.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.executor = Executor(db, self.keep_rows)
+        self.rows = None
+
+    def keep_rows(self, headers: list, rows) -> None:
+        self.rows = [list(row) for row in rows]
+
+    def run(self, statement: str):
+        """
+        Runs a statement without printing its messages.
+
+        Parameters:
+            statement (str): The statement.
+
+        Returns:
+            list: The selected rows, or None if the statement is not a SELECT.
+        """
+        self.rows = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.executor.run(statement)
+        return self.rows
+
+
+@pytest.fixture
+def database_name():
+    """
+    Returns the name of a new database. The files of every database whose name starts with it are removed
+    at the end of the test.
+    """
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    yield name
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for path in glob.glob(os.path.join(root, "data", name + "*")):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def open_session(database_name):
+    """
+    Returns a function that opens a database with the given options (see Database) and returns a Session on it.
+    Sessions open the database of the test, or another one named after it with the given suffix, and their
+    databases are closed at the end of the test.
+    """
+    databases = []
+
+    def open_session(suffix: str = "", **options):
+        options.setdefault("workers", 1)
+        db = Database(database_name + suffix, **options)
+        databases.append(db)
+        return Session(db)
+
+    yield open_session
+    for db in databases:
+        db.close()
+
+
+@pytest.fixture
+def session(open_session):
+    """
+    Returns a Session on a new database with the default options.
+    """
+    return open_session()
@@ -0,0 +1,107 @@
+"""
+test_aggregate.py
+
+Tests of the aggregate functions and of GROUP BY.
+"""
+
+import pytest
+
+from dbms.aggregate import Aggregation
+from dbms.parser import Parser
+from dbms.storage import CsvStorage
+
+COLUMNS = ["id", "dept", "age"]
+ROWS = [[i, f"d{i % 3}", 20 + i % 7] for i in range(100)]
+
+
+@pytest.fixture
+def staff(open_session):
+    """
+    Returns a session on a table of ROWS without a cache.
+    """
+    session = open_session(cache_size=0)
+    session.run("CREATE TABLE staff id int dept str age int PRIMARY_KEY id")
+    session.run("INSERT INTO staff VALUES " + ", ".join(" ".join(map(str, row)) for row in ROWS))
+    return session
+
+
+def expected_groups(rows: list) -> list:
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[1], []).append(row[2])
+    return [[dept, len(ages), sum(ages) / len(ages), min(ages), max(ages)] for dept, ages in groups.items()]
+
+
+@pytest.mark.parametrize("statement, items", [
+    ("SELECT COUNT(*), AVG(age) FROM t GROUP BY dept", ["COUNT(*)", "AVG(age)"]),
+    ("SELECT dept,COUNT(*) FROM t GROUP BY dept", ["dept", "COUNT(*)"]),
+    ("SELECT dept COUNT( * ) , max(age) FROM t", ["dept", "COUNT(*)", "max(age)"]),
+    ("SELECT id name FROM t", ["id", "name"]),
+])
+def test_parse_select_list(statement, items):
+    assert Parser(statement).parse()[2] == items
+
+
+@pytest.mark.parametrize("statement", ["SELECT COUNT(* FROM t", "SELECT COUNT*) FROM t"])
+def test_parse_unbalanced_select_list(statement):
+    with pytest.raises(ValueError, match="Invalid command"):
+        Parser(statement).parse()
+
+
+def test_aggregate_without_groups():
+    aggregation = Aggregation(["COUNT(*)", "SUM(age)", "MIN(dept)", "MAX(id)"], [], COLUMNS, ["int", "str", "int"])
+    assert aggregation.aggregate(ROWS) == [[100, sum(row[2] for row in ROWS), "d0", 99]]
+    # Without grouped columns there is one row even for no rows
+    assert aggregation.aggregate([]) == [[0, None, None, None]]
+
+
+def test_merged_states_equal_single_pass():
+    aggregation = Aggregation(["dept", "COUNT(*)", "AVG(age)", "MIN(age)", "MAX(age)"], ["dept"], COLUMNS,
+                              ["int", "str", "int"])
+    groups = aggregation.accumulate(ROWS[:30])
+    aggregation.merge(groups, aggregation.accumulate(ROWS[30:]))
+    assert aggregation.finish(groups) == aggregation.aggregate(ROWS) == expected_groups(ROWS)
+
+
+def test_group_by(staff):
+    rows = staff.run("SELECT dept, COUNT(*), AVG(age), MIN(age), MAX(age) FROM staff GROUP BY dept")
+    assert sorted(rows) == sorted(expected_groups(ROWS))
+    assert sorted(staff.run("SELECT COUNT(*), AVG(age) FROM staff GROUP BY dept")) == \
+        sorted([row[1:3] for row in expected_groups(ROWS)])
+
+
+def test_group_by_with_condition(staff):
+    rows = [row for row in ROWS if row[0] >= 50]
+    statement = "SELECT dept count(*) avg(age) min(age) max(age) FROM staff WHERE id >= 50 GROUP BY dept"
+    assert sorted(staff.run(statement)) == sorted(expected_groups(rows))
+    assert staff.run("SELECT COUNT(*) FROM staff WHERE id > 1000") == [[0]]
+    assert staff.run("SELECT dept, COUNT(*) FROM staff WHERE id > 1000 GROUP BY dept") == []
+
+
+def test_aggregation_streams_the_scan(staff, monkeypatch):
+    def load(*args, **kwargs):
+        raise AssertionError("The table was loaded into a list")
+
+    monkeypatch.setattr(CsvStorage, "load", load)
+    assert staff.run("SELECT SUM(id) FROM staff") == [[sum(range(100))]]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_aggregation(open_session, workers):
+    session = open_session(cache_size=0, workers=workers, vectorized=False)
+    session.run("CREATE TABLE staff id int dept str age int PRIMARY_KEY id")
+    rows = [[i, f"d{i % 3}", 20 + i % 7] for i in range(20000)]
+    session.run("INSERT INTO staff VALUES " + ", ".join(" ".join(map(str, row)) for row in rows))
+    assert sorted(session.run("SELECT dept COUNT(*) AVG(age) MIN(age) MAX(age) FROM staff GROUP BY dept")) == \
+        sorted(expected_groups(rows))
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("SELECT id, COUNT(*) FROM staff GROUP BY dept", "Column id must be in GROUP BY"),
+    ("SELECT COUNT(*) FROM staff GROUP BY height", "Column height not found"),
+    ("SELECT SUM(height) FROM staff", "Column height not found"),
+    ("SELECT AVG(dept) FROM staff", "Invalid aggregate AVG"),
+])
+def test_invalid_aggregations(staff, statement, message):
+    with pytest.raises(ValueError, match=message):
+        staff.run(statement)
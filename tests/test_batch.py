@@ -0,0 +1,130 @@
+"""
+test_batch.py
+
+Tests of the scripts run without user interaction by ScriptRunner and by main.py -d <database>.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from dbms.batch import ScriptRunner
+from dbms.database import Database
+from dbms.executor import Executor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+-- Load a table
+CREATE TABLE t id int name str PRIMARY_KEY id;
+INSERT INTO t VALUES 1 a
+INSERT INTO t VALUES 2 b;
+
+INSERT INTO t VALUES 1 c
+SELECT * FROM t
+INSERT INTO t VALUES 3 d
+"""
+
+
+def runner(session, **options) -> ScriptRunner:
+    """
+    Returns a runner of scripts on the database of a session, whose errors are kept in runner.errors.
+    """
+    return ScriptRunner(session.db, errors=io.StringIO(), **options)
+
+
+def test_read_statements():
+    assert list(ScriptRunner.read_statements(SCRIPT.splitlines())) == [
+        (3, "CREATE TABLE t id int name str PRIMARY_KEY id"), (4, "INSERT INTO t VALUES 1 a"),
+        (5, "INSERT INTO t VALUES 2 b"), (7, "INSERT INTO t VALUES 1 c"), (8, "SELECT * FROM t"),
+        (9, "INSERT INTO t VALUES 3 d")]
+
+
+def test_script_goes_on_after_errors(session, capsys):
+    script = runner(session)
+    assert not script.run(SCRIPT.splitlines())
+    assert (script.statements, script.failed, script.rows) == (6, 1, 2)
+    assert script.errors.getvalue() == "Error on line 7: Duplicate primary key 1\n"
+    assert script.summary().endswith(", 1 failed, 2 rows selected")
+    # Neither the selected rows nor the messages of the statements are printed
+    assert capsys.readouterr().out == ""
+    assert session.run("SELECT id FROM t") == [[1], [2], [3]]
+
+
+def test_verbose_script(session, capsys):
+    script = runner(session, verbose=True)
+    assert script.run(SCRIPT.splitlines()[:6])
+    out = capsys.readouterr().out
+    assert "Table t created" in out and "Succesfully inserted row into t" in out
+    assert script.summary().startswith("Executed 3 statements in ")
+
+
+@pytest.mark.parametrize("options", [{"stop_on_error": True}, {"single_lock": True}])
+def test_script_stops_at_first_error(session, options):
+    script = runner(session, **options)
+    assert not script.run(SCRIPT.splitlines())
+    assert (script.statements, script.failed) == (4, 1)
+    # The statements before the error are not rolled back
+    assert session.run("SELECT id FROM t") == [[1], [2]]
+
+
+def test_single_lock(session, database_name, monkeypatch):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    other = Database(database_name, workers=1)
+    inserted = threading.Event()
+    script = runner(session, single_lock=True)
+
+    def insert():
+        Executor(other).execute(3, "t", ["100", "x"])
+        inserted.set()
+
+    thread = threading.Thread(target=insert)
+
+    def lines():
+        yield "INSERT INTO t VALUES 1 a"
+        thread.start()
+        # The statement of the other database waits until the script ends
+        assert not inserted.wait(0.3)
+        yield "INSERT INTO t VALUES 2 b"
+
+    commits = []
+    file_manager = session.db.file_manager
+    commit = file_manager.commit
+
+    def spy():
+        commits.append(1)
+        commit()
+
+    monkeypatch.setattr(file_manager, "commit", spy)
+    try:
+        assert script.run(lines())
+        assert commits == [1]
+        thread.join(timeout=30)
+        assert inserted.is_set()
+    finally:
+        other.close()
+    assert session.run("SELECT id FROM t") == [[1], [2], [100]]
+
+
+def test_dropped_database(session):
+    script = runner(session)
+    assert not script.run(["CREATE TABLE t id int PRIMARY_KEY id", "DROP DATABASE", "SELECT * FROM t"])
+    assert script.dropped and script.statements == 2
+
+
+def test_main(database_name, tmp_path):
+    path = tmp_path / "load.sql"
+    path.write_text(SCRIPT, encoding="utf-8")
+    main = [sys.executable, os.path.join(ROOT, "CLI", "main.py"), "-d", database_name]
+    result = subprocess.run(main + ["-f", str(path)], capture_output=True, text=True, cwd=ROOT, timeout=120)
+    assert result.returncode == 1
+    assert result.stderr == "Error on line 7: Duplicate primary key 1\n"
+    assert result.stdout.startswith("Executed 6 statements in ")
+    # A script piped to the standard input, under one lock with one commit
+    result = subprocess.run(main + ["--single-lock"], input="INSERT INTO t VALUES 4 e\nSELECT * FROM t\n",
+                            capture_output=True, text=True, cwd=ROOT, timeout=120)
+    assert result.returncode == 0 and "4 rows selected" in result.stdout
@@ -0,0 +1,101 @@
+"""
+test_benchmarks.py
+
+Tests of the benchmark suite on small tables.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.suite import BenchmarkSuite, SizeBenchmark, compare, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ["bulk_insert", "startup", "point_select", "range_select", "full_scan", "single_insert", "update",
+              "delete"]
+
+
+@pytest.mark.parametrize("values, p, expected", [
+    ([], 50, 0.0),
+    ([1.0], 99, 1.0),
+    ([1.0, 2.0, 3.0, 4.0], 50, 2.0),
+    ([1.0, 2.0, 3.0, 4.0], 95, 4.0),
+    ([float(i) for i in range(1, 101)], 99, 99.0),
+    ([1.0, 2.0], 0, 1.0),
+])
+def test_percentile(values, p, expected):
+    assert percentile(values, p) == expected
+
+
+@pytest.mark.parametrize("sizes, operations, message", [
+    ([], 10, "at least one row"),
+    ([10, 0], 10, "at least one row"),
+    ([10], 0, "at least one statement"),
+])
+def test_invalid_suite(sizes, operations, message):
+    with pytest.raises(ValueError, match=message):
+        BenchmarkSuite(sizes, operations)
+
+
+def test_size_benchmark(monkeypatch):
+    monkeypatch.setattr(BenchmarkSuite, "BATCH_SIZE", 40)
+    suite = BenchmarkSuite([130], 7, seed=3, workers=1)
+    benchmark = SizeBenchmark(suite, 130)
+    result = benchmark.run()
+    assert result["rows"] == 130 and list(result["operations"]) == OPERATIONS
+    counts = {name: operation["statements"] for name, operation in result["operations"].items()}
+    assert counts == {"bulk_insert": 4, "startup": BenchmarkSuite.STARTUP_REPEATS, "point_select": 7,
+                      "range_select": 7, "full_scan": 3, "single_insert": 7, "update": 7, "delete": 7}
+    assert result["operations"]["bulk_insert"]["rows_per_second"] > 0
+    latency = result["operations"]["point_select"]["latency_ms"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    # The selected rows are read, and the database is dropped at the end
+    assert benchmark.selected >= 7 + 7 * BenchmarkSuite.RANGE_WIDTH
+    assert benchmark.next_id == 130 + 7
+    assert not os.path.exists(os.path.join("data", benchmark.db_name))
+
+
+def test_same_seed_same_statements():
+    suite = BenchmarkSuite([50], 5, seed=11)
+    first, second = SizeBenchmark(suite, 50), SizeBenchmark(suite, 50)
+    assert [first.row() for _ in range(3)] == [second.row() for _ in range(3)]
+    assert first.random_ids(20) == second.random_ids(20)
+    assert all(0 <= i < 10 for i in first.random_ids(20, 10))
+
+
+def results(p50: dict) -> dict:
+    return {"sizes": {size: {"operations": {name: {"latency_ms": {"p50": value}} for name, value in operations.items()}}
+                      for size, operations in p50.items()}}
+
+
+def test_compare():
+    baseline = results({"100": {"point_select": 1.0, "update": 2.0, "delete": 0.0}})
+    new = results({"100": {"point_select": 1.1, "update": 3.0, "delete": 5.0, "full_scan": 9.0},
+                   "1000": {"point_select": 50.0}})
+    regressions = compare(baseline, new)
+    assert regressions == ["update on 100 rows: median latency 2.000 ms -> 3.000 ms (+50%)"]
+    assert compare(baseline, new, tolerance=0.05) == [
+        "point_select on 100 rows: median latency 1.000 ms -> 1.100 ms (+10%)", regressions[0]]
+    assert compare(baseline, new, tolerance=1.0) == []
+
+
+def test_main(tmp_path):
+    output, baseline = tmp_path / "results.json", tmp_path / "baseline.json"
+    # Every operation of the baseline is much slower, so nothing regressed
+    baseline.write_text(json.dumps(results({"20": {name: 1e9 for name in OPERATIONS}})), encoding="utf-8")
+    command = [sys.executable, "-m", "benchmarks", "--rows", "20", "--operations", "3", "--workers", "1",
+               "-o", str(output), "--baseline", str(baseline)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert "20 rows" in result.stdout and result.stdout.rstrip().endswith("No regressions")
+    saved = json.loads(output.read_text(encoding="utf-8"))
+    assert saved["operations"] == 3 and saved["options"] == {"storage": "csv", "wal": False, "workers": 1}
+    assert list(saved["sizes"]["20"]["operations"]) == OPERATIONS
+    # Against results that are much faster, every operation regressed
+    baseline.write_text(json.dumps(results({"20": {name: 1e-9 for name in OPERATIONS}})), encoding="utf-8")
+    result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, timeout=300)
+    assert result.returncode == 1
+    assert result.stdout.count("Regression: ") == len(OPERATIONS)
@@ -0,0 +1,112 @@
+"""
+test_cache.py
+
+Tests of the tables kept in memory and of the caches of recently used values.
+"""
+
+import pytest
+
+from dbms.cache import LRUCache, TableCache
+from dbms.storage import CsvStorage
+
+
+def rows(count: int) -> list:
+    return [[i, f"name{i}"] for i in range(count)]
+
+
+def test_least_recently_used_table_is_evicted():
+    size = TableCache.estimate_size(rows(100))
+    cache = TableCache(size * 2 + size // 2)
+    cache.put("a", rows(100), 1)
+    cache.put("b", rows(100), 1)
+    assert cache.get("a", 1) is not None
+    cache.put("c", rows(100), 1)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.used <= cache.budget
+
+
+def test_tables_larger_than_the_budget_are_not_cached():
+    cache = TableCache(TableCache.estimate_size(rows(10)))
+    cache.put("a", rows(1000), 1)
+    assert cache.get("a", 1) is None and cache.used == 0
+    # Collected rows are dropped as soon as they do not fit
+    assert list(cache.collect("a", iter(rows(5000)), 1)) == rows(5000)
+    assert cache.get("a", 1) is None
+    assert list(cache.collect("b", iter(rows(3)), 1)) == rows(3)
+    assert cache.get("b", 1) == rows(3)
+
+
+def test_changed_table_is_not_served():
+    cache = TableCache(1 << 20)
+    cache.put("a", rows(3), (1, 100))
+    assert cache.get("a", (1, 120)) is None
+    assert "a" not in cache.entries and cache.used == 0
+
+
+def test_appended_rows_are_cached():
+    cache = TableCache(1 << 20)
+    cache.put("a", rows(3), 1)
+    cache.append("a", [3, "name3"], 2)
+    assert cache.get("a", 2) == rows(4)
+    cache.append("b", [0, "x"], 2)
+    assert "b" not in cache.entries
+
+
+def test_invalid_cache_size():
+    with pytest.raises(ValueError, match="Invalid cache size"):
+        TableCache(-1)
+
+
+def test_lru_cache_capacity():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """
+    Returns the number of times the rows of a text table file are read from then on.
+    """
+    reads = []
+    for name in ("iter_rows", "read_rows", "read_blocks", "load"):
+        method = getattr(CsvStorage, name)
+
+        def spy(storage, *args, method=method, **kwargs):
+            reads.append(storage.table_name)
+            return method(storage, *args, **kwargs)
+
+        monkeypatch.setattr(CsvStorage, name, spy)
+    return reads
+
+
+def test_cached_table_is_read_from_memory(open_session, reads):
+    session = open_session(vectorized=False)
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES " + ", ".join(f"{i} n{i}" for i in range(50)))
+    assert len(session.run("SELECT * FROM t")) == 50
+    assert session.db.file_manager.is_cached("t")
+    reads.clear()
+    assert session.run("SELECT name FROM t WHERE id > 47") == [["n48"], ["n49"]]
+
+    # Inserted rows are added to the cached rows
+    session.run("INSERT INTO t VALUES 50 n50")
+    assert session.run("SELECT name FROM t WHERE id > 48") == [["n49"], ["n50"]]
+    assert reads == []
+
+    # Updated and deleted rows are read from the table file again
+    session.run("UPDATE t SET name x WHERE id == 1")
+    session.run("DELETE FROM t WHERE id == 2")
+    assert session.run("SELECT name FROM t WHERE id < 3") == [["n0"], ["x"]]
+    assert reads
+
+
+def test_disabled_cache(open_session):
+    session = open_session(cache_size=0, vectorized=False)
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a")
+    assert session.run("SELECT * FROM t") == [[1, "a"]]
+    assert not session.db.file_manager.is_cached("t")
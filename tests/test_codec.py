@@ -0,0 +1,92 @@
+"""
+test_codec.py
+
+Tests of the conversion of rows between text and the data types of their table.
+"""
+
+import pytest
+
+from dbms.codec import RowCodec
+
+CODEC = RowCodec(["int", "str", "float"])
+
+
+def test_decode():
+    assert CODEC.decode(["1", "a", "2.5"]) == [1, "a", 2.5]
+    assert CODEC.decode([1, "a", 2]) == [1, "a", 2.0]
+
+
+@pytest.mark.parametrize("values", [["1", "a"], ["1", "a", "2", "3"], ["x", "a", "2"], ["1", "a", None]])
+def test_decode_invalid_rows(values):
+    with pytest.raises(ValueError, match="Bad input values"):
+        CODEC.decode(values)
+
+
+def test_unknown_data_type():
+    codec = RowCodec(["int", "date"])
+    with pytest.raises(ValueError, match="Bad input values"):
+        codec.decode(["1", "2024-01-01"])
+
+
+def test_decode_rows_in_batches(monkeypatch):
+    monkeypatch.setattr(RowCodec, "BATCH_SIZE", 3)
+    rows = [[str(i), f"n{i}", str(i / 2)] for i in range(10)]
+    assert list(CODEC.decode_rows(iter(rows))) == [[i, f"n{i}", i / 2] for i in range(10)]
+
+    # Rows are only yielded once their batch is converted
+    decoded = CODEC.decode_rows(rows[:4] + [["x", "bad", "0"]])
+    assert [next(decoded) for _ in range(3)] == [[i, f"n{i}", i / 2] for i in range(3)]
+    with pytest.raises(ValueError, match="Bad input values"):
+        next(decoded)
+
+
+def test_decode_rows_rejects_line_breaks():
+    with pytest.raises(ValueError, match="line breaks"):
+        list(CODEC.decode_rows([["1", "a\nb", "0"]]))
+
+
+def test_decode_values():
+    columns = ["id", "name", "score"]
+    assert CODEC.decode_values({"score": "1", "id": "2"}, columns) == {"score": 1.0, "id": 2}
+    for values in ({"height": "1"}, {"id": "x"}, {"name": "a\rb"}):
+        with pytest.raises(ValueError):
+            CODEC.decode_values(values, columns)
+
+
+@pytest.mark.parametrize("row", [
+    [1, "a", 0.5],
+    [2, "a|b", 1.0],
+    [3, 'say "hi"', -2.25],
+    [4, "", 0.0],
+    [5, "'quoted, value'", 1e-07],
+])
+def test_lines_round_trip(row):
+    line = CODEC.encode_line(row)
+    assert line.endswith(b"\r\n") and line.count(b"\n") == 1
+    assert CODEC.decode_line(line) == row
+
+
+def test_single_empty_value_is_quoted():
+    codec = RowCodec(["str"])
+    assert codec.encode_line([""]) == b'""\r\n'
+    assert codec.decode_line(b'""\r\n') == [""]
+
+
+def test_encode_rejects_line_breaks():
+    with pytest.raises(ValueError, match="line breaks"):
+        CODEC.encode_line([1, "a\nb", 0.0])
+
+
+def test_codec_is_rebuilt_when_schema_changes(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    file_manager = session.db.file_manager
+    codec = file_manager.codec("t")
+    session.run("INSERT INTO t VALUES 1 a")
+    assert file_manager.codec("t") is codec
+    assert session.db.tables["t"].file_manager.codec("t") is codec
+
+    session.run("DROP TABLE t")
+    session.run("CREATE TABLE t id int score float PRIMARY_KEY id")
+    assert file_manager.codec("t").data_types == ("int", "float")
+    session.run("INSERT INTO t VALUES 1 2")
+    assert session.run("SELECT * FROM t") == [[1, 2.0]]
@@ -0,0 +1,208 @@
+"""
+test_condition.py
+
+Tests of the WHERE conditions, evaluated row by row and on NumPy arrays.
+"""
+
+import pytest
+
+from dbms.condition import Condition
+from dbms.table import Table
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The conditions evaluated on arrays need NumPy.
+requires_numpy = pytest.mark.skipif(np is None, reason="NumPy is not installed")
+
+CONDITIONS = [
+    "True", "False", "not True", "not False",
+    "id > 2", "not id > 2", "id >= 2 and score < 3.5", "id == 1 or name == 'c'", "not (id == 2 or id == 4)",
+    "True and id < 3", "False or id == 4", "1 < 2", "2 < 1", "not 2 < 1",
+    "name in ('a', 'd')", "id not in (1, 2)", "1 <= id < 4", "id BETWEEN 2 AND 3",
+]
+
+COLUMNS = ["id", "name", "score"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("id > 2", [False, False, True]),
+    ("name == 'b' or score < 1.0", [True, True, False]),
+    ("not (id == 1 or id == 3)", [False, True, False]),
+    ("1 < id <= 2", [False, True, False]),
+    ("id BETWEEN 2 AND 3", [False, True, True]),
+    ("name in ('a', 'c')", [True, False, True]),
+    ("id > -1 and name != 'z'", [True, True, True]),
+])
+def test_predicate(text, expected):
+    rows = [[1, "a", 0.5], [2, "b", 1.5], [3, "c", 2.5]]
+    condition = Condition(text, COLUMNS)
+    assert [condition(row) for row in rows] == expected
+
+
+def test_between_on_qualified_column():
+    condition = Condition("e.salary BETWEEN 2 AND 5 and id == 1", ["e.id", "e.salary"], {"id": "e.id"})
+    assert condition.text == "2 <= e.salary <= 5 and id == 1"
+    assert [condition([1, salary]) for salary in (1, 2, 5, 6)] == [False, True, True, False]
+
+
+def test_columns_are_resolved_to_positions():
+    condition = Condition("score > 1 and t.id == 2", ["t.id", "name", "score"], {"id": "t.id"})
+    assert condition.used_columns == [0, 2]
+    assert condition([2, "b", 1.5]) and not condition([2, "b", 0.5])
+    assert Condition("id == 2", ["t.id", "name"], {"id": "t.id"})([2, "x"])
+
+
+@pytest.mark.parametrize("text, message", [
+    ("__import__('os')", "Invalid condition"),
+    ("id.real > 1", "Unknown column"),
+    ("id + 1 > 2", "Invalid condition"),
+    ("age > 1", "Unknown column 'age'"),
+    ("id", "does not return a boolean"),
+    ("id >", "Invalid condition"),
+    ("-id < 2", "Invalid condition"),
+])
+def test_invalid_conditions(text, message):
+    with pytest.raises(ValueError, match=message):
+        Condition(text, COLUMNS)
+
+
+def test_compiled_conditions_are_reused():
+    assert Condition.compiled("id > 41", COLUMNS) is Condition.compiled("id > 41", COLUMNS)
+    assert Condition.compiled("id > 41", COLUMNS) is not Condition.compiled("id > 41", ["id"])
+
+
+def test_condition_is_compiled_once_per_statement(session, monkeypatch):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES " + ", ".join(f"{i} n{i}" for i in range(200)))
+    compiled = []
+    init = Condition.__init__
+
+    def spy(condition, *args, **kwargs):
+        compiled.append(args[0])
+        init(condition, *args, **kwargs)
+
+    monkeypatch.setattr(Condition, "__init__", spy)
+    monkeypatch.setattr(Condition, "CACHE", type(Condition.CACHE)(16))
+    assert session.run("SELECT id FROM t WHERE id > 197") == [[198], [199]]
+    session.run("UPDATE t SET name x WHERE id >= 100")
+    session.run("DELETE FROM t WHERE id < 50")
+    assert compiled == ["id > 197", "id >= 100", "id < 50"]
+    assert session.run("SELECT COUNT(*) FROM t WHERE name == 'x'") == [[100]]
+
+
+@pytest.fixture
+def sessions(open_session):
+    """
+    Returns sessions on two databases with the same table, evaluating conditions on arrays and row by row.
+    """
+    sessions = {}
+    for vectorized in (True, False):
+        # Without a cache every SELECT scans the table file, which may be evaluated on arrays
+        session = open_session("_vectorized" if vectorized else "_rows", vectorized=vectorized, cache_size=0)
+        session.run("CREATE TABLE s id int name str score float PRIMARY_KEY id")
+        session.run("INSERT INTO s VALUES 1 a 1.5, 2 b 2.5, 3 c 3.5, 4 d 4.5")
+        sessions[vectorized] = session
+    return sessions
+
+
+@requires_numpy
+@pytest.mark.parametrize("condition", CONDITIONS)
+def test_vectorized_and_row_conditions_agree(sessions, monkeypatch, condition):
+    masks = []
+    select_vectorized = Table.select_vectorized
+
+    def spy(table, indices, condition):
+        rows = select_vectorized(table, indices, condition)
+        masks.append(rows is not None)
+        return rows
+
+    monkeypatch.setattr(Table, "select_vectorized", spy)
+    vectorized = sessions[True].run(f"SELECT id FROM s WHERE {condition}")
+    rows = sessions[False].run(f"SELECT id FROM s WHERE {condition}")
+    assert masks == [True]
+    expected = [[i] for i in range(1, 5) if Condition(condition, ["id", "name", "score"])([i, "abcd"[i - 1], i + 0.5])]
+    assert vectorized == rows == expected
+
+
+@requires_numpy
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_incomparable_values_raise_value_error(sessions, vectorized):
+    with pytest.raises(ValueError, match="Error evaluating the condition"):
+        sessions[vectorized].run("SELECT id FROM s WHERE name > 5")
+
+
+@requires_numpy
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_in_needs_a_container(sessions, vectorized):
+    for text in ("id in 5", "id not in 2.5"):
+        with pytest.raises(ValueError, match="Error evaluating the condition"):
+            sessions[vectorized].run(f"SELECT id FROM s WHERE {text}")
+    # A str on the right is searched for the value, as row by row
+    assert sessions[vectorized].run("SELECT id FROM s WHERE 'c' in name") == [[3]]
+
+
+@requires_numpy
+def test_mask_rejects_in_without_container():
+    arrays = [np.array([1, 2, 3])]
+    with pytest.raises(ValueError, match="cannot be evaluated on arrays"):
+        Condition("id in 2", ["id"]).mask(arrays, 3)
+    assert Condition("id in [2, 3]", ["id"]).mask(arrays, 3).tolist() == [False, True, True]
+
+
+@requires_numpy
+def test_mask_is_boolean():
+    arrays = [np.array([1, 2, 3])]
+    for text in ("not True", "not False", "not 1 > 2"):
+        mask = Condition(text, ["id"]).mask(arrays, 3)
+        assert mask.dtype == np.bool_
+        assert mask.tolist() == [Condition(text, ["id"])([i]) for i in (1, 2, 3)]
+
+
+@requires_numpy
+def test_cached_table_is_evaluated_on_arrays(open_session, monkeypatch):
+    session = open_session()
+    session.run("CREATE TABLE s id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO s VALUES 1 a, 2 b, 3 c")
+    calls = []
+    select_vectorized = Table.select_vectorized
+
+    def spy(table, indices, condition):
+        rows = select_vectorized(table, indices, condition)
+        calls.append(rows is not None)
+        return rows
+
+    monkeypatch.setattr(Table, "select_vectorized", spy)
+    for _ in range(2):
+        assert session.run("SELECT name FROM s WHERE id >= 2") == [["b"], ["c"]]
+    assert calls == [True, True]
+    assert sorted(session.db.file_manager.cache.entries["s"][3]) == [0, 1]
+
+    # An inserted row is added to the cached rows, and the arrays are built again
+    session.run("INSERT INTO s VALUES 4 d")
+    assert session.run("SELECT name FROM s WHERE id >= 2") == [["b"], ["c"], ["d"]]
+
+
+@requires_numpy
+@pytest.mark.parametrize("storage", ["csv", "columnar"])
+def test_vectorized_projection(open_session, monkeypatch, storage):
+    session = open_session(cache_size=0)
+    session.run(f"CREATE TABLE s id int name str score float PRIMARY_KEY id STORAGE {storage}")
+    session.run("INSERT INTO s VALUES " + ", ".join(f"{i} n{i} {i / 4}" for i in range(100)))
+    calls = []
+    select_vectorized = Table.select_vectorized
+
+    def spy(table, indices, condition):
+        rows = select_vectorized(table, indices, condition)
+        calls.append(rows is not None)
+        return rows
+
+    monkeypatch.setattr(Table, "select_vectorized", spy)
+    assert session.run("SELECT score name FROM s WHERE id >= 97") == [[24.25, "n97"], [24.5, "n98"], [24.75, "n99"]]
+    assert session.run("SELECT * FROM s WHERE score == 0.5") == [[2, "n2", 0.5]]
+    assert session.run("SELECT name FROM s") == [[f"n{i}"] for i in range(100)]
+    # A LIMIT stops reading rows as soon as it is reached instead
+    assert session.run("SELECT name FROM s LIMIT 1") == [["n0"]]
+    assert calls == [True, True, True]
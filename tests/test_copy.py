@@ -0,0 +1,97 @@
+"""
+test_copy.py
+
+Tests of the bulk loading of rows with COPY and multi-row INSERT statements.
+"""
+
+import pytest
+
+from dbms.file_manager import DatabaseFileManager
+from dbms.parser import Parser
+
+
+@pytest.fixture
+def appends(monkeypatch):
+    """
+    Returns the number of rows of each append to a table file from then on.
+    """
+    appends = []
+    insert_rows = DatabaseFileManager.insert_rows
+
+    def spy(file_manager, table_name, rows, *args, **kwargs):
+        rows = list(rows)
+        appends.append(len(rows))
+        return insert_rows(file_manager, table_name, rows, *args, **kwargs)
+
+    monkeypatch.setattr(DatabaseFileManager, "insert_rows", spy)
+    return appends
+
+
+@pytest.fixture
+def people(tmp_path):
+    """
+    Returns the path to a comma separated file of 5000 people with a header line.
+    """
+    path = tmp_path / "people.csv"
+    lines = ["id,name,score"] + [f"{i},p{i},{i / 4}" for i in range(5000)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_parse_copy():
+    assert Parser("COPY t FROM 'rows.csv'").parse() == (11, "t", {"file": "rows.csv", "header": False})
+    assert Parser('COPY t FROM "rows.csv" header').parse() == (11, "t", {"file": "rows.csv", "header": True})
+
+
+@pytest.mark.parametrize("statement", ["COPY t FROM", "COPY t INTO rows.csv", "COPY t FROM rows.csv WITH"])
+def test_invalid_copy(statement):
+    with pytest.raises(ValueError, match="Invalid command"):
+        Parser(statement).parse()
+
+
+@pytest.mark.parametrize("storage", ["csv", "columnar"])
+def test_copy_in_one_append(open_session, people, appends, storage):
+    session = open_session()
+    session.run(f"CREATE TABLE people id int name str score float PRIMARY_KEY id STORAGE {storage}")
+    session.run(f"COPY people FROM '{people}' HEADER")
+    assert appends == [5000]
+    assert session.run("SELECT COUNT(*) FROM people") == [[5000]]
+    assert session.run("SELECT * FROM people WHERE id == 4999") == [[4999, "p4999", 1249.75]]
+
+
+def test_multi_row_insert_in_one_append(session, appends):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES " + ", ".join(f"{i} n{i}" for i in range(1000)))
+    assert appends == [1000]
+    assert session.run("SELECT COUNT(*) FROM t") == [[1000]]
+
+
+@pytest.mark.parametrize("lines, message", [
+    (["1,a,1.0", "2,b,x"], "Bad input values"),
+    (["1,a,1.0", "2,b"], "Bad input values"),
+    (["1,a,1.0", "1,b,2.0"], "Duplicate primary key 1"),
+    (["5,a,1.0"], "Duplicate primary key 5"),
+])
+def test_rejected_copy_inserts_nothing(session, tmp_path, lines, message):
+    session.run("CREATE TABLE people id int name str score float PRIMARY_KEY id")
+    session.run("INSERT INTO people VALUES 5 e 0.5")
+    path = tmp_path / "rows.csv"
+    path.write_text("\n".join(lines) + "\n")
+    with pytest.raises(ValueError, match=message):
+        session.run(f"COPY people FROM '{path}'")
+    assert session.run("SELECT * FROM people") == [[5, "e", 0.5]]
+
+
+def test_rejected_multi_row_insert_inserts_nothing(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    with pytest.raises(ValueError, match="Bad input values"):
+        session.run("INSERT INTO t VALUES 1 a, x b")
+    assert session.run("SELECT * FROM t") == []
+
+
+def test_copy_errors(session, tmp_path):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    with pytest.raises(ValueError, match="not found"):
+        session.run(f"COPY t FROM '{tmp_path / 'missing.csv'}'")
+    with pytest.raises(ValueError, match="Table not found"):
+        session.run(f"COPY nobody FROM '{tmp_path / 'missing.csv'}'")
@@ -0,0 +1,158 @@
+"""
+test_index.py
+
+Tests of the primary key index and of the secondary indexes.
+"""
+
+import os
+
+import pytest
+
+from dbms.condition import Condition
+from dbms.file_manager import DatabaseFileManager
+from dbms.planner import Planner
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """
+    Returns the names of the tables whose files are scanned from then on.
+    """
+    scans = []
+    scan_rows = DatabaseFileManager.scan_rows
+
+    def spy(file_manager, table_name, *args, **kwargs):
+        scans.append(table_name)
+        return scan_rows(file_manager, table_name, *args, **kwargs)
+
+    monkeypatch.setattr(DatabaseFileManager, "scan_rows", spy)
+    return scans
+
+
+@pytest.fixture
+def users(open_session):
+    """
+    Returns a session on a table of 100 users without a cache, so statements read the table files.
+    """
+    session = open_session(cache_size=0)
+    session.run("CREATE TABLE users id int name str age int PRIMARY_KEY id")
+    session.run("INSERT INTO users VALUES " + ", ".join(f"{i} u{i} {i % 50}" for i in range(100)))
+    return session
+
+
+def plan(session, text: str):
+    table = session.db.tables["users"]
+    return table.plan(Condition(text, table.metadata["columns"]))
+
+
+def test_primary_key_lookup(users, scans):
+    assert plan(users, "id == 42").access == Planner.PRIMARY_KEY
+    assert users.run("SELECT name FROM users WHERE id == 42") == [["u42"]]
+    assert users.run("SELECT name FROM users WHERE 7 == id and age > 0") == [["u7"]]
+    assert scans == []
+    assert users.run("SELECT name FROM users WHERE id == 420") == []
+
+
+def test_duplicate_primary_keys_are_rejected(users):
+    with pytest.raises(ValueError, match="Duplicate primary key 5"):
+        users.run("INSERT INTO users VALUES 5 again 1")
+    # A multi-row insert is rejected as a whole, whether the key is in the table or repeated in the rows
+    with pytest.raises(ValueError, match="Duplicate primary key 3"):
+        users.run("INSERT INTO users VALUES 100 a 1, 3 b 2")
+    with pytest.raises(ValueError, match="Duplicate primary key 101"):
+        users.run("INSERT INTO users VALUES 101 a 1, 101 b 2")
+    with pytest.raises(ValueError, match="Duplicate primary key 2"):
+        users.run("UPDATE users SET id 2 WHERE id == 1")
+    assert users.run("SELECT COUNT(*) FROM users") == [[100]]
+    assert users.run("SELECT name FROM users WHERE id == 5") == [["u5"]]
+
+
+def test_index_follows_updates_and_deletes(users):
+    users.run("UPDATE users SET id 500 WHERE id == 1")
+    users.run("DELETE FROM users WHERE id == 2")
+    users.run("INSERT INTO users VALUES 2 new 3")
+    assert users.run("SELECT name FROM users WHERE id == 1") == []
+    assert users.run("SELECT name FROM users WHERE id == 500") == [["u1"]]
+    assert users.run("SELECT name FROM users WHERE id == 2") == [["new"]]
+
+
+def test_index_is_kept_and_rebuilt(open_session, users):
+    path = users.db.file_manager.file_path + "users.pk"
+    users.db.close()
+    assert os.path.exists(path)
+    session = open_session(cache_size=0)
+    assert session.run("SELECT name FROM users WHERE id == 99") == [["u99"]]
+    session.db.close()
+
+    # A missing index is rebuilt from the table
+    os.remove(path)
+    session = open_session(cache_size=0)
+    assert session.run("SELECT name FROM users WHERE id == 99") == [["u99"]]
+    with pytest.raises(ValueError, match="Duplicate primary key 99"):
+        session.run("INSERT INTO users VALUES 99 again 1")
+
+
+RANGES = ["age == 42", "age < 3", "age <= 3", "age > 995", "age >= 995", "age BETWEEN 10 AND 12", "12 >= age > 9",
+          "age > 10 and age < 5", "age == 42 and id > 0"]
+
+
+@pytest.fixture
+def ages(open_session):
+    """
+    Returns a session on a table of 1000 users with an index on their ages and its statistics, without a cache.
+    """
+    session = open_session(cache_size=0)
+    session.run("CREATE TABLE users id int name str age int PRIMARY_KEY id")
+    session.run("INSERT INTO users VALUES " + ", ".join(f"{i} u{i} {i * 7 % 1000}" for i in range(1000)))
+    session.run("CREATE INDEX users_age ON users age")
+    session.run("ANALYZE users")
+    return session
+
+
+def expected_ids(session, text: str) -> list:
+    condition = Condition(text, ["id", "age"])
+    return sorted([row[0]] for row in session.run("SELECT id age FROM users") if condition(row))
+
+
+@pytest.mark.parametrize("text", RANGES)
+def test_index_range_scan(ages, scans, text):
+    expected = expected_ids(ages, text)
+    scans.clear()
+    assert plan(ages, text).access == Planner.INDEX_RANGE
+    assert sorted(ages.run(f"SELECT id FROM users WHERE {text}")) == expected
+    assert scans == []
+
+
+def test_wide_range_is_scanned(ages):
+    assert plan(ages, "age > 5").access == Planner.FULL_SCAN
+
+
+def test_index_follows_changes(ages):
+    ages.run("UPDATE users SET age 5000 WHERE id < 10")
+    ages.run("DELETE FROM users WHERE age BETWEEN 100 AND 200")
+    ages.run("INSERT INTO users VALUES 1000 new 150, 1001 other 5001")
+    index = ages.db.file_manager.secondary_index("users", "users_age")
+    assert len(index.range(5000)) == 11
+    assert len(index.range(100, True, 200, True)) == 1
+    assert len(index) == 1000 - 101 + 2
+    for text in ("age >= 5000", "age BETWEEN 100 AND 200", "age == 0", "age < 3"):
+        assert sorted(ages.run(f"SELECT id FROM users WHERE {text}")) == expected_ids(ages, text)
+    assert sorted(ages.run("SELECT id FROM users WHERE age >= 5000")) == [[i] for i in range(10)] + [[1001]]
+
+
+def test_index_is_kept(open_session, ages):
+    ages.db.close()
+    session = open_session(cache_size=0)
+    assert session.db.get_info_table("users")["indexes"] == {"users_age": "age"}
+    assert plan(session, "age == 42").access == Planner.INDEX_RANGE
+    assert session.run("SELECT id FROM users WHERE age == 42") == [[6]]
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("CREATE INDEX users_age ON users name", "Index already exists"),
+    ("CREATE INDEX other ON users height", "Column height not found"),
+    ("CREATE INDEX other ON nobody age", "Table not found"),
+])
+def test_invalid_indexes(ages, statement, message):
+    with pytest.raises(ValueError, match=message):
+        ages.run(statement)
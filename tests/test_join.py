@@ -0,0 +1,116 @@
+"""
+test_join.py
+
+Tests of the joins of two tables: hash joins, primary key lookups and partitions spilled to disk.
+"""
+
+import os
+
+import pytest
+
+from dbms.join import Join
+
+
+@pytest.fixture
+def company(session):
+    """
+    Returns a session with departments d and employees e, whose dept column references d.
+    """
+    session.run("CREATE TABLE d id int name str PRIMARY_KEY id")
+    session.run("CREATE TABLE e id int dept int salary int PRIMARY_KEY id FOREIGN_KEY dept d.id")
+    session.run("INSERT INTO d VALUES 1 x, 2 y, 3 z")
+    session.run("INSERT INTO e VALUES 1 1 3, 2 2 7, 3 1 5, 4 2 1, 5 9 4")
+    return session
+
+
+def test_between_on_qualified_column(company):
+    rows = company.run("SELECT e.id d.name FROM e JOIN d ON e.dept == d.id WHERE e.salary BETWEEN 1 AND 5")
+    assert sorted(rows) == [[1, "x"], [3, "x"], [4, "y"]]
+    rows = company.run("SELECT e.id FROM e JOIN d ON e.dept == d.id WHERE d.id BETWEEN 2 AND 3")
+    assert sorted(rows) == [[2], [4]]
+
+
+def test_join(company):
+    rows = company.run("SELECT * FROM e JOIN d ON e.dept == d.id")
+    # Employee 5 has no department
+    assert sorted(rows) == [[1, 1, 3, 1, "x"], [2, 2, 7, 2, "y"], [3, 1, 5, 1, "x"], [4, 2, 1, 2, "y"]]
+    rows = company.run("SELECT name salary FROM d JOIN e ON d.id == e.dept WHERE salary > 2")
+    assert sorted(rows) == [["x", 3], ["x", 5], ["y", 7]]
+
+
+def test_join_on_foreign_key(company):
+    assert sorted(company.run("SELECT e.id name FROM d JOIN e")) == [[1, "x"], [2, "y"], [3, "x"], [4, "y"]]
+
+
+def test_join_with_clauses(company):
+    rows = company.run("SELECT d.name, COUNT(*), SUM(salary) FROM e JOIN d ON e.dept == d.id GROUP BY d.name")
+    assert sorted(rows) == [["x", 2, 8], ["y", 2, 8]]
+    rows = company.run("SELECT e.id FROM e JOIN d ON e.dept == d.id ORDER BY salary DESC LIMIT 2 OFFSET 1")
+    assert rows == [[3], [1]]
+
+
+@pytest.fixture
+def sides(monkeypatch):
+    """
+    Returns the join methods used from then on and the build keys of the hash joins.
+    """
+    sides = []
+    for name in ("hash_join", "partitioned_join", "index_join"):
+        method = getattr(Join, name)
+
+        def spy(join, rows, key, *args, name=name, method=method):
+            sides.append((name, key))
+            return method(join, rows, key, *args)
+
+        monkeypatch.setattr(Join, name, spy)
+    return sides
+
+
+@pytest.fixture
+def orders(session):
+    """
+    Returns a session with 20 users and 2000 orders, whose user column references users.
+    """
+    session.run("CREATE TABLE users id int name str PRIMARY_KEY id")
+    session.run("CREATE TABLE orders id int user int total int PRIMARY_KEY id FOREIGN_KEY user users.id")
+    session.run("INSERT INTO users VALUES " + ", ".join(f"{i} u{i}" for i in range(20)))
+    session.run("INSERT INTO orders VALUES " + ", ".join(f"{i} {i % 25} {i}" for i in range(2000)))
+    return session
+
+
+def expected_orders():
+    return sorted([i, f"u{i % 25}"] for i in range(2000) if i % 25 < 20)
+
+
+def test_smaller_table_is_the_build_side(orders, sides):
+    assert sorted(orders.run("SELECT orders.id name FROM orders JOIN users ON orders.user == users.id")) \
+        == expected_orders()
+    # The users are hashed by their id, at position 0, and the orders are streamed through them
+    assert sides == [("hash_join", 0)]
+
+
+def test_small_table_looks_up_primary_key(orders, sides):
+    rows = orders.run("SELECT users.id total FROM users JOIN orders ON users.id == orders.id WHERE users.id < 3")
+    assert sorted(rows) == [[0, 0], [1, 1], [2, 2]]
+    assert sides == [("index_join", 0)]
+
+
+def test_large_build_side_spills_to_partitions(orders, sides, monkeypatch):
+    monkeypatch.setattr(Join, "MEMORY_LIMIT", 0)
+    monkeypatch.setattr(Join, "BATCH_SIZE", 5)
+    assert sorted(orders.run("SELECT orders.id name FROM orders JOIN users ON orders.user == users.id")) \
+        == expected_orders()
+    assert [name for name, _ in sides] == ["hash_join", "partitioned_join"]
+    assert not [path for path in os.listdir(orders.db.file_manager.file_path) if path.startswith("tmp")]
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("SELECT * FROM d JOIN d ON d.id == d.id", "cannot be joined with itself"),
+    ("SELECT * FROM d JOIN nobody ON d.id == nobody.id", "Table not found"),
+    ("SELECT * FROM e JOIN d ON e.dept == e.id", "Invalid join condition"),
+    ("SELECT id FROM e JOIN d ON e.dept == d.id", "Column id is ambiguous"),
+    ("SELECT e.height FROM e JOIN d ON e.dept == d.id", "Column e.height not found"),
+])
+def test_invalid_joins(company, statement, message):
+    with pytest.raises(ValueError, match=message):
+        company.run(statement)
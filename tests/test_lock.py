@@ -0,0 +1,155 @@
+"""
+test_lock.py
+
+Tests of the locks that keep the processes and the Database objects opened on the same database apart.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from dbms.database import Database
+from dbms.executor import Executor
+from dbms.lock import LockFile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Holds a byte in shared mode, waits until the other process holds it too, then upgrades it to exclusive mode.
+UPGRADE = textwrap.dedent("""
+    import os, sys, time
+    sys.path.insert(0, sys.argv[1])
+    from dbms.lock import LockFile
+
+    lock = LockFile(sys.argv[2])
+    lock.acquire(0)
+    open(sys.argv[3], "w").close()
+    while not os.path.exists(sys.argv[4]):
+        time.sleep(0.01)
+    try:
+        lock.acquire(0, exclusive=True)
+        print("upgraded")
+    except ValueError:
+        print("deadlock")
+    lock.close()
+""")
+
+# Inserts rows one statement at a time.
+INSERT = textwrap.dedent("""
+    import contextlib, io, sys
+    sys.path.insert(0, sys.argv[1])
+    from dbms.database import Database
+    from dbms.executor import Executor
+
+    db = Database(sys.argv[2], workers=1)
+    executor = Executor(db)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(int(sys.argv[3]), int(sys.argv[3]) + 100):
+            executor.run(f"INSERT INTO t VALUES {i} p{sys.argv[3]}")
+    db.close()
+""")
+
+
+def test_lock_files_of_a_process_exclude_each_other(tmp_path):
+    path = str(tmp_path / "lock")
+    first, second = LockFile(path), LockFile(path)
+    assert first.acquire(0, exclusive=True)
+    assert not second.acquire(0, blocking=False)
+    first.release(0)
+    assert second.acquire(0) and first.acquire(0)
+    # Closing one of them keeps the locks of the other
+    first.close()
+    other = subprocess.run([sys.executable, "-c", textwrap.dedent("""
+        import sys
+        sys.path.insert(0, sys.argv[1])
+        from dbms.lock import LockFile
+        print(LockFile(sys.argv[2]).acquire(0, exclusive=True, blocking=False))
+    """), ROOT, path], capture_output=True, text=True, check=True)
+    assert other.stdout.strip() == "False"
+    second.close()
+
+
+def test_nested_holds(tmp_path):
+    lock = LockFile(str(tmp_path / "lock"))
+    lock.acquire(0)
+    lock.acquire(0, exclusive=True)
+    assert lock.held(0, exclusive=True)
+    lock.release(0)
+    assert lock.held(0) and not lock.held(0, exclusive=True)
+    lock.release(0)
+    assert not lock.held(0)
+    lock.close()
+
+
+def test_processes_upgrading_the_same_byte(tmp_path):
+    path = str(tmp_path / "lock")
+    processes = []
+    for i in range(2):
+        ready, other = str(tmp_path / f"ready{i}"), str(tmp_path / f"ready{1 - i}")
+        processes.append(subprocess.Popen([sys.executable, "-c", UPGRADE, ROOT, path, ready, other],
+                                          stdout=subprocess.PIPE, text=True))
+    outputs = sorted(process.communicate(timeout=30)[0].strip() for process in processes)
+    # One of them fails instead of both waiting forever, and the other gets the byte once it is released
+    assert outputs == ["deadlock", "upgraded"]
+
+
+def test_threads_upgrading_the_same_byte(tmp_path):
+    path = str(tmp_path / "lock")
+    locks = [LockFile(path), LockFile(path)]
+    for lock in locks:
+        lock.acquire(0)
+    outputs = []
+
+    def upgrade(lock):
+        try:
+            lock.acquire(0, exclusive=True)
+            outputs.append("upgraded")
+        except ValueError:
+            outputs.append("deadlock")
+        lock.close()
+
+    threads = [threading.Thread(target=upgrade, args=(lock,)) for lock in locks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert sorted(outputs) == ["deadlock", "upgraded"]
+
+
+def test_databases_of_a_process_exclude_each_other(open_session, database_name):
+    session = open_session()
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    other = Database(database_name, workers=1)
+    try:
+        inserted = threading.Event()
+
+        def insert():
+            Executor(other).execute(3, "t", ["2", "b"])
+            inserted.set()
+
+        with session.executor.single_lock():
+            session.run("INSERT INTO t VALUES 1 a")
+            thread = threading.Thread(target=insert)
+            thread.start()
+            # The statement of the other database waits until the lock is released
+            assert not inserted.wait(0.3)
+        thread.join(timeout=30)
+        assert inserted.is_set()
+        assert session.run("SELECT * FROM t") == [[1, "a"], [2, "b"]]
+    finally:
+        other.close()
+
+
+def test_processes_do_not_lose_writes(session, database_name):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    processes = [subprocess.Popen([sys.executable, "-c", INSERT, ROOT, database_name, str(start)])
+                 for start in (0, 1000, 2000)]
+    for process in processes:
+        assert process.wait(timeout=120) == 0
+    rows = session.run("SELECT * FROM t")
+    assert len(rows) == 300
+    assert sorted(row[0] for row in rows) == [start + i for start in (0, 1000, 2000) for i in range(100)]
@@ -0,0 +1,98 @@
+"""
+test_parallel.py
+
+Tests of the scans of large tables split among worker processes.
+"""
+
+import pytest
+
+from dbms.condition import Condition
+from dbms.parallel import ParallelScan
+from dbms.zonemap import ZoneMap
+
+ROWS = [[i, i % 97, f"k{i % 5}"] for i in range(20000)]
+
+
+def test_chunks():
+    scan = ParallelScan(2)
+    blocks = [(i * 100, 100) for i in range(20)] + [(2000, 40)]
+    chunks = scan.chunks(blocks)
+    assert len(chunks) <= scan.workers * ParallelScan.CHUNKS_PER_WORKER
+    assert all(sum(count for _, count in chunk) >= 255 for chunk in chunks[:-1])
+    assert [block for chunk in chunks for block in chunk] == blocks
+    assert scan.chunks([]) == []
+    assert ParallelScan(3).chunks([(0, 5)]) == [[(0, 5)]]
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError, match="Invalid number of workers"):
+        ParallelScan(0)
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """
+    Returns the number of blocks of every scan split among worker processes from then on.
+    """
+    scans = []
+    scan = ParallelScan.scan
+
+    def spy(parallel, storage, blocks, *args):
+        scans.append(len(blocks))
+        return scan(parallel, storage, blocks, *args)
+
+    monkeypatch.setattr(ParallelScan, "scan", spy)
+    return scans
+
+
+@pytest.fixture(params=["csv", "columnar"])
+def sessions(request, open_session, monkeypatch):
+    """
+    Returns sessions on the same table of ROWS with its statistics, scanned by one process and by two worker
+    processes.
+    """
+    monkeypatch.setattr(ZoneMap, "BLOCK_SIZE", 500)
+    sessions = []
+    for workers in (1, 2):
+        session = open_session(str(workers), cache_size=0, vectorized=False, workers=workers)
+        session.run(f"CREATE TABLE t id int score int kind str PRIMARY_KEY id STORAGE {request.param}")
+        session.run("INSERT INTO t VALUES " + ", ".join(" ".join(map(str, row)) for row in ROWS))
+        session.run("ANALYZE t")
+        sessions.append(session)
+    return sessions
+
+
+def test_parallel_plan(sessions):
+    serial, parallel = sessions
+    for session, workers in ((serial, 1), (parallel, 2)):
+        table = session.db.tables["t"]
+        plan = table.plan(Condition("score == 3 and kind != 'k1'", table.metadata["columns"]), parallel="rows")
+        assert plan.workers == workers
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT * FROM t WHERE score == 3 and kind != 'k1'",
+    "SELECT kind id FROM t WHERE score >= 90 and kind != 'k0'",
+    "SELECT kind, COUNT(*), SUM(score), MIN(id), MAX(id) FROM t GROUP BY kind",
+    "SELECT COUNT(*) AVG(score) FROM t WHERE kind == 'k2'",
+])
+def test_parallel_select(sessions, scans, statement):
+    serial, parallel = sessions
+    expected = serial.run(statement)
+    assert scans == []
+    # The rows of the chunks are merged in table order
+    assert parallel.run(statement) == expected
+    assert scans == [len(ROWS) // 500]
+
+
+def test_parallel_update_and_delete(sessions, scans):
+    for session in sessions:
+        session.run("UPDATE t SET kind x WHERE score == 5")
+        session.run("DELETE FROM t WHERE score == 7 or id < 10")
+    # The rows to delete are found by the worker processes
+    assert scans == [len(ROWS) // 500]
+    serial, parallel = sessions
+    assert parallel.run("SELECT * FROM t") == serial.run("SELECT * FROM t")
+    assert len(parallel.run("SELECT id FROM t WHERE kind == 'x'")) == sum(1 for row in ROWS if row[1] == 5 and row[0] >= 10)
+    # Deleted rows are skipped by the workers
+    assert parallel.run("SELECT COUNT(*) FROM t WHERE score == 7 or id < 10") == [[0]]
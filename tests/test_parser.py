@@ -0,0 +1,23 @@
+"""
+test_parser.py
+
+Tests of the parsing of statements.
+"""
+
+from dbms.parser import Parser
+
+
+def test_insert_with_comma_in_quoted_value():
+    assert Parser('INSERT INTO t VALUES 1 "a, b" 3').parse() == (3, "t", ["1", '"a, b"', "3"])
+    assert Parser("INSERT INTO t VALUES 1 'a,b'").parse() == (3, "t", ["1", "'a,b'"])
+
+
+def test_insert_several_rows():
+    assert Parser('INSERT INTO t VALUES 1 a, 2 "b, c"').parse() == (10, "t", [["1", "a"], ["2", '"b, c"']])
+    assert Parser("INSERT INTO t VALUES 1 a,2 b").parse() == (10, "t", [["1", "a"], ["2", "b"]])
+
+
+def test_insert_with_comma_in_quoted_value_stores_one_row(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run('INSERT INTO t VALUES 1 "a, b"')
+    assert session.run("SELECT * FROM t") == [[1, '"a, b"']]
@@ -0,0 +1,133 @@
+"""
+test_partition.py
+
+Tests of the tables whose rows are spread among partitions by hash or by range.
+"""
+
+import os
+
+import pytest
+
+from dbms.condition import Condition
+from dbms.file_manager import DatabaseFileManager
+from dbms.parser import Parser
+from dbms.partition import Partitioning
+
+COLUMNS = ["id", "ts", "name"]
+DATA_TYPES = ["int", "int", "str"]
+
+
+def test_parse_partitioning():
+    statement = Parser("CREATE TABLE t id int ts int PRIMARY_KEY id PARTITION BY RANGE(ts) 10 20 "
+                       "FOREIGN_KEY id u.id").parse()
+    assert statement[2]["partitioning"] == {"kind": "range", "column": "ts", "values": ["10", "20"]}
+    assert statement[2]["foreign_keys"] == {"id": ["u", "id"]}
+
+
+@pytest.mark.parametrize("kind, column, values, message", [
+    ("list", "id", ["2"], "Invalid partitioning"),
+    ("hash", "height", ["2"], "Column height not found"),
+    ("hash", "id", ["0"], "Invalid number of partitions"),
+    ("hash", "id", ["2", "3"], "Invalid number of partitions"),
+    ("range", "ts", [], "must be increasing"),
+    ("range", "ts", ["20", "10"], "must be increasing"),
+    ("range", "ts", ["x"], "Bad input values"),
+])
+def test_invalid_partitioning(kind, column, values, message):
+    with pytest.raises(ValueError, match=message):
+        Partitioning.define("t", kind, column, values, COLUMNS, DATA_TYPES)
+
+
+def test_route_and_prune():
+    hashed = Partitioning(Partitioning.define("t", "hash", "id", ["4"], COLUMNS, DATA_TYPES), COLUMNS, DATA_TYPES)
+    assert hashed.tables == ["t#0", "t#1", "t#2", "t#3"]
+    assert {hashed.route([i, 0, ""]) for i in range(100)} == {0, 1, 2, 3}
+    assert hashed.prune(Condition("id == 7 and ts > 1", COLUMNS)) == [hashed.partition(7)]
+    assert hashed.prune(Condition("id in (7, 8)", COLUMNS)) == sorted({hashed.partition(7), hashed.partition(8)})
+    assert hashed.prune(Condition("id == 'x'", COLUMNS)) == []
+    assert hashed.prune(Condition("id > 7", COLUMNS)) == [0, 1, 2, 3]
+    assert hashed.prune(None) == [0, 1, 2, 3]
+
+    ranged = Partitioning(Partitioning.define("t", "range", "ts", ["10", "20"], COLUMNS, DATA_TYPES), COLUMNS,
+                          DATA_TYPES)
+    assert [ranged.route([0, ts, ""]) for ts in (-5, 9, 10, 19, 20, 99)] == [0, 0, 1, 1, 2, 2]
+    assert ranged.prune(Condition("ts < 10", COLUMNS)) == [0]
+    assert ranged.prune(Condition("ts <= 10", COLUMNS)) == [0, 1]
+    assert ranged.prune(Condition("ts BETWEEN 12 AND 25", COLUMNS)) == [1, 2]
+    assert ranged.prune(Condition("ts == 20", COLUMNS)) == [2]
+    assert ranged.prune(Condition("ts > 5 or id == 1", COLUMNS)) == [0, 1, 2]
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """
+    Returns the names of the tables and partitions whose files are used from then on.
+    """
+    opened = []
+    storage = DatabaseFileManager.storage
+
+    def spy(file_manager, table_name):
+        opened.append(table_name)
+        return storage(file_manager, table_name)
+
+    monkeypatch.setattr(DatabaseFileManager, "storage", spy)
+    return opened
+
+
+@pytest.fixture(params=["HASH(id) 4", "RANGE(ts) 250 500 750"])
+def events(request, open_session):
+    """
+    Returns a session on 1000 events partitioned by hash of their id or by range of their time, without a cache.
+    """
+    session = open_session(cache_size=0)
+    session.run(f"CREATE TABLE events id int ts int name str PRIMARY_KEY id PARTITION BY {request.param}")
+    session.run("INSERT INTO events VALUES " + ", ".join(f"{i} {i} n{i}" for i in range(1000)))
+    return session
+
+
+def test_partitions_have_their_own_files(events):
+    file_manager = events.db.file_manager
+    partitions = events.db.tables["events"].partitioning.tables
+    assert len(partitions) == 4
+    assert events.db.stored_tables() == partitions
+    sizes = [sum(1 for _ in file_manager.scan_rows(name)) for name in partitions]
+    assert sum(sizes) == 1000 and all(sizes)
+    assert sorted(events.run("SELECT id FROM events")) == [[i] for i in range(1000)]
+
+
+def test_partitions_are_pruned(events, opened):
+    # The condition restricts the partition column of both partitionings
+    text = "ts == 42 and id == 42"
+    table = events.db.tables["events"]
+    expected = table.partitioning.tables[table.partitioning.route([42, 42, ""])]
+    opened.clear()
+    assert events.run(f"SELECT name FROM events WHERE {text}") == [["n42"]]
+    assert set(opened) == {expected}
+    opened.clear()
+    events.run(f"UPDATE events SET name x WHERE {text}")
+    events.run(f"DELETE FROM events WHERE {text} and name == 'x'")
+    assert set(opened) == {expected}
+    assert events.run("SELECT COUNT(*) FROM events") == [[999]]
+
+
+def test_primary_keys_are_unique_across_partitions(events):
+    with pytest.raises(ValueError, match="Duplicate primary key 7"):
+        events.run("INSERT INTO events VALUES 2000 2000 a, 7 900 b")
+    column = events.db.tables["events"].partitioning.column
+    for statement in ("UPDATE events SET id 5000 WHERE id == 1", f"UPDATE events SET {column} 5000 WHERE id == 1"):
+        with pytest.raises(ValueError, match="cannot be updated"):
+            events.run(statement)
+    assert events.run("SELECT COUNT(*) FROM events") == [[1000]]
+
+
+def test_partitioned_table_is_kept_and_dropped(open_session, events):
+    partitions = events.db.tables["events"].partitioning.tables
+    events.db.close()
+    session = open_session(cache_size=0)
+    assert session.run("SELECT name FROM events WHERE id == 999") == [["n999"]]
+    assert session.run("SELECT COUNT(*) FROM events WHERE ts >= 500") == [[500]]
+    paths = [session.db.file_manager.storage(name).file_path for name in partitions]
+    session.run("DROP TABLE events")
+    assert not any(os.path.exists(path) for path in paths)
+    with pytest.raises(ValueError, match="Table not found"):
+        session.run("SELECT * FROM events")
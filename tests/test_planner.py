@@ -0,0 +1,136 @@
+"""
+test_planner.py
+
+Tests of the statistics gathered by ANALYZE, of the access paths chosen from them and of EXPLAIN.
+"""
+
+import contextlib
+import io
+
+import pytest
+
+from dbms.condition import Condition
+from dbms.executor import Executor
+from dbms.planner import Planner
+from dbms.statistics import TableStatistics
+from dbms.zonemap import ZoneMap
+
+COLUMNS = ["id", "ts", "kind"]
+# 2000 time-ordered rows whose kind is "a" for half of them
+ROWS = [[i, i * 10, "a" if i % 2 else f"k{i % 50}"] for i in range(2000)]
+
+
+def test_gather():
+    statistics = TableStatistics.gather(iter(ROWS), COLUMNS)
+    assert statistics["rows"] == 2000
+    ts = statistics["columns"]["ts"]
+    assert ts["distinct"] == 2000
+    assert len(ts["histogram"]) == TableStatistics.BUCKETS + 1
+    assert ts["histogram"][0] == 0 and ts["histogram"][-1] == 19990
+    kind = statistics["columns"]["kind"]
+    assert kind["distinct"] == 26
+    assert kind["common"][0] == ("a", 0.5)
+    assert TableStatistics.gather([], COLUMNS) == {"rows": 0, "columns": {}}
+
+
+@pytest.mark.parametrize("text", [
+    "ts < 5000", "ts >= 15000", "ts BETWEEN 2000 AND 3000", "kind == 'a'", "kind != 'a'", "kind == 'k4'",
+    "kind == 'zzz'", "kind in ('a', 'k2')", "ts < 10000 and kind == 'a'", "ts < 1000 or ts > 19000",
+])
+def test_selectivity(text):
+    statistics = TableStatistics(TableStatistics.gather(iter(ROWS), COLUMNS))
+    condition = Condition(text, COLUMNS)
+    actual = sum(1 for row in ROWS if condition(row)) / len(ROWS)
+    assert statistics.selectivity(condition) == pytest.approx(actual, abs=0.02)
+
+
+def test_selectivity_without_statistics():
+    statistics = TableStatistics()
+    assert statistics.selectivity(None) == 1.0
+    assert statistics.selectivity(Condition("kind == 'a'", COLUMNS)) == TableStatistics.EQUALITY_SELECTIVITY
+    assert statistics.selectivity(Condition("ts > 5", COLUMNS)) == pytest.approx(TableStatistics.RANGE_SELECTIVITY)
+
+
+@pytest.fixture
+def events(open_session, monkeypatch):
+    """
+    Returns a session on a table of ROWS in blocks of 100 rows, with an index on kind and its statistics.
+    """
+    monkeypatch.setattr(ZoneMap, "BLOCK_SIZE", 100)
+    session = open_session(cache_size=0)
+    session.run("CREATE TABLE events id int ts int kind str PRIMARY_KEY id")
+    session.run("INSERT INTO events VALUES " + ", ".join(" ".join(map(str, row)) for row in ROWS))
+    session.run("CREATE INDEX events_kind ON events kind")
+    session.run("ANALYZE events")
+    return session
+
+
+def plan(session, text: str = None):
+    table = session.db.tables["events"]
+    return table.plan(None if text is None else Condition(text, table.metadata["columns"]))
+
+
+def test_statistics_are_kept(open_session, events):
+    assert events.db.get_info_table("events")["statistics"]["rows"] == 2000
+    events.db.close()
+    session = open_session(cache_size=0)
+    statistics = Planner(session.db.tables["events"]).statistics
+    assert statistics.columns["kind"]["common"]["a"] == 0.5
+
+
+@pytest.mark.parametrize("text, access", [
+    (None, Planner.FULL_SCAN),
+    ("id == 7", Planner.PRIMARY_KEY),
+    ("kind == 'k4'", Planner.INDEX_RANGE),
+    ("kind >= 'a'", Planner.FULL_SCAN),
+    ("ts >= 19500", Planner.BLOCKS),
+    ("ts >= 100", Planner.FULL_SCAN),
+])
+def test_access_path(events, text, access):
+    chosen = plan(events, text)
+    assert chosen.access == access
+    if text is not None:
+        condition = Condition(text, COLUMNS)
+        actual = sum(1 for row in ROWS if condition(row))
+        assert chosen.estimated_rows == pytest.approx(actual, abs=50)
+        expected = [[row[0]] for row in ROWS if condition(row)]
+        assert sorted(events.run(f"SELECT id FROM events WHERE {text}")) == expected
+
+
+def test_plan_costs(events):
+    # A block scan reads the blocks it keeps, and costs less than the full scan it replaces
+    blocks = plan(events, "ts >= 19500")
+    assert blocks.rows_read == 100 and blocks.cost < plan(events).cost
+    assert plan(events).rows_read == 2000
+
+
+def explain(session, statement: str) -> dict:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        Executor(session.db).run(f"EXPLAIN {statement}")
+    lines = [line.strip("|").split("|") for line in output.getvalue().splitlines() if line.startswith("|")]
+    headers, values = ([value.strip() for value in line] for line in lines)
+    return dict(zip(headers, values))
+
+
+def test_explain(events):
+    explained = explain(events, "SELECT * FROM events WHERE kind == 'k4'")
+    assert float(explained.pop("cost")) > 0
+    assert explained == {"table": "events", "access": "index range scan (events_kind)", "rows read": "40",
+                         "estimated rows": "40", "actual rows": "40"}
+    assert explain(events, "DELETE FROM events WHERE id == 3")["access"] == "primary key lookup (id)"
+    explained = explain(events, "UPDATE events SET kind b")
+    assert explained["access"] == "full scan" and explained["actual rows"] == "2000"
+    # EXPLAIN does not run the statement
+    assert events.run("SELECT id FROM events WHERE id == 3") == [[3]]
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("EXPLAIN INSERT INTO events VALUES 1 1 a", "EXPLAIN only supports"),
+    ("EXPLAIN SELECT * FROM nobody", "Table not found"),
+    ("EXPLAIN", "Invalid command"),
+    ("ANALYZE nobody", "Table not found"),
+])
+def test_invalid_explain(events, statement, message):
+    with pytest.raises(ValueError, match=message):
+        events.run(statement)
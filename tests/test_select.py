@@ -0,0 +1,83 @@
+"""
+test_select.py
+
+Tests of the rows selected by SELECT statements, their pages and how they are printed.
+"""
+
+import contextlib
+import io
+
+import pytest
+
+from dbms.executor import Executor
+from dbms.storage import CsvStorage
+from dbms.table import Table
+
+ROWS = 10000
+
+
+@pytest.fixture
+def numbers(open_session):
+    """
+    Returns a session on a table of ROWS rows without a cache, so statements read the table file.
+    """
+    session = open_session(cache_size=0)
+    session.run("CREATE TABLE n id int half int PRIMARY_KEY id")
+    session.run("INSERT INTO n VALUES " + ", ".join(f"{i} {i // 2}" for i in range(ROWS)))
+    return session
+
+
+@pytest.fixture
+def read_rows(monkeypatch):
+    """
+    Returns the number of rows read from text table files from then on.
+    """
+    read = [0]
+    iter_rows = CsvStorage.iter_rows
+
+    def spy(storage, *args, **kwargs):
+        for row in iter_rows(storage, *args, **kwargs):
+            read[0] += 1
+            yield row
+
+    monkeypatch.setattr(CsvStorage, "iter_rows", spy)
+    return read
+
+
+@pytest.mark.parametrize("clauses, expected", [
+    ("LIMIT 3", [0, 1, 2]),
+    ("LIMIT 2 OFFSET 5", [5, 6]),
+    ("OFFSET 9998", [9998, 9999]),
+    ("LIMIT 5 OFFSET 9999", [9999]),
+    ("OFFSET 20000", []),
+    ("LIMIT 0", []),
+])
+def test_limit_and_offset(numbers, clauses, expected):
+    assert numbers.run(f"SELECT id FROM n {clauses}") == [[i] for i in expected]
+
+
+def test_limit_with_condition(numbers):
+    assert numbers.run("SELECT id FROM n WHERE half == 7 or id > 9997 LIMIT 3 OFFSET 1") == [[15], [9998], [9999]]
+
+
+def test_limit_stops_reading(numbers, read_rows):
+    assert numbers.run("SELECT id FROM n LIMIT 5 OFFSET 10") == [[i] for i in range(10, 15)]
+    assert read_rows[0] < 100
+
+
+@pytest.mark.parametrize("clause", ["LIMIT -1", "LIMIT x", "LIMIT", "OFFSET 1 2"])
+def test_invalid_limits(numbers, clause):
+    with pytest.raises(ValueError, match="Invalid command"):
+        numbers.run(f"SELECT id FROM n {clause}")
+
+
+def test_rows_are_printed_in_pages(numbers, monkeypatch):
+    monkeypatch.setattr(Table, "PAGE_SIZE", 4)
+    executor = Executor(numbers.db)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        executor.run("SELECT id half FROM n LIMIT 10")
+    text = output.getvalue()
+    # Three tables of 4, 4 and 2 rows, each with its headers
+    assert text.count("|   id |   half |") == 3
+    assert "|    9 |      4 |" in text
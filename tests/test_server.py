@@ -0,0 +1,117 @@
+"""
+test_server.py
+
+This module tests that the clients of DatabaseServer get the answers of their own statements, and that a client that
+stops reading its answer does not hold up the others.
+"""
+
+import asyncio
+import os
+import sys
+import socket
+import threading
+import time
+
+import pytest
+
+from dbms.server import Client, DatabaseServer
+
+ROWS = 20000
+
+
+@pytest.fixture
+def server(database_name, tmp_path):
+    """
+    Runs a DatabaseServer on a Unix socket in a thread, serving the database of the test with a table t of ROWS
+    rows, and stops it at the end of the test.
+    """
+    path = str(tmp_path / "server.sock")
+    server = DatabaseServer(database_name, workers=1)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve(path=path))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.05)
+    client = Client(path=path)
+    client.execute("CREATE TABLE t id int name str PRIMARY_KEY id")
+    for start in range(0, ROWS, 1000):
+        client.execute("INSERT INTO t VALUES " + ", ".join(f"{i} {'x' * 40}{i}" for i in range(start, start + 1000)))
+    client.close()
+    server.path = path
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+
+
+def stalled_select(path: str) -> socket.socket:
+    """
+    Sends a SELECT of every row of t and does not read its answer.
+    """
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(path)
+    stalled.sendall(b"SELECT * FROM t\n")
+    time.sleep(0.5)
+    return stalled
+
+
+def test_stalled_client_does_not_block_others(server):
+    stalled = stalled_select(server.path)
+    client = Client(path=server.path)
+    client.socket.settimeout(10)
+    try:
+        client.execute(f"INSERT INTO t VALUES {ROWS} y")
+        assert client.execute("SELECT COUNT(*) FROM t")[1] == [[ROWS + 1]]
+    finally:
+        client.close()
+        stalled.close()
+
+
+def test_stalled_client_is_disconnected(server):
+    server.WRITE_TIMEOUT = 0.5
+    stalled = stalled_select(server.path)
+    stalled.settimeout(10)
+    time.sleep(1)
+    try:
+        while stalled.recv(65536):
+            pass
+    finally:
+        stalled.close()
+
+
+def test_clients_get_the_text_of_their_statements(server, capsys):
+    stdout = sys.stdout
+    clients = [Client(path=server.path) for _ in range(4)]
+    answers = {}
+
+    def run(i, client):
+        answers[i] = [client.execute(f"CREATE TABLE u{i} id int PRIMARY_KEY id")[2]]
+        answers[i] += [client.execute(f"INSERT INTO u{i} VALUES {j}")[2] for j in range(20)]
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(clients)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        for i in range(len(clients)):
+            assert answers[i] == [f"Table u{i} created\n"] + [f"Succesfully inserted row into u{i}\n"] * 20
+        explained = clients[0].execute("EXPLAIN SELECT * FROM t WHERE id == 3")[2]
+        assert "primary key lookup (id)" in explained
+    finally:
+        for client in clients:
+            client.close()
+    # The stdout of the process is neither replaced nor written to by the statements
+    assert sys.stdout is stdout
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,111 @@
+"""
+test_sort.py
+
+Tests of ORDER BY: rows sorted in memory, in runs merged from disk and with a bounded heap for LIMIT.
+"""
+
+import os
+import random
+
+import pytest
+
+from dbms.sort import Sorter
+
+RANDOM = random.Random(7)
+ROWS = [[i, RANDOM.randrange(10), RANDOM.choice("abc")] for i in range(500)]
+KEYS = [
+    [(1, False)],
+    [(1, True)],
+    [(2, False), (1, True)],
+    [(2, True), (1, False), (0, True)],
+]
+
+
+def expected(rows: list, keys: list) -> list:
+    rows = list(rows)
+    for position, descending in reversed(keys):
+        rows.sort(key=lambda row: row[position], reverse=descending)
+    return rows
+
+
+@pytest.fixture
+def external(monkeypatch):
+    """
+    Makes every sort use runs of 30 rows on disk.
+    """
+    monkeypatch.setattr(Sorter, "MEMORY_LIMIT", 0)
+    monkeypatch.setattr(Sorter, "BATCH_SIZE", 30)
+
+
+@pytest.mark.parametrize("keys", KEYS)
+def test_sort_in_memory(tmp_path, keys):
+    assert list(Sorter(keys, str(tmp_path)).sort(ROWS)) == expected(ROWS, keys)
+
+
+@pytest.mark.parametrize("keys", KEYS)
+def test_external_sort(tmp_path, external, keys, monkeypatch):
+    runs = []
+    write_run = Sorter.write_run
+    monkeypatch.setattr(Sorter, "write_run", lambda sorter, rows, path: runs.append(path)
+                        or write_run(sorter, rows, path))
+    sorted_rows = Sorter(keys, str(tmp_path)).sort(ROWS)
+    assert list(sorted_rows) == expected(ROWS, keys)
+    assert len(runs) == len(ROWS) // 30 + 1
+    # The runs are removed once they are merged
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("keys", KEYS)
+@pytest.mark.parametrize("limit", [0, 1, 7, 500, 600])
+def test_top_k(tmp_path, keys, limit, monkeypatch):
+    monkeypatch.setattr(Sorter, "merge_sort", None)
+    assert list(Sorter(keys, str(tmp_path)).sort(iter(ROWS), limit)) == expected(ROWS, keys)[:limit]
+
+
+@pytest.fixture
+def scores(open_session):
+    """
+    Returns a session on a table of ROWS as (id, score, grade).
+    """
+    session = open_session(cache_size=0)
+    session.run("CREATE TABLE scores id int score int grade str PRIMARY_KEY id")
+    session.run("INSERT INTO scores VALUES " + ", ".join(" ".join(map(str, row)) for row in ROWS))
+    return session
+
+
+@pytest.mark.parametrize("clauses, keys", [
+    ("ORDER BY score", [(1, False)]),
+    ("ORDER BY score ASC", [(1, False)]),
+    ("ORDER BY score DESC", [(1, True)]),
+    ("ORDER BY grade, score DESC", [(2, False), (1, True)]),
+    ("ORDER BY grade desc, score asc, id DESC", [(2, True), (1, False), (0, True)]),
+])
+@pytest.mark.parametrize("external_sort", [False, True])
+def test_order_by(scores, clauses, keys, external_sort, request):
+    if external_sort:
+        request.getfixturevalue("external")
+    assert scores.run(f"SELECT * FROM scores {clauses}") == expected(ROWS, keys)
+    assert scores.run(f"SELECT id FROM scores {clauses} LIMIT 5 OFFSET 3") == \
+        [row[:1] for row in expected(ROWS, keys)[3:8]]
+
+
+def test_order_by_with_condition(scores):
+    rows = [row for row in ROWS if row[1] > 7]
+    assert scores.run("SELECT id score FROM scores WHERE score > 7 ORDER BY score DESC") == \
+        [row[:2] for row in expected(rows, [(1, True)])]
+
+
+def test_order_by_groups(scores):
+    counts = {}
+    for row in ROWS:
+        counts[row[2]] = counts.get(row[2], 0) + 1
+    assert scores.run("SELECT grade COUNT(*) FROM scores GROUP BY grade ORDER BY grade DESC") == \
+        sorted([[grade, count] for grade, count in counts.items()], reverse=True)
+    with pytest.raises(ValueError, match="must be selected to sort groups"):
+        scores.run("SELECT COUNT(*) FROM scores GROUP BY grade ORDER BY grade")
+
+
+@pytest.mark.parametrize("clause", ["ORDER score", "ORDER BY", "ORDER BY score UP", "ORDER BY score DESC id"])
+def test_invalid_order_by(scores, clause):
+    with pytest.raises(ValueError, match="Invalid command"):
+        scores.run(f"SELECT * FROM scores {clause}")
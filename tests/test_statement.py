@@ -0,0 +1,107 @@
+"""
+test_statement.py
+
+Tests of the statement cache and of the statements prepared with PREPARE and run with EXECUTE.
+"""
+
+import pytest
+
+from dbms.executor import Executor
+from dbms.parser import Parser
+from dbms.statement import PreparedStatement, StatementCache
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("  SELECT *   FROM t\tWHERE id == 1 ", "SELECT * FROM t WHERE id == 1"),
+    ("INSERT INTO t VALUES 1   'a  b'", "INSERT INTO t VALUES 1 'a  b'"),
+    ('SELECT * FROM t WHERE name == "x   y"  and id > 1', 'SELECT * FROM t WHERE name == "x   y" and id > 1'),
+    ("INSERT INTO t VALUES 1 \"it's  ok\"", "INSERT INTO t VALUES 1 \"it's  ok\""),
+    ("INSERT INTO t VALUES 1 'a  ", "INSERT INTO t VALUES 1 'a"),
+])
+def test_normalize(text, expected):
+    assert StatementCache.normalize(text) == expected
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """
+    Returns the texts of the statements parsed from then on.
+    """
+    parsed = []
+    parse = Parser.parse
+
+    def spy(parser):
+        parsed.append(parser.msg)
+        return parse(parser)
+
+    monkeypatch.setattr(Parser, "parse", spy)
+    return parsed
+
+
+def test_cache_keeps_statements(parsed):
+    cache = StatementCache(2)
+    first = cache.parse("SELECT * FROM t WHERE id == 1")
+    assert cache.parse("SELECT  *  FROM t   WHERE id == 1") is first
+    assert isinstance(first, PreparedStatement) and first.parameters == 0
+    assert parsed == ["SELECT * FROM t WHERE id == 1"]
+    # Quoted values that differ in their spaces are different statements
+    assert cache.parse("INSERT INTO t VALUES 1 'a b'").statement[2] == ["1", "'a b'"]
+    assert cache.parse("INSERT INTO t VALUES 1 'a  b'").statement[2] == ["1", "'a  b'"]
+    # Statements that cannot be prepared are not kept
+    assert cache.parse("DROP TABLE t")[0] == 7 and cache.parse("DROP TABLE t")[0] == 7
+    assert len(parsed) == 5
+    assert cache.parse("SELECT * FROM t WHERE id == 1") is not first
+
+
+@pytest.fixture
+def people(session):
+    """
+    Returns a session on a table of people.
+    """
+    session.run("CREATE TABLE people id int name str PRIMARY_KEY id")
+    return session
+
+
+def test_spaces_of_literals_are_kept(people):
+    people.run("INSERT INTO people VALUES 1 'a  b'")
+    people.run("INSERT INTO people VALUES 2 'a b'")
+    people.run("INSERT INTO people VALUES 3   'a   b'")
+    assert people.run("SELECT * FROM people") == [[1, "'a  b'"], [2, "'a b'"], [3, "'a   b'"]]
+
+
+def test_prepared_statements(people):
+    people.run("PREPARE add AS INSERT INTO people VALUES ? 'x  y'")
+    people.run("PREPARE find AS SELECT name FROM people WHERE id == ?")
+    people.run("PREPARE rename AS UPDATE people SET name ? WHERE id == ?")
+    for i in range(3):
+        people.run(f"EXECUTE add {i}")
+    people.run("EXECUTE rename z 1")
+    assert people.run("EXECUTE find 0") == [["'x  y'"]]
+    assert people.run("EXECUTE find 1") == [["z"]]
+    people.run("DEALLOCATE find")
+    with pytest.raises(ValueError, match="Prepared statement find not found"):
+        people.run("EXECUTE find 0")
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("SELECT * FROM people WHERE id == ?", "must be prepared with PREPARE"),
+    ("PREPARE add AS CREATE TABLE u id int PRIMARY_KEY id", "can be prepared"),
+    ("EXECUTE nobody 1", "Prepared statement nobody not found"),
+    ("DEALLOCATE nobody", "Prepared statement nobody not found"),
+])
+def test_invalid_statements(people, statement, message):
+    with pytest.raises(ValueError, match=message):
+        people.run(statement)
+
+
+def test_invalid_executions(people):
+    people.run("PREPARE find AS SELECT name FROM people WHERE name == ?")
+    with pytest.raises(ValueError, match="already exists"):
+        people.run("PREPARE find AS SELECT * FROM people")
+    with pytest.raises(ValueError, match="has 1 parameters but 2 values"):
+        people.run("EXECUTE find 'a' 'b'")
+    with pytest.raises(ValueError, match="Invalid parameter"):
+        people.run("EXECUTE find a")
+    # Prepared statements belong to the executor that prepared them
+    with pytest.raises(ValueError, match="not found"):
+        Executor(people.db).run("EXECUTE find 'a'")
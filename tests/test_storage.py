@@ -0,0 +1,133 @@
+"""
+test_storage.py
+
+Tests of the rows stored in table files.
+"""
+
+import os
+
+import pytest
+
+from dbms.database import Database
+
+
+def test_copy_rejects_line_breaks(session, tmp_path):
+    # A quoted line break would split the row in the table file, which is read line by line after a DELETE
+    path = tmp_path / "rows.csv"
+    path.write_text('1,"first\nline"\n2,second\n')
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    with pytest.raises(ValueError, match="line breaks"):
+        session.run(f"COPY t FROM '{path}'")
+    assert session.run("SELECT * FROM t") == []
+
+    path.write_text("1,first\n2,second\n3,third\n")
+    session.run(f"COPY t FROM '{path}'")
+    session.run("DELETE FROM t WHERE id == 1")
+    assert session.run("SELECT * FROM t") == [[2, "second"], [3, "third"]]
+
+
+def test_update_rejects_line_breaks(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a")
+    with pytest.raises(ValueError, match="line breaks"):
+        session.executor.execute(5, "t", {"name": "a\nb"}, None)
+    assert session.run("SELECT * FROM t") == [[1, "a"]]
+
+
+@pytest.mark.parametrize("wal", [False, True])
+def test_rows_read_after_delete(open_session, tmp_path, wal):
+    # Once a table has deleted rows it is read line by line, which must agree with the csv reader
+    path = tmp_path / "rows.csv"
+    path.write_text('1,"a|b"\n2,"say ""hi"""\n3,\n4,plain\n')
+    session = open_session(wal=wal)
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run(f"COPY t FROM '{path}'")
+    session.run("DELETE FROM t WHERE id == 4")
+    assert session.run("SELECT * FROM t") == [[1, "a|b"], [2, 'say "hi"'], [3, ""]]
+    assert session.run("SELECT * FROM t WHERE id == 2") == [[2, 'say "hi"']]
+
+
+def test_insert_appends_to_table_file(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a")
+    path = session.db.file_manager.storage("t").file_path
+    with open(path, "rb") as file:
+        before = file.read()
+    inode = os.stat(path).st_ino
+    session.run("INSERT INTO t VALUES 2 b")
+    with open(path, "rb") as file:
+        after = file.read()
+    # The table file is not rewritten: the new row is added after the old ones
+    assert os.stat(path).st_ino == inode
+    assert after.startswith(before) and after[len(before):].rstrip() == b"2|b"
+    assert session.run("SELECT * FROM t") == [[1, "a"], [2, "b"]]
+
+
+def test_inserted_rows_are_kept_after_reopen(open_session):
+    session = open_session()
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    for i in range(5):
+        session.run(f"INSERT INTO t VALUES {i} n{i}")
+    session.db.close()
+    assert open_session().run("SELECT * FROM t") == [[i, f"n{i}"] for i in range(5)]
+
+
+@pytest.mark.parametrize("policy, synced", [("never", False), ("always", True)])
+def test_fsync_policy(open_session, monkeypatch, policy, synced):
+    session = open_session(fsync_policy=policy)
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    calls = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append(fd) or fsync(fd))
+    session.run("INSERT INTO t VALUES 1 a")
+    assert bool(calls) == synced
+
+
+def test_invalid_fsync_policy(database_name):
+    with pytest.raises(ValueError, match="Invalid fsync policy"):
+        Database(database_name, fsync_policy="sometimes")
+
+
+@pytest.mark.parametrize("storage", ["csv", "columnar"])
+def test_storage_engines_keep_values(open_session, storage):
+    session = open_session(cache_size=0)
+    session.run(f"CREATE TABLE t id int name str score float PRIMARY_KEY id STORAGE {storage}")
+    session.run("INSERT INTO t VALUES 1 a|b 1.5, 2 ünï -2.25, 3 'x, y' 0")
+    session.run("INSERT INTO t VALUES 4 plain 1e20")
+    session.run("UPDATE t SET score 7.5 WHERE id == 2")
+    session.run("DELETE FROM t WHERE id == 1")
+    expected = [[2, "ünï", 7.5], [3, "'x, y'", 0.0], [4, "plain", 1e20]]
+    assert session.run("SELECT * FROM t") == expected
+    assert session.run("SELECT name FROM t WHERE score < 1") == [["'x, y'"]]
+    session.db.close()
+    assert open_session(cache_size=0).run("SELECT * FROM t") == expected
+
+
+def test_columnar_files(session):
+    session.run("CREATE TABLE t id int name str score float PRIMARY_KEY id STORAGE columnar")
+    session.run("INSERT INTO t VALUES 1 a 1.5, 2 bc 2.5")
+    directory = session.db.file_manager.file_path + "t.columns"
+    assert sorted(os.listdir(directory)) == ["0.bin", "1.bin", "1.str", "2.bin"]
+    # Packed values of 8 bytes per row, and the bytes of the strings back to back
+    assert os.path.getsize(os.path.join(directory, "0.bin")) == 16
+    with open(os.path.join(directory, "1.str"), "rb") as file:
+        assert file.read() == b"abc"
+    assert not os.path.exists(session.db.file_manager.file_path + "t.csv")
+
+
+def test_default_storage_engine(open_session):
+    session = open_session(storage="columnar")
+    session.run("CREATE TABLE t id int PRIMARY_KEY id")
+    session.run("CREATE TABLE u id int PRIMARY_KEY id STORAGE csv")
+    assert session.db.get_info_table("t")["storage"] == "columnar"
+    assert session.db.get_info_table("u")["storage"] == "csv"
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("CREATE TABLE t id int flag bool PRIMARY_KEY id STORAGE columnar", "Bad data type for a columnar table"),
+    ("CREATE TABLE t id int PRIMARY_KEY id STORAGE parquet", "Invalid storage"),
+])
+def test_invalid_storage(session, statement, message):
+    with pytest.raises(ValueError, match=message):
+        session.run(statement)
+    assert "t" not in session.db.tables
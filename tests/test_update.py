@@ -0,0 +1,103 @@
+"""
+test_update.py
+
+Tests of the rows changed by UPDATE and DELETE statements.
+"""
+
+import os
+
+import pytest
+
+from dbms.storage import ColumnarStorage, CsvStorage
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """
+    Returns the names of the tables loaded whole into a list from then on.
+    """
+    loads = []
+    for storage in (CsvStorage, ColumnarStorage):
+        load = storage.load
+
+        def spy(self, *args, load=load, **kwargs):
+            loads.append(self.table_name)
+            return load(self, *args, **kwargs)
+
+        monkeypatch.setattr(storage, "load", spy)
+    return loads
+
+
+@pytest.fixture(params=["csv", "columnar"])
+def items(request, open_session):
+    """
+    Returns a session on a table of 1000 items, stored as text or in columns, without a cache.
+    """
+    session = open_session(cache_size=0)
+    session.run(f"CREATE TABLE items id int name str v int PRIMARY_KEY id STORAGE {request.param}")
+    session.run("INSERT INTO items VALUES " + ", ".join(f"{i} n{i} {i % 10}" for i in range(1000)))
+    return session
+
+
+def test_update_and_delete(items, loads):
+    items.run("UPDATE items SET name x v 20 WHERE v == 3")
+    items.run("DELETE FROM items WHERE v == 4 or id < 5")
+    items.run("UPDATE items SET name y")
+    rows = items.run("SELECT * FROM items")
+    assert len(rows) == 1000 - 100 - 4
+    assert rows[:3] == [[5, "y", 5], [6, "y", 6], [7, "y", 7]]
+    assert items.run("SELECT COUNT(*) FROM items WHERE v == 20") == [[99]]
+    assert items.run("SELECT COUNT(*) FROM items WHERE v == 4") == [[0]]
+    # The rows are streamed through the condition instead of being loaded into a list
+    assert loads == []
+
+
+def test_rewrite_replaces_table_file(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a, 2 b, 3 c")
+    path = session.db.file_manager.storage("t").file_path
+    inode = os.stat(path).st_ino
+    session.run("UPDATE t SET id 4 WHERE id == 1")
+    assert os.stat(path).st_ino != inode
+    assert not os.path.exists(path + ".tmp")
+    assert session.run("SELECT * FROM t") == [[4, "a"], [2, "b"], [3, "c"]]
+
+
+def test_failed_rewrite_keeps_table(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a, 2 b, 3 c")
+    path = session.db.file_manager.storage("t").file_path
+    with open(path, "rb") as file:
+        before = file.read()
+    with pytest.raises(ValueError, match="Duplicate primary key 7"):
+        session.run("UPDATE t SET id 7 WHERE id > 1")
+    with open(path, "rb") as file:
+        assert file.read() == before
+    assert not os.path.exists(path + ".tmp")
+    assert session.run("SELECT * FROM t WHERE id == 2") == [[2, "b"]]
+
+
+def test_update_without_matching_rows(session):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a, 2 b")
+    path = session.db.file_manager.storage("t").file_path
+    inode = os.stat(path).st_ino
+    session.run("UPDATE t SET name x WHERE id > 10")
+    session.run("DELETE FROM t WHERE id > 10")
+    assert os.stat(path).st_ino == inode
+    assert session.run("SELECT * FROM t") == [[1, "a"], [2, "b"]]
+
+
+@pytest.mark.parametrize("statement, message", [
+    ("UPDATE t SET height 1", "Bad input values"),
+    ("UPDATE t SET id x", "Bad input values"),
+    ("UPDATE nobody SET id 1", "Table not found"),
+    ("DELETE FROM nobody WHERE id == 1", "Table not found"),
+    ("DELETE FROM t WHERE height > 1", "Unknown column 'height'"),
+])
+def test_invalid_changes(session, statement, message):
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES 1 a")
+    with pytest.raises(ValueError, match=message):
+        session.run(statement)
+    assert session.run("SELECT * FROM t") == [[1, "a"]]
@@ -0,0 +1,80 @@
+"""
+test_vacuum.py
+
+Tests of the deleted rows kept as tombstones and of the tables rewritten without them.
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture(params=["csv", "columnar"])
+def items(request, open_session):
+    """
+    Returns a session on a table of 1000 items, stored as text or in columns, without a cache.
+    """
+    session = open_session(cache_size=0)
+    session.run(f"CREATE TABLE items id int name str PRIMARY_KEY id STORAGE {request.param}")
+    session.run("INSERT INTO items VALUES " + ", ".join(f"{i} n{i}" for i in range(1000)))
+    return session
+
+
+def test_deleted_rows_are_tombstones(items):
+    file_manager = items.db.file_manager
+    identity = file_manager.storage("items").identity()
+    items.run("DELETE FROM items WHERE id == 500")
+    items.run("DELETE FROM items WHERE id < 10")
+    # The table files are not rewritten
+    assert file_manager.storage("items").identity() == identity
+    assert os.path.exists(file_manager.tombstone_path("items"))
+    assert len(file_manager.dead_rows("items")) == 11
+    assert items.run("SELECT COUNT(*) FROM items") == [[989]]
+    assert items.run("SELECT * FROM items WHERE id == 500") == []
+    assert items.run("SELECT name FROM items WHERE id BETWEEN 499 AND 501") == [["n499"], ["n501"]]
+
+
+def test_tombstones_are_kept(open_session, items):
+    items.run("DELETE FROM items WHERE id >= 995")
+    items.db.close()
+    session = open_session(cache_size=0)
+    assert session.run("SELECT COUNT(*) FROM items") == [[995]]
+    assert session.run("SELECT id FROM items WHERE id > 993") == [[994]]
+    # A deleted primary key can be inserted again
+    session.run("INSERT INTO items VALUES 999 again")
+    assert session.run("SELECT name FROM items WHERE id == 999") == [["again"]]
+
+
+def test_vacuum(items):
+    file_manager = items.db.file_manager
+    items.run("DELETE FROM items WHERE id < 100")
+    before = file_manager.storage("items").identity()
+    items.run("VACUUM items")
+    assert file_manager.storage("items").identity() != before
+    assert file_manager.dead_rows("items") == set()
+    assert not os.path.exists(file_manager.tombstone_path("items"))
+    assert items.run("SELECT COUNT(*) FROM items") == [[900]]
+    assert items.run("SELECT name FROM items WHERE id == 100") == [["n100"]]
+
+
+def test_table_is_compacted_above_threshold(open_session):
+    session = open_session(cache_size=0, vacuum_threshold=0.25)
+    session.run("CREATE TABLE t id int PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES " + ", ".join(str(i) for i in range(100)))
+    file_manager = session.db.file_manager
+    session.run("DELETE FROM t WHERE id < 20")
+    assert len(file_manager.dead_rows("t")) == 20
+    session.run("DELETE FROM t WHERE id < 30")
+    # 30 deleted rows of 100 exceed the threshold, so the table was rewritten without them
+    assert file_manager.dead_rows("t") == set()
+    assert session.run("SELECT COUNT(*) FROM t") == [[70]]
+
+
+def test_invalid_vacuum(open_session):
+    session = open_session()
+    with pytest.raises(ValueError, match="Table not found"):
+        session.run("VACUUM nobody")
+    with pytest.raises(ValueError, match="Invalid command"):
+        session.run("VACUUM")
+    with pytest.raises(ValueError, match="Invalid vacuum threshold"):
+        open_session("other", vacuum_threshold=1.5)
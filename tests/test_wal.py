@@ -0,0 +1,134 @@
+"""
+test_wal.py
+
+Tests of the write-ahead log: group commit, checkpoints and the statements that survive a process that exits
+without closing the database.
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from dbms.file_manager import DatabaseFileManager
+from dbms.wal import WriteAheadLog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs statements on a database with a write-ahead log and exits without checkpointing or closing it.
+CRASH = textwrap.dedent("""
+    import contextlib, io, os, sys
+    sys.path.insert(0, sys.argv[1])
+    from dbms.database import Database
+    from dbms.executor import Executor
+
+    db = Database(sys.argv[2], wal=True, storage=sys.argv[3], workers=1)
+    # No background checkpoint applies the log to the table files before the crash
+    db.file_manager.closing.set()
+    executor = Executor(db)
+    with contextlib.redirect_stdout(io.StringIO()):
+        executor.run("CREATE TABLE t id int name str score float PRIMARY_KEY id")
+        executor.run("INSERT INTO t VALUES " + ", ".join(f"{i} n{i} {i / 2}" for i in range(100)))
+        if sys.argv[4] == "checkpoint":
+            db.file_manager.checkpoint()
+        executor.run("INSERT INTO t VALUES 100 last 50.0")
+        executor.run("UPDATE t SET name changed WHERE id < 10")
+        executor.run("DELETE FROM t WHERE score >= 40")
+    assert db.file_manager.logging() and db.file_manager.wal.has_records()
+    sys.stdout.flush()
+    os._exit(0)
+""")
+
+EXPECTED = [[i, "changed" if i < 10 else f"n{i}", i / 2] for i in range(80)]
+
+
+@pytest.mark.parametrize("storage", ["csv", "columnar"])
+@pytest.mark.parametrize("checkpoint", ["", "checkpoint"])
+@pytest.mark.parametrize("wal", [True, False])
+def test_log_is_replayed_after_crash(open_session, database_name, storage, checkpoint, wal):
+    subprocess.run([sys.executable, "-c", CRASH, ROOT, database_name, storage, checkpoint], check=True)
+    session = open_session(wal=wal, storage=storage)
+    assert sorted(session.run("SELECT * FROM t")) == EXPECTED
+    assert session.run("SELECT * FROM t WHERE id == 5") == [[5, "changed", 2.5]]
+
+    # The replayed table takes new statements and keeps them once the database is closed
+    session.run("INSERT INTO t VALUES 200 new 1.0")
+    session.db.close()
+    session = open_session(storage=storage)
+    assert len(session.run("SELECT * FROM t")) == len(EXPECTED) + 1
+
+
+def test_group_commit(tmp_path, monkeypatch):
+    wal = WriteAheadLog(str(tmp_path) + os.sep, fsync=True)
+    wal.open()
+    fsyncs = []
+
+    def fsync(fd):
+        fsyncs.append(fd)
+        time.sleep(0.05)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+
+    def statement(i):
+        wal.append("t", "delete", None, [i])
+        wal.commit()
+
+    threads = [threading.Thread(target=statement, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Statements committed while the first fsync runs are forced together by the next one
+    assert wal.durable_lsn == 8
+    assert 1 <= len(fsyncs) < 8
+    wal.close()
+
+
+def test_partial_record_is_discarded(tmp_path):
+    directory = str(tmp_path) + os.sep
+    wal = WriteAheadLog(directory, fsync=False)
+    wal.open()
+    for i in range(3):
+        wal.append("t", "delete", None, [i])
+    wal.commit()
+    wal.close()
+    # The last record was cut short while it was written
+    with open(wal.file_path, "ab") as file:
+        file.write(pickle.dumps((4, "t", "delete", None, [3]))[:-4])
+
+    wal = WriteAheadLog(directory, fsync=False)
+    wal.open()
+    assert wal.lsn == 3
+    assert [record[4] for record in wal.records(["t"])] == [[0], [1], [2]]
+    assert wal.append("t", "delete", None, [3]) == 4
+    wal.close()
+
+
+def test_statements_are_logged_until_checkpoint(open_session, monkeypatch):
+    session = open_session(wal=True)
+    file_manager = session.db.file_manager
+    # No background checkpoint runs during the test
+    file_manager.closing.set()
+    session.run("CREATE TABLE t id int name str PRIMARY_KEY id")
+    session.run("INSERT INTO t VALUES " + ", ".join(f"{i} n{i}" for i in range(100)))
+
+    saves = []
+    save_table = DatabaseFileManager.save_table
+    monkeypatch.setattr(DatabaseFileManager, "save_table", lambda self, name, *args: saves.append(name)
+                        or save_table(self, name, *args))
+    session.run("INSERT INTO t VALUES 100 last")
+    session.run("DELETE FROM t WHERE id >= 90")
+    session.run("UPDATE t SET name x WHERE id < 10")
+    assert saves == [] and file_manager.wal.size() > 0
+    assert len(session.run("SELECT * FROM t")) == 90
+    assert session.run("SELECT name FROM t WHERE id == 5") == [["x"]]
+
+    file_manager.checkpoint()
+    assert saves == ["t"] and file_manager.wal.size() == 0
+    assert len(session.run("SELECT * FROM t")) == 90
+    assert session.run("SELECT name FROM t WHERE id < 2") == [["x"], ["x"]]
@@ -0,0 +1,96 @@
+"""
+test_zonemap.py
+
+Tests of the minimum and maximum values kept per block of rows to skip blocks during scans.
+"""
+
+import os
+
+import pytest
+
+from dbms.condition import Condition
+from dbms.zonemap import ZoneMap
+
+
+@pytest.mark.parametrize("bounds, expected", [
+    ((None, False, None, False), True),
+    ((10, True, None, False), True),
+    ((10, False, None, False), False),
+    ((None, False, 0, True), True),
+    ((None, False, 0, False), False),
+    ((11, True, 20, True), False),
+    ((-5, True, -1, True), False),
+    ((3, False, 4, False), True),
+    (("a", True, None, False), True),
+])
+def test_overlaps(bounds, expected):
+    assert ZoneMap.overlaps(0, 10, *bounds) is expected
+
+
+def test_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(ZoneMap, "BLOCK_SIZE", 10)
+    zone_map = ZoneMap(str(tmp_path / "t.zone"))
+    zone_map.build(((i, [i, -i]) for i in range(35)), 1, 35)
+    assert [block[:2] for block in zone_map.blocks] == [[0, 10], [10, 10], [20, 10], [30, 5]]
+    assert zone_map.row_count() == 35
+    assert zone_map.candidates({0: (15, True, 22, False)}) == [(10, 10), (20, 10)]
+    assert zone_map.candidates({0: (15, True, None, False), 1: (-9, True, None, False)}) == []
+
+    zone_map.save()
+    loaded = ZoneMap(zone_map.file_path)
+    assert loaded.load() and loaded.blocks == zone_map.blocks
+    assert loaded.covers(1, 40) and not loaded.covers(1, 30) and not loaded.covers(2, 35)
+
+
+@pytest.fixture(params=["csv", "columnar"])
+def events(request, open_session, monkeypatch):
+    """
+    Returns a session on a table of 1000 time-ordered events in blocks of 100 rows, without a cache.
+    """
+    monkeypatch.setattr(ZoneMap, "BLOCK_SIZE", 100)
+    session = open_session(cache_size=0, vectorized=False)
+    session.run(f"CREATE TABLE events id int ts int kind str PRIMARY_KEY id STORAGE {request.param}")
+    session.run("INSERT INTO events VALUES " + ", ".join(f"{i} {i * 10} k{i % 3}" for i in range(1000)))
+    return session
+
+
+def blocks(session, text: str):
+    columns = session.db.tables["events"].metadata["columns"]
+    return session.db.file_manager.candidate_blocks("events", Condition(text, columns))
+
+
+def test_blocks_are_skipped(events):
+    assert len(blocks(events, "ts >= 9500")) == 1
+    assert len(blocks(events, "ts BETWEEN 1000 AND 2990 and kind == 'k1'")) == 2
+    assert blocks(events, "ts > 99990") == []
+    # No block can be skipped
+    assert blocks(events, "ts >= 0") is None
+    assert blocks(events, "ts > 10 or id < 5") is None
+    assert events.run("SELECT id FROM events WHERE ts >= 9950") == [[i] for i in range(995, 1000)]
+    assert events.run("SELECT id FROM events WHERE 20 > ts") == [[0], [1]]
+
+
+def test_zone_map_follows_changes(events):
+    events.run("INSERT INTO events VALUES " + ", ".join(f"{i} {i * 10} k0" for i in range(1000, 1050)))
+    assert len(blocks(events, "ts >= 10000")) == 1
+    events.run("UPDATE events SET ts 50000 WHERE id == 5")
+    events.run("DELETE FROM events WHERE id == 999")
+    assert len(blocks(events, "ts >= 50000")) == 1
+    assert events.run("SELECT id FROM events WHERE ts >= 10000 and ts < 10010") == [[1000]]
+    assert events.run("SELECT id FROM events WHERE ts >= 50000") == [[5]]
+    assert events.run("SELECT id FROM events WHERE ts >= 9980 and ts < 10000") == [[998]]
+
+
+def test_zone_map_is_kept(open_session, events, monkeypatch):
+    path = events.db.file_manager.zone_map_path("events")
+    blocks(events, "ts >= 9500")
+    events.db.close()
+    assert os.path.exists(path)
+
+    def build(*args):
+        raise AssertionError("The zone map was rebuilt")
+
+    monkeypatch.setattr(ZoneMap, "build", build)
+    session = open_session(cache_size=0, vectorized=False)
+    assert len(blocks(session, "ts >= 9500")) == 1
+    assert session.run("SELECT id FROM events WHERE ts >= 9990") == [[999]]